@@ -0,0 +1,58 @@
+"""Measures the memory used per store by the Store dataclass and by the StoreTable
+
+Usage: python -m benchmarks.entity_memory [number of stores]
+"""
+import sys
+import tracemalloc
+from typing import Callable, List
+
+from cadeia.domain.entities import (
+    InventoryState,
+    PendingOrders,
+    ProductClasses,
+    ProductContainer,
+    Store
+)
+from cadeia.domain.tables import StoreTable
+
+
+def build_stores(number_of_stores: int) -> List[Store]:
+    return [
+        Store(
+            store_id=f"store-{idx}",
+            warehouses={
+                product_class: ProductContainer(state=InventoryState.RED, quantity_of_items=0)
+                for product_class in ProductClasses
+            },
+            pending_cd_orders={product_class: PendingOrders() for product_class in ProductClasses}
+        ) for idx in range(number_of_stores)
+    ]
+
+
+def build_table(number_of_stores: int) -> StoreTable:
+    table = StoreTable()
+    for idx in range(number_of_stores):
+        table.add(f"store-{idx}")
+    return table
+
+
+def bytes_per_store(build: Callable[[int], object], number_of_stores: int) -> float:
+    """Memory allocated by the build, and kept alive, divided by the number of stores"""
+    tracemalloc.start()
+    built = build(number_of_stores)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del built
+    return size / number_of_stores
+
+
+def main(number_of_stores: int = 100_000):
+    dataclass_size = bytes_per_store(build_stores, number_of_stores)
+    table_size = bytes_per_store(build_table, number_of_stores)
+    print(f"{number_of_stores} stores")
+    print(f"Store dataclasses: {dataclass_size:.0f} bytes per store")
+    print(f"StoreTable:        {table_size:.0f} bytes per store ({dataclass_size / table_size:.1f}x smaller)")
+
+
+if __name__ == "__main__":
+    main(*[int(arg) for arg in sys.argv[1:2]])
@@ -0,0 +1,44 @@
+"""Measures the cold start of the supervisor, from spawning the workers until
+every shard has its components subscribed
+
+Usage: python -m benchmarks.startup [--transport memory|paho] [--workers n] [number of stores ...]
+"""
+from argparse import ArgumentParser
+from logging import WARNING, getLogger
+from time import monotonic
+from typing import List
+
+from cadeia.main.supervisor import Supervisor, plan_shards
+
+
+def startup_time(number_of_stores: int, workers: int = 1, transport: str = "memory", timeout: float = 120) -> float:
+    """Seconds until every shard of a fleet with one cd per 100 stores is ready"""
+    logger = getLogger("benchmarks.startup")
+    logger.setLevel(WARNING)
+    specs = plan_shards(
+        workers, max(1, number_of_stores // 1000), max(1, number_of_stores // 100), number_of_stores,
+        transport=transport
+    )
+    supervisor = Supervisor(specs, logger)
+    started_at = monotonic()
+    supervisor.start()
+    try:
+        if not supervisor.wait_ready(timeout):
+            raise TimeoutError(f"{number_of_stores} stores were not ready after {timeout}s")
+        return monotonic() - started_at
+    finally:
+        supervisor.stop()
+
+
+def main(sizes: List[int], workers: int = 1, transport: str = "memory"):
+    for number_of_stores in sizes:
+        print(f"{number_of_stores:>7} stores: ready in {startup_time(number_of_stores, workers, transport):.2f}s")
+
+
+if __name__ == "__main__":
+    arg_parser = ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("sizes", type=int, nargs="*", default=[100, 1000, 10000])
+    arg_parser.add_argument("--workers", type=int, default=1)
+    arg_parser.add_argument("--transport", choices=["memory", "paho"], default="memory")
+    args = arg_parser.parse_args()
+    main(args.sizes, args.workers, args.transport)
@@ -0,0 +1,419 @@
+"""Runs the microbenchmarks of the use cases, the codecs and the broker dispatch,
+and the throughput of the whole chain, writing the results to a JSON file
+
+Each benchmark is timed over several repeats, keeping the fastest one, and is
+reported in seconds per operation. Given the results of an earlier run, the
+benchmarks that got slower by more than the threshold are listed and the exit
+status is 1, so the suite can gate a change. The status is 1 as well when the
+binary codec is not faster than the JSON one.
+
+Usage: python -m benchmarks.suite [--output results.json] [--baseline earlier.json]
+    [--threshold 0.1] [--filter name] [--repeat n]
+"""
+from argparse import ArgumentParser
+from array import array
+from dataclasses import asdict, dataclass
+from datetime import datetime, timezone
+import json
+from logging import WARNING, getLogger
+import platform
+import random
+import sys
+from time import perf_counter
+from types import SimpleNamespace
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+from uuid import uuid4
+
+from cadeia.adapters.codecs import BINARY_CODEC, JSON_CODEC, Codec, encode_batch
+from cadeia.adapters.metrics import MetricsRegistry
+from cadeia.adapters.solutions import Broker
+from cadeia.adapters.transports import InMemoryTransport
+from cadeia.app.cd.requests import CreditDistributionCenterRequest, DebitDistributionCenterRequest
+from cadeia.app.cd.strategies import CDRequestCreditStrategy, CDSendCreditStrategy
+from cadeia.app.cd.use_cases import DebitDistributionCenterUseCase, DistributionCenterReceiveCreditUseCase
+from cadeia.app.factory.requests import DebitFactoryRequest
+from cadeia.app.factory.strategies import FactorySendCreditStrategy
+from cadeia.app.factory.use_cases import DebitFactoryUseCase
+from cadeia.app.store.requests import CreditStoreRequest, DebitStoreRequest
+from cadeia.app.store.strategies import RequestCreditStrategy
+from cadeia.app.store.use_cases import DebitStoreUseCase, StoreReceiveCreditUseCase
+from cadeia.domain.catalog import Catalog, new_store
+from cadeia.domain.entities import (
+    DistributionCenter,
+    Factory,
+    InventoryState,
+    OrderInfo,
+    PendingOrders,
+    ProductClasses,
+    ProductContainer,
+    Store
+)
+from cadeia.main.factories import get_cd, get_factory, get_store
+
+BACKLOGS = (0, 100, 1000)
+"""Pending orders of the product class kept by the entity of each use case benchmark"""
+
+CATALOGS = (3, 10000)
+"""Skus of the catalog held by the store of each catalog benchmark"""
+
+Setup = Callable[[int], Callable[[], None]]
+"""Prepares the state of a number of operations and returns the function running them"""
+
+FASTER_THAN = (
+    ("codec.encode[binary]", "codec.encode[json]"),
+    ("codec.round_trip[binary]", "codec.round_trip[json]"),
+)
+"""Pairs of benchmarks of the same run where the first must be the fastest, else the run fails"""
+
+
+@dataclass
+class Result:
+    """Timing of a benchmark
+
+    Args:
+        seconds_per_op (float): Fastest repeat divided by the operations of a repeat
+        ops_per_second (float): Inverse of the seconds per operation
+        number (int): Operations of each repeat
+        repeat (int): Number of repeats
+    """
+    seconds_per_op: float
+    ops_per_second: float
+    number: int
+    repeat: int
+
+
+def measure(setup: Setup, number: int, repeat: int) -> Result:
+    """Times the operations of a benchmark, the setup of each repeat is not timed
+
+    Args:
+        setup (Setup): Returns the function running the operations of a repeat
+        number (int): Operations of each repeat
+        repeat (int): Number of repeats, the fastest one is kept
+    """
+    best = float("inf")
+    for _ in range(repeat):
+        run = setup(number)
+        started = perf_counter()
+        run()
+        best = min(best, perf_counter() - started)
+    seconds_per_op = best / number
+    return Result(seconds_per_op, 1 / seconds_per_op if seconds_per_op else float("inf"), number, repeat)
+
+
+class NullStrategy(
+    RequestCreditStrategy, CDRequestCreditStrategy, CDSendCreditStrategy, FactorySendCreditStrategy
+):
+    """Strategy dropping the orders, so only the use case is timed"""
+
+    def request_credit(self, order_info: OrderInfo):
+        pass
+
+    def send_credit(self, order_info: OrderInfo):
+        pass
+
+
+def backlog(entity_id: str, size: int, quantity: int = 1) -> PendingOrders:
+    return PendingOrders(OrderInfo(entity_id, ProductClasses.A, quantity) for _ in range(size))
+
+
+def build_store(quantity: int, pending: PendingOrders) -> Store:
+    return Store(
+        store_id="store",
+        warehouses={
+            product_class: ProductContainer(InventoryState.GREEN, quantity) for product_class in ProductClasses
+        },
+        pending_cd_orders={
+            product_class: pending if product_class is ProductClasses.A else PendingOrders()
+            for product_class in ProductClasses
+        }
+    )
+
+
+def build_cd(quantity: int, pending_store: PendingOrders, pending_factory: PendingOrders) -> DistributionCenter:
+    return DistributionCenter(
+        distribution_center_id="cd",
+        warehouses={
+            product_class: ProductContainer(InventoryState.GREEN, quantity) for product_class in ProductClasses
+        },
+        pending_store_orders={
+            product_class: pending_store if product_class is ProductClasses.A else PendingOrders()
+            for product_class in ProductClasses
+        },
+        pending_factory_orders={
+            product_class: pending_factory if product_class is ProductClasses.A else PendingOrders()
+            for product_class in ProductClasses
+        }
+    )
+
+
+def store_debit(size: int) -> Setup:
+    """Purchases on a store with stock, the ones dropping it to red order more items"""
+    def setup(number: int):
+        use_case = DebitStoreUseCase(NullStrategy())
+        store = build_store(number + 1, backlog("store", size))
+        requests = [DebitStoreRequest(store, ProductClasses.A, 1) for _ in range(number)]
+        return lambda: [use_case.execute(request) for request in requests]
+    return setup
+
+
+def store_credit(size: int, known_order_id: bool = True) -> Setup:
+    """Credits fulfilling pending orders of a store, found by order id or by quantity"""
+    def setup(number: int):
+        use_case = StoreReceiveCreditUseCase()
+        pending = backlog("store", size, quantity=2)
+        fulfilled = [OrderInfo("store", ProductClasses.A, 1) for _ in range(number)]
+        for order in fulfilled:
+            pending.append(order)
+        store = build_store(0, pending)
+        requests = [
+            CreditStoreRequest(store, ProductClasses.A, 1, order.order_id if known_order_id else None)
+            for order in fulfilled
+        ]
+        return lambda: [use_case.execute(request) for request in requests]
+    return setup
+
+
+def catalog_store_debit(size: int) -> Setup:
+    """Purchases of random skus on a store holding a catalog, the ones dropping a sku to
+        red order more items
+    """
+    def setup(number: int):
+        use_case = DebitStoreUseCase(NullStrategy())
+        catalog = Catalog.synthetic(size)
+        store = new_store("store", catalog)
+        store.warehouses.quantities[:] = array("q", [number + 1]) * size
+        skus = random.Random(0).choices(list(catalog), k=number)
+        requests = [DebitStoreRequest(store, sku, 1) for sku in skus]  # type: ignore
+        return lambda: [use_case.execute(request) for request in requests]
+    return setup
+
+
+def cd_debit(size: int, in_stock: bool = True) -> Setup:
+    """Orders of the stores to a cd, sent right away when in stock, else kept pending
+        while the cd orders from the factory
+    """
+    def setup(number: int):
+        use_case = DebitDistributionCenterUseCase(NullStrategy(), NullStrategy())
+        cd = build_cd(number + 1 if in_stock else 0, backlog("store", size), backlog("cd", size))
+        requests = [DebitDistributionCenterRequest(cd, ProductClasses.A, 1, "store") for _ in range(number)]
+        return lambda: [use_case.execute(request) for request in requests]
+    return setup
+
+
+def cd_credit(size: int) -> Setup:
+    """Credits of the factory to a cd, each one fulfilling a pending store order"""
+    def setup(number: int):
+        use_case = DistributionCenterReceiveCreditUseCase(NullStrategy())
+        pending_factory = backlog("cd", size, quantity=2)
+        fulfilled = [OrderInfo("cd", ProductClasses.A, 1) for _ in range(number)]
+        for order in fulfilled:
+            pending_factory.append(order)
+        cd = build_cd(0, backlog("store", size + number), pending_factory)
+        requests = [
+            CreditDistributionCenterRequest(cd, ProductClasses.A, 1, order.order_id) for order in fulfilled
+        ]
+        return lambda: [use_case.execute(request) for request in requests]
+    return setup
+
+
+def factory_debit() -> Setup:
+    """Orders of the cds to a factory"""
+    def setup(number: int):
+        use_case = DebitFactoryUseCase(NullStrategy())
+        requests = [
+            DebitFactoryRequest(Factory("factory"), ProductClasses.A, 500, "cd", order_id="order")
+            for _ in range(number)
+        ]
+        return lambda: [use_case.execute(request) for request in requests]
+    return setup
+
+
+def codec_encode(codec: Codec) -> Setup:
+    """Orders between uuid addressed entities encoded with a new message id each"""
+    def setup(number: int):
+        orders = [OrderInfo(str(uuid4()), ProductClasses.B, 42) for _ in range(number)]
+        return lambda: [codec.encode(order, "credit") for order in orders]
+    return setup
+
+
+def codec_round_trip(codec: Codec) -> Setup:
+    """Orders between uuid addressed entities encoded and decoded back"""
+    def setup(number: int):
+        orders = [OrderInfo(str(uuid4()), ProductClasses.B, 42) for _ in range(number)]
+        return lambda: [codec.decode(codec.encode(order, "credit")) for order in orders]
+    return setup
+
+
+def broker_dispatch(codec: Codec, messages: int = 1) -> Setup:
+    """Messages decoded by the broker, checked against its dedup cache and handed to a
+        callback doing nothing, one operation per message even when they arrive batched
+    """
+    def setup(number: int):
+        handle = Broker(lambda: None, component="benchmark", metrics=MetricsRegistry()).process_message(
+            lambda order_info, purpose: None)
+        order = OrderInfo("7a1f9a52-2a44-4d2b-9a0c-0f6e8e0c1d3a", ProductClasses.B, 42)
+        payloads = [codec.encode(order, "debit") for _ in range(number)]
+        if messages > 1:
+            payloads = [encode_batch(payloads[start:start + messages]) for start in range(0, number, messages)]
+        msgs = [SimpleNamespace(topic="benchmark", payload=payload) for payload in payloads]
+        return lambda: [handle(None, None, msg) for msg in msgs]
+    return setup
+
+
+def chain(number_of_stores: int) -> Setup:
+    """Purchases on random stores served by a cd and a factory through the in memory
+        transport, each operation is a purchase along with every message it sets off
+    """
+    def setup(number: int):
+        logger = getLogger("benchmarks.suite")
+        metrics = MetricsRegistry()
+        transport = InMemoryTransport()
+        stores = [
+            get_store(logger, transport_callback=lambda: transport, metrics=metrics, store_id=f"store-{idx}")
+            for idx in range(number_of_stores)
+        ]
+        components = [
+            get_factory(logger, transport_callback=lambda: transport, metrics=metrics),
+            get_cd(logger, transport_callback=lambda: transport, metrics=metrics),
+            *stores
+        ]
+        for component in components:
+            component.subscribe()
+        rng = random.Random(number_of_stores)
+        purchases = [(rng.choice(stores), rng.choice(list(ProductClasses))) for _ in range(number)]
+
+        def run():
+            for store, product_class in purchases:
+                store.buy(product_class, 1)
+                transport.drain()
+        return run
+    return setup
+
+
+def benchmarks() -> Iterator[Tuple[str, Setup, int]]:
+    """Yields the name, setup and operations per repeat of every benchmark"""
+    for size in BACKLOGS:
+        yield f"use_case.store_debit[backlog={size}]", store_debit(size), 20000
+        yield f"use_case.store_credit[backlog={size}]", store_credit(size), 20000
+        yield f"use_case.store_credit_by_quantity[backlog={size}]", store_credit(size, known_order_id=False), 2000
+        yield f"use_case.cd_debit[backlog={size}]", cd_debit(size), 20000
+        yield f"use_case.cd_debit_out_of_stock[backlog={size}]", cd_debit(size, in_stock=False), 5000
+        yield f"use_case.cd_credit[backlog={size}]", cd_credit(size), 20000
+    yield "use_case.factory_debit", factory_debit(), 20000
+    for size in CATALOGS:
+        yield f"use_case.store_debit_catalog[skus={size}]", catalog_store_debit(size), 20000
+    for codec in (JSON_CODEC, BINARY_CODEC):
+        yield f"codec.encode[{codec.name}]", codec_encode(codec), 20000
+        yield f"codec.round_trip[{codec.name}]", codec_round_trip(codec), 20000
+        yield f"broker.dispatch[{codec.name}]", broker_dispatch(codec), 20000
+        yield f"broker.dispatch_batch[{codec.name},64]", broker_dispatch(codec, 64), 19200
+    for number_of_stores in (10, 1000):
+        yield f"chain.purchase[stores={number_of_stores}]", chain(number_of_stores), 2000
+
+
+def run(names: Optional[Sequence[str]] = None, repeat: int = 5, scale: float = 1.0) -> Dict[str, Result]:
+    """Runs the benchmarks whose name contains one of the names, or every one
+
+    Args:
+        names (Optional[Sequence[str]]): Parts of the names of the benchmarks to run
+        repeat (int): Number of repeats of each benchmark
+        scale (float): Multiplies the operations per repeat, below 1 for quick runs
+    """
+    results = {}
+    for name, setup, number in benchmarks():
+        if names and not any(part in name for part in names):
+            continue
+        results[name] = measure(setup, max(1, int(number * scale)), repeat)
+        print(f"{name:<50} {results[name].seconds_per_op * 1e6:>10.2f} us/op", file=sys.stderr)
+    return results
+
+
+def environment() -> Dict[str, str]:
+    return {
+        "python": platform.python_version(),
+        "implementation": platform.python_implementation(),
+        "machine": platform.machine(),
+        "system": platform.platform(),
+        "created": datetime.now(timezone.utc).isoformat()
+    }
+
+
+def write(path: str, results: Dict[str, Result]):
+    with open(path, "w", encoding="utf-8") as results_file:
+        json.dump(
+            {"environment": environment(), "results": {name: asdict(result) for name, result in results.items()}},
+            results_file, indent=2
+        )
+
+
+def regressions(
+    baseline: Dict[str, dict], results: Dict[str, dict], threshold: float = 0.1
+) -> List[Tuple[str, float, float]]:
+    """Compares the seconds per operation of the benchmarks present in both runs
+
+    Args:
+        baseline (Dict[str, dict]): Results of the earlier run, by benchmark name
+        results (Dict[str, dict]): Results of the current run, by benchmark name
+        threshold (float): Slowdown tolerated, as a fraction of the earlier time
+
+    Returns:
+        List[Tuple[str, float, float]]: Name, earlier and current seconds per operation
+            of the benchmarks slower than tolerated
+    """
+    return [
+        (name, baseline[name]["seconds_per_op"], result["seconds_per_op"])
+        for name, result in results.items()
+        if name in baseline and result["seconds_per_op"] > baseline[name]["seconds_per_op"] * (1 + threshold)
+    ]
+
+
+def slower_than_expected(results: Dict[str, dict]) -> List[Tuple[str, float, str, float]]:
+    """Checks the benchmarks which must be faster than others of the same run, such as
+        the binary codec against the JSON one it replaces
+
+    Args:
+        results (Dict[str, dict]): Results of the run, by benchmark name
+
+    Returns:
+        List[Tuple[str, float, str, float]]: Name and seconds per operation of each benchmark
+            slower than the one it must beat, followed by the ones of that benchmark
+    """
+    return [
+        (name, results[name]["seconds_per_op"], other, results[other]["seconds_per_op"])
+        for name, other in FASTER_THAN
+        if name in results and other in results
+        and results[name]["seconds_per_op"] >= results[other]["seconds_per_op"]
+    ]
+
+
+def main(
+    output: str, baseline: Optional[str] = None, threshold: float = 0.1, names: Optional[Sequence[str]] = None,
+    repeat: int = 5, scale: float = 1.0
+) -> int:
+    getLogger("benchmarks.suite").setLevel(WARNING)
+    results = run(names, repeat, scale)
+    write(output, results)
+    current = {name: asdict(result) for name, result in results.items()}
+    unexpected = slower_than_expected(current)
+    for name, seconds, other, other_seconds in unexpected:
+        print(f"{name}: {seconds * 1e6:.2f} us/op, not faster than {other}: {other_seconds * 1e6:.2f} us/op")
+    if not baseline:
+        return 1 if unexpected else 0
+    with open(baseline, encoding="utf-8") as baseline_file:
+        earlier = json.load(baseline_file)["results"]
+    slower = regressions(earlier, current, threshold)
+    for name, before, after in slower:
+        print(f"{name}: {before * 1e6:.2f} -> {after * 1e6:.2f} us/op ({after / before - 1:+.0%})")
+    return 1 if slower or unexpected else 0
+
+
+if __name__ == "__main__":
+    arg_parser = ArgumentParser(description=__doc__.splitlines()[0])
+    arg_parser.add_argument("--output", default="benchmark-results.json")
+    arg_parser.add_argument("--baseline", help="results of an earlier run to compare with")
+    arg_parser.add_argument("--threshold", type=float, default=0.1, help="slowdown tolerated, 0.1 is 10%%")
+    arg_parser.add_argument("--filter", action="append", dest="names", help="runs only the matching benchmarks")
+    arg_parser.add_argument("--repeat", type=int, default=5)
+    arg_parser.add_argument("--scale", type=float, default=1.0, help="multiplies the operations of each repeat")
+    args = arg_parser.parse_args()
+    sys.exit(main(args.output, args.baseline, args.threshold, args.names, args.repeat, args.scale))
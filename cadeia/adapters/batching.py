@@ -0,0 +1,158 @@
+"""Defines the transport publishing messages in batches
+"""
+import asyncio
+from dataclasses import dataclass
+import threading
+from time import monotonic
+from typing import Callable, Dict, List, Optional, Union
+
+from cadeia.adapters.codecs import encode_batch
+from cadeia.adapters.transports import Transport
+
+
+def _ack_all(acks: List[Callable[[], None]]) -> Callable[[], None]:
+    def ack():
+        for on_ack in acks:
+            on_ack()
+    return ack
+
+
+@dataclass(frozen=True)
+class BatchSettings:
+    """Settings of the batching of the published messages"""
+    max_delay: float = 0.01
+    max_messages: int = 64
+    compress: bool = False
+
+
+class BatchingTransport(Transport):
+    """Transport grouping the messages published to the same topic in batches
+
+    The messages of a topic are held for up to max_delay seconds, or until
+    max_messages of them are waiting, and then published as one batch message,
+    which the Broker splits back before calling the controllers. Subscriptions
+    are passed through to the wrapped transport.
+    """
+
+    def __init__(
+        self,
+        transport: Transport,
+        settings: BatchSettings = BatchSettings(),
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ):
+        """
+        Args:
+            transport (Transport): Transport the batches are published through
+            settings (BatchSettings, optional): Batching window and compression
+            loop (Optional[asyncio.AbstractEventLoop]): When given, the batches are
+                flushed by this event loop, which must be the thread publishing,
+                instead of by a background thread
+        """
+        self._transport = transport
+        self._settings = settings
+        self._loop = loop
+        self._condition = threading.Condition()
+        self._batches: Dict[str, List[Union[bytes, str]]] = {}
+        self._acks: Dict[str, List[Callable[[], None]]] = {}
+        self._qos: Dict[str, int] = {}
+        self._deadlines: Dict[str, float] = {}
+        self._flusher: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def publish(
+        self,
+        topic: str,
+        payload: Union[bytes, str],
+        qos: int = 0,
+        on_ack: Optional[Callable[[], None]] = None
+    ):
+        with self._condition:
+            batch = self._batches.get(topic)
+            if batch is None:
+                batch = self._batches[topic] = []
+                self._acks[topic] = []
+                self._qos[topic] = qos
+                self._deadlines[topic] = monotonic() + self._settings.max_delay
+                self._schedule_flush()
+            batch.append(payload)
+            if on_ack:
+                self._acks[topic].append(on_ack)
+            self._qos[topic] = max(self._qos[topic], qos)
+            full = len(batch) >= self._settings.max_messages
+        if full:
+            self.flush(topic)
+
+    def _schedule_flush(self):
+        if self._loop:
+            self._loop.call_later(self._settings.max_delay, self._flush_expired)
+            return
+        if not self._flusher:
+            self._flusher = threading.Thread(target=self._run_flusher, daemon=True)
+            self._flusher.start()
+        self._condition.notify()
+
+    def _run_flusher(self):
+        while True:
+            with self._condition:
+                while not self._deadlines and not self._stopped:
+                    self._condition.wait()
+                if self._stopped:
+                    return
+                # every batch waits the same delay, so the first deadline is the earliest
+                topic, deadline = next(iter(self._deadlines.items()))
+                remaining = deadline - monotonic()
+                if remaining > 0:
+                    self._condition.wait(remaining)
+                    continue
+            self.flush(topic)
+
+    def _flush_expired(self):
+        now = monotonic()
+        with self._condition:
+            expired = [topic for topic, deadline in self._deadlines.items() if deadline <= now]
+        for topic in expired:
+            self.flush(topic)
+
+    def flush(self, topic: Optional[str] = None):
+        """Publishes the waiting batches right away
+
+        Args:
+            topic (Optional[str]): Topic to flush, if None every topic is flushed
+        """
+        with self._condition:
+            topics = [topic] if topic is not None else list(self._batches)
+            batches = []
+            for batch_topic in topics:
+                batch = self._batches.pop(batch_topic, None)
+                if batch:
+                    batches.append((batch_topic, batch, self._qos.pop(batch_topic), self._acks.pop(batch_topic)))
+                self._deadlines.pop(batch_topic, None)
+        for batch_topic, batch, qos, acks in batches:
+            on_ack = _ack_all(acks) if acks else None
+            if len(batch) == 1 and not self._settings.compress:
+                self._transport.publish(batch_topic, batch[0], qos=qos, on_ack=on_ack)
+            else:
+                self._transport.publish(
+                    batch_topic, encode_batch(batch, compress=self._settings.compress), qos=qos, on_ack=on_ack)
+
+    def subscribe(self, topic: str, callback: Callable, qos: int = 1):
+        self._transport.subscribe(topic, callback, qos=qos)
+
+    def connect(self):
+        self._transport.connect()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._transport.wait_ready(timeout)
+
+    def loop_forever(self):
+        self._transport.loop_forever()
+
+    async def serve(self):
+        await self._transport.serve()
+
+    def stop(self):
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        self.flush()
+        self._transport.stop()
@@ -1,7 +1,10 @@
 """Defines the cd controller"""
 from logging import Logger
-from typing import Union
+from time import perf_counter
+from typing import Iterator, Optional, Tuple, Union
+from cadeia.adapters.metrics import REGISTRY, MetricsRegistry, pending_orders, use_case_time
 from cadeia.adapters.solutions import Broker
+from cadeia.adapters.topics import topic
 from cadeia.app.cd.requests import (
     CreditDistributionCenterRequest,
     DebitDistributionCenterRequest
@@ -11,10 +14,12 @@ from cadeia.app.cd.use_cases import (
     DebitDistributionCenterUseCase,
     DistributionCenterReceiveCreditUseCase
 )
+from cadeia.domain.catalog import Catalog, new_distribution_center
 from cadeia.domain.entities import (
     DistributionCenter,
     InventoryState,
     OrderInfo,
+    PendingOrders,
     ProductClasses,
     ProductContainer
 )
@@ -30,11 +35,17 @@ class CDController:
             cd_debit_use_case: DebitDistributionCenterUseCase,
             broker: Broker,
             distribution_center: Union[DistributionCenter, str],
-            logger: Logger
+            logger: Logger,
+            share_group: Optional[str] = None,
+            metrics: MetricsRegistry = REGISTRY,
+            catalog: Optional[Catalog] = None
     ):
         self._logger = logger
-        if isinstance(distribution_center, (str,)):
-            self._distribution_center: DistributionCenter = DistributionCenter(
+        self._share_group = share_group
+        if isinstance(distribution_center, (str,)) and catalog is not None:
+            self._distribution_center: DistributionCenter = new_distribution_center(distribution_center, catalog)
+        elif isinstance(distribution_center, (str,)):
+            self._distribution_center = DistributionCenter(
                 distribution_center_id=distribution_center,
                 warehouses={
                     ProductClasses.A: ProductContainer(
@@ -51,14 +62,14 @@ class CDController:
                     )
                 },
                 pending_store_orders={
-                    ProductClasses.A: [],
-                    ProductClasses.B: [],
-                    ProductClasses.C: []
+                    ProductClasses.A: PendingOrders(),
+                    ProductClasses.B: PendingOrders(),
+                    ProductClasses.C: PendingOrders()
                 },
                 pending_factory_orders={
-                    ProductClasses.A: [],
-                    ProductClasses.B: [],
-                    ProductClasses.C: []
+                    ProductClasses.A: PendingOrders(),
+                    ProductClasses.B: PendingOrders(),
+                    ProductClasses.C: PendingOrders()
                 }
             )
         else:
@@ -66,6 +77,20 @@ class CDController:
         self._cd_receive_credit_use_case = cd_receive_credit_use_case
         self._cd_debit_use_case = cd_debit_use_case
         self._broker = broker
+        self._credit_time = use_case_time(metrics).labels("cd_credit")
+        self._debit_time = use_case_time(metrics).labels("cd_debit")
+        pending_orders(metrics).track(self._pending_orders)
+
+    def _pending_orders(self) -> Iterator[Tuple[Tuple[str, str, str], int]]:
+        """Returns the number of pending orders of each product class, read with the metrics"""
+        for product_class, orders in self._distribution_center.pending_store_orders.items():
+            yield ("cd", "pending_store_orders", product_class.name), len(orders)
+        for product_class, orders in self._distribution_center.pending_factory_orders.items():
+            yield ("cd", "pending_factory_orders", product_class.name), len(orders)
+
+    @property
+    def distribution_center_id(self) -> str:
+        return self._distribution_center.distribution_center_id
 
     def _receive_callback(self, order_info: OrderInfo, purpose: str):
         """Callback to be passed to the broker to receive messages
@@ -88,12 +113,16 @@ class CDController:
             order_info (OrderInfo): Information about the order
         """
 
+        started = perf_counter()
         self._distribution_center = self._cd_receive_credit_use_case.execute(
             CreditDistributionCenterRequest(
                 distribution_center=self._distribution_center,
                 product_class=order_info.product_class,
-                quantity_of_items=order_info.quantity
+                quantity_of_items=order_info.quantity,
+                order_id=order_info.order_id or None,
+                trace=order_info.trace
             )).distribution_center
+        self._credit_time.observe(perf_counter() - started)
 
         self._logger.info(
             'cd %s received credit of %s:%s, now cd has %s items of %s remaining, state is %s',
@@ -125,16 +154,33 @@ class CDController:
             order_info.product_class.name,
             self._distribution_center.warehouses[order_info.product_class].state.name
         )
+        started = perf_counter()
         res = self._cd_debit_use_case.execute(DebitDistributionCenterRequest(
             distribution_center=self._distribution_center,
             product_class=order_info.product_class,
             quantity_of_items=order_info.quantity,
-            store_id=order_info.entity_id
+            store_id=order_info.entity_id,
+            order_id=order_info.order_id or None,
+            trace=order_info.trace
         ))
+        self._debit_time.observe(perf_counter() - started)
         self._distribution_center = res.distribution_center
 
+    def subscribe(self):
+        """Subscribes to the credits of the cd and to the orders of the stores without blocking,
+            the orders are shared with the other cds of the share group, if any
+        """
+        self._logger.info(
+            "cd subscribing to cd/%s/credit and to cd/requests/debit with share group %s",
+            self._distribution_center.distribution_center_id,
+            self._share_group
+        )
+        self._broker.subscribe(topic("cd", "credit", self._distribution_center.distribution_center_id))
+        self._broker.consume(
+            topic("cd", "debit"),
+            self._receive_callback,
+            share_group=self._share_group)
+
     def start(self):
-        self._logger.info("cd subscribing to cd/%s", self._distribution_center.distribution_center_id)
-        self._broker.start_consuming(
-            "cd/#",
-            self._receive_callback)
+        self.subscribe()
+        self._broker.loop_forever()
@@ -0,0 +1,414 @@
+"""Defines the wire formats of the messages exchanged by the components
+"""
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+import json
+import os
+import struct
+from typing import Dict, List, Optional, Sequence, Tuple, Union
+from uuid import uuid4
+import zlib
+
+from cadeia.domain.catalog import Catalog
+from cadeia.domain.entities import OrderInfo, ProductClasses, TraceContext
+
+Payload = Union[bytes, bytearray, memoryview, str]
+
+PURPOSES = ("debit", "credit")
+
+
+def new_message_id() -> str:
+    """Returns an unique message id, kept by the redeliveries of the message"""
+    return str(uuid4())
+
+
+@dataclass
+class Message:
+    """Decoded message, an empty message id means the publisher gave it none"""
+    order_info: OrderInfo
+    purpose: str
+    message_id: str = ""
+
+
+class Codec(ABC):
+    """Interface of a message wire format"""
+    name: str
+
+    @abstractmethod
+    def encode(self, order_info: OrderInfo, purpose: str, message_id: Optional[str] = None) -> Union[bytes, str]:
+        """Encodes an order and the purpose of its message
+
+        Args:
+            order_info (OrderInfo): Order carried by the message
+            purpose (str): debit or credit
+            message_id (Optional[str]): Id of the message, a new one when not given
+
+        Returns:
+            Union[bytes, str]: Message payload
+        """
+        ...
+
+    @abstractmethod
+    def decode(self, payload: Payload, catalog: Optional[Catalog] = None) -> Message:
+        """Decodes a message payload
+
+        Args:
+            payload (Payload): Message payload
+            catalog (Optional[Catalog]): Catalog of the skus of the deployment, None when
+                the products are the ProductClasses
+
+        Returns:
+            Message: Decoded order and purpose
+        """
+        ...
+
+
+class JsonCodec(Codec):
+    """Original wire format, a JSON object per message, messages without an
+        order id are decoded with an empty one. Traced orders get a trace
+        member with the trace id and the hops as lists. The product class
+        member holds the name of the class or sku.
+    """
+    name = "json"
+
+    def encode(self, order_info: OrderInfo, purpose: str, message_id: Optional[str] = None) -> str:
+        message = {
+            "entity_id": order_info.entity_id,
+            "product_class": order_info.product_class.name,
+            "quantity": order_info.quantity,
+            "purpose": purpose,
+            "order_id": order_info.order_id,
+            "message_id": message_id or new_message_id()
+        }
+        if order_info.trace is not None:
+            message["trace"] = {"id": order_info.trace.trace_id, "hops": order_info.trace.hops}
+        return json.dumps(message)
+
+    def decode(self, payload: Payload, catalog: Optional[Catalog] = None) -> Message:
+        if isinstance(payload, memoryview):
+            payload = payload.tobytes()
+        processed_msg = json.loads(payload)
+        return Message(
+            order_info=OrderInfo(
+                entity_id=processed_msg["entity_id"],
+                product_class=(catalog if catalog is not None else ProductClasses)[processed_msg["product_class"]],
+                quantity=processed_msg["quantity"],
+                order_id=processed_msg.get("order_id", ""),
+                trace=TraceContext(
+                    trace_id=processed_msg["trace"]["id"],
+                    hops=[tuple(hop) for hop in processed_msg["trace"]["hops"]]
+                ) if "trace" in processed_msg else None
+            ),
+            purpose=processed_msg["purpose"],
+            message_id=processed_msg.get("message_id", "")
+        )
+
+
+def write_varint(buffer: bytearray, value: int):
+    """Appends an unsigned LEB128 varint to the buffer"""
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+
+def read_varint(payload: Union[bytes, memoryview], offset: int) -> Tuple[int, int]:
+    """Reads an unsigned LEB128 varint
+
+    Returns:
+        Tuple[int, int]: The value and the offset after it
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = payload[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def zigzag(value: int) -> int:
+    """Maps signed integers to unsigned ones keeping small magnitudes small"""
+    return value << 1 if value >= 0 else ((-value) << 1) - 1
+
+
+def unzigzag(value: int) -> int:
+    """Inverse of zigzag"""
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def uuid_bytes(entity_id: str) -> Optional[bytes]:
+    """Packs a canonical lowercase uuid string in 16 bytes
+
+    Returns:
+        Optional[bytes]: The packed uuid, or None if the id is not such an uuid
+    """
+    if len(entity_id) != 36 or entity_id[8] != "-" or entity_id[13] != "-" or entity_id[18] != "-" \
+            or entity_id[23] != "-":
+        return None
+    hex_id = entity_id.replace("-", "")
+    try:
+        packed = bytes.fromhex(hex_id)
+    except ValueError:
+        return None
+    # hex gives back the digits only if they were lowercase and had no spaces or extra dashes
+    return packed if len(packed) == 16 and packed.hex() == hex_id else None
+
+
+def format_uuid(hex_id: str) -> str:
+    """Formats 32 hex digits as a canonical uuid string"""
+    return f"{hex_id[:8]}-{hex_id[8:12]}-{hex_id[12:16]}-{hex_id[16:20]}-{hex_id[20:]}"
+
+
+class BinaryCodec(Codec):
+    """Versioned fixed layout wire format
+
+    Layout, in order:
+        magic (1 byte) and version (1 byte)
+        flags (1 byte): bit 0 set for credits, bit 1 set when the entity id is an uuid,
+            bit 2 set when there is an order id, bit 3 when it is an uuid, bit 4
+            when the order is traced, bit 5 when there is a message id and bit 6
+            when it is an uuid
+        product class: 1 byte with the index of the class in ProductClasses, or the
+            varint id of the sku in its catalog when bit 7 is set
+        entity id: 16 bytes when it is an uuid, else a varint length and its utf-8 bytes
+        quantity: zigzag varint
+        order id: like the entity id, present only when bit 2 is set
+        trace, present only when bit 4 is set: the trace id like a non uuid entity id,
+            the varint number of hops and, for each hop, its component and event
+            like the trace id followed by its time as a big endian double
+        message id: like the entity id, present only when bit 5 is set
+
+    Decoders older than the trace and message id flags ignore them, as they come last.
+    The messages of skus are written as version 3, which older decoders refuse,
+    while the ones of ProductClasses are still written as version 2.
+    """
+    name = "binary"
+    MAGIC = 0xCA
+    VERSION = 3
+    CLASS_VERSION = 2
+    FLAG_CREDIT = 0x01
+    FLAG_UUID = 0x02
+    FLAG_ORDER_ID = 0x04
+    FLAG_ORDER_UUID = 0x08
+    FLAG_TRACE = 0x10
+    FLAG_MESSAGE_ID = 0x20
+    FLAG_MESSAGE_UUID = 0x40
+    FLAG_SKU = 0x80
+
+    _classes = tuple(ProductClasses)
+    _class_codes: Dict[ProductClasses, int] = {
+        product_class: code for code, product_class in enumerate(ProductClasses)
+    }
+    _header = struct.Struct("!BBB")
+    _hop_time = struct.Struct("!d")
+    ENTITY_CACHE_SIZE = 65536
+
+    def __init__(self):
+        # the entity ids repeat across the messages, unlike the order and message ids,
+        # so their uuid strings are kept instead of being formatted on every decode
+        self._entity_ids: Dict[bytes, str] = {}
+
+    def _read_entity_id(self, view: memoryview, offset: int, is_uuid: bool) -> Tuple[str, int]:
+        if not is_uuid:
+            return self._read_id(view, offset, False)
+        packed = bytes(view[offset:offset + 16])
+        entity_id = self._entity_ids.get(packed)
+        if entity_id is None:
+            if len(self._entity_ids) >= self.ENTITY_CACHE_SIZE:
+                self._entity_ids.clear()
+            entity_id = self._entity_ids[packed] = format_uuid(packed.hex())
+        return entity_id, offset + 16
+
+    @staticmethod
+    def _write_id(buffer: bytearray, value: str, packed: Optional[bytes]):
+        if packed is not None:
+            buffer += packed
+        else:
+            encoded = value.encode()
+            write_varint(buffer, len(encoded))
+            buffer += encoded
+
+    @staticmethod
+    def _read_id(view: memoryview, offset: int, is_uuid: bool) -> Tuple[str, int]:
+        if is_uuid:
+            return format_uuid(view[offset:offset + 16].hex()), offset + 16
+        length, offset = read_varint(view, offset)
+        return str(view[offset:offset + length], "utf-8"), offset + length
+
+    def encode(self, order_info: OrderInfo, purpose: str, message_id: Optional[str] = None) -> bytes:
+        flags = self.FLAG_CREDIT if purpose == "credit" else 0
+        packed_id = uuid_bytes(order_info.entity_id)
+        if packed_id is not None:
+            flags |= self.FLAG_UUID
+        packed_order_id = None
+        if order_info.order_id:
+            flags |= self.FLAG_ORDER_ID
+            packed_order_id = uuid_bytes(order_info.order_id)
+            if packed_order_id is not None:
+                flags |= self.FLAG_ORDER_UUID
+        class_code = self._class_codes.get(order_info.product_class)  # type: ignore
+        if class_code is not None:
+            buffer = bytearray(self._header.pack(self.MAGIC, self.CLASS_VERSION, flags))
+            buffer.append(class_code)
+        else:
+            buffer = bytearray(self._header.pack(self.MAGIC, self.VERSION, flags | self.FLAG_SKU))
+            write_varint(buffer, order_info.product_class.index)
+        self._write_id(buffer, order_info.entity_id, packed_id)
+        write_varint(buffer, zigzag(order_info.quantity))
+        if order_info.order_id:
+            self._write_id(buffer, order_info.order_id, packed_order_id)
+        if order_info.trace is not None:
+            buffer[2] |= self.FLAG_TRACE
+            self._write_id(buffer, order_info.trace.trace_id, None)
+            write_varint(buffer, len(order_info.trace.hops))
+            for component, event, at in order_info.trace.hops:
+                self._write_id(buffer, component, None)
+                self._write_id(buffer, event, None)
+                buffer += self._hop_time.pack(at)
+        # new ids are 16 random bytes written as is, read back in the uuid format,
+        # which costs a fraction of formatting an uuid4 and packing it again
+        packed_message_id = uuid_bytes(message_id) if message_id else os.urandom(16)
+        buffer[2] |= self.FLAG_MESSAGE_ID | (self.FLAG_MESSAGE_UUID if packed_message_id is not None else 0)
+        self._write_id(buffer, message_id, packed_message_id)  # type: ignore
+        return bytes(buffer)
+
+    def decode(self, payload: Payload, catalog: Optional[Catalog] = None) -> Message:
+        view = memoryview(payload.encode() if isinstance(payload, str) else payload)
+        magic, version, flags = self._header.unpack_from(view, 0)
+        if magic != self.MAGIC or version > self.VERSION:
+            raise ValueError(f"unsupported binary message {magic:#x} version {version}")
+        if flags & self.FLAG_SKU:
+            if catalog is None:
+                raise ValueError("the message is of a sku, decoding it needs the catalog")
+            sku_id, offset = read_varint(view, self._header.size)
+            product_class = catalog.sku(sku_id)
+        else:
+            product_class = self._classes[view[self._header.size]]
+            offset = self._header.size + 1
+        entity_id, offset = self._read_entity_id(view, offset, bool(flags & self.FLAG_UUID))
+        quantity, offset = read_varint(view, offset)
+        order_id = ""
+        if flags & self.FLAG_ORDER_ID:
+            order_id, offset = self._read_id(view, offset, bool(flags & self.FLAG_ORDER_UUID))
+        trace = None
+        if flags & self.FLAG_TRACE:
+            trace_id, offset = self._read_id(view, offset, False)
+            trace = TraceContext(trace_id)
+            count, offset = read_varint(view, offset)
+            for _ in range(count):
+                component, offset = self._read_id(view, offset, False)
+                event, offset = self._read_id(view, offset, False)
+                trace.hops.append((component, event, self._hop_time.unpack_from(view, offset)[0]))
+                offset += self._hop_time.size
+        message_id = ""
+        if flags & self.FLAG_MESSAGE_ID:
+            message_id, offset = self._read_id(view, offset, bool(flags & self.FLAG_MESSAGE_UUID))
+        return Message(
+            order_info=OrderInfo(
+                entity_id=entity_id,
+                product_class=product_class,
+                quantity=unzigzag(quantity),
+                order_id=order_id,
+                trace=trace
+            ),
+            purpose=PURPOSES[flags & self.FLAG_CREDIT],
+            message_id=message_id
+        )
+
+
+JSON_CODEC = JsonCodec()
+BINARY_CODEC = BinaryCodec()
+CODECS: Dict[str, Codec] = {codec.name: codec for codec in (JSON_CODEC, BINARY_CODEC)}
+
+
+def get_codec(name: str) -> Codec:
+    """Returns the codec used to encode the messages of a deployment
+
+    Args:
+        name (str): json or binary
+
+    Returns:
+        Codec: The codec
+    """
+    return CODECS[name]
+
+
+def decode_message(payload: Payload, catalog: Optional[Catalog] = None) -> Message:
+    """Decodes a payload of any of the wire formats, so deployments can mix codecs
+
+    Args:
+        payload (Payload): Message payload, memoryviews are decoded without copying
+        catalog (Optional[Catalog]): Catalog of the skus of the deployment, None when
+            the products are the ProductClasses
+
+    Returns:
+        Message: Decoded order and purpose
+    """
+    if isinstance(payload, str):
+        return JSON_CODEC.decode(payload, catalog)
+    view = payload if isinstance(payload, memoryview) else memoryview(payload)
+    if view[0] == BinaryCodec.MAGIC:
+        return BINARY_CODEC.decode(view, catalog)
+    return JSON_CODEC.decode(payload, catalog)
+
+
+BATCH_MAGIC = 0xCB
+BATCH_VERSION = 1
+BATCH_FLAG_COMPRESSED = 0x01
+_batch_header = struct.Struct("!BBB")
+
+
+def encode_batch(payloads: Sequence[Union[bytes, str]], compress: bool = False) -> bytes:
+    """Frames many payloads, of any codec, in a single message
+
+    Layout: magic (1 byte), version (1 byte), flags (1 byte), then the body,
+    zlib compressed when bit 0 of the flags is set. The body is the varint
+    count of payloads followed by each one as a varint length and its bytes.
+
+    Args:
+        payloads (Sequence[Union[bytes, str]]): Encoded messages
+        compress (bool, optional): Compresses the body with zlib. Defaults to False.
+
+    Returns:
+        bytes: Batch payload
+    """
+    body = bytearray()
+    write_varint(body, len(payloads))
+    for payload in payloads:
+        data = payload.encode() if isinstance(payload, str) else payload
+        write_varint(body, len(data))
+        body += data
+    flags = BATCH_FLAG_COMPRESSED if compress else 0
+    header = _batch_header.pack(BATCH_MAGIC, BATCH_VERSION, flags)
+    return header + (zlib.compress(body) if compress else bytes(body))
+
+
+def split_batch(payload: Payload) -> List[Payload]:
+    """Splits a batch in the payloads it carries, other messages are returned alone
+
+    Args:
+        payload (Payload): Received payload
+
+    Returns:
+        List[Payload]: Payloads of the batch, as memoryviews over the received one
+            unless the batch is compressed
+    """
+    if isinstance(payload, str) or not payload or payload[0] != BATCH_MAGIC:
+        return [payload]
+    view = memoryview(payload)
+    _, version, flags = _batch_header.unpack_from(view, 0)
+    if version > BATCH_VERSION:
+        raise ValueError(f"unsupported batch version {version}")
+    body = view[_batch_header.size:]
+    if flags & BATCH_FLAG_COMPRESSED:
+        body = memoryview(zlib.decompress(body))
+    count, offset = read_varint(body, 0)
+    payloads: List[Payload] = []
+    for _ in range(count):
+        length, offset = read_varint(body, offset)
+        payloads.append(body[offset:offset + length])
+        offset += length
+    return payloads
@@ -0,0 +1,68 @@
+"""Defines the cache of the recently received message ids, used by the Broker to
+    drop the repeated deliveries of a message before its use case runs
+
+MQTT QoS 1 delivers each message at least once, so a message may be received
+again after a reconnection, and a client subscribed to overlapping filters
+receives a copy per filter. The publishers give each message a fresh id, kept
+by the redeliveries, which is remembered here for a while.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+import threading
+from time import monotonic
+from typing import Callable
+
+
+@dataclass(frozen=True)
+class DedupSettings:
+    """Settings of the cache of received message ids of each component
+
+    Args:
+        size (int): Most ids kept, the oldest ones are forgotten first. 0 disables the cache.
+        ttl (float): Seconds an id is kept, repeats arriving later are handled again
+    """
+    size: int = 10000
+    ttl: float = 60.0
+
+
+class DedupCache:
+    """Ids of the recently received messages, forgotten after their time to live
+        or when the cache is full, oldest first
+    """
+
+    def __init__(self, settings: DedupSettings = DedupSettings(), clock: Callable[[], float] = monotonic):
+        """
+        Args:
+            settings (DedupSettings, optional): Size and time to live of the ids
+            clock (Callable[[], float], optional): Returns the current time in seconds. Defaults to monotonic.
+        """
+        self._size = settings.size
+        self._ttl = settings.ttl
+        self._clock = clock
+        self._expiries: "OrderedDict[str, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def seen(self, message_id: str) -> bool:
+        """Remembers the id of a received message
+
+        Args:
+            message_id (str): Id of the message
+
+        Returns:
+            bool: True if the id was received before and is still remembered
+        """
+        now = self._clock()
+        expiries = self._expiries
+        with self._lock:
+            # the ids are kept in the order they expire, so the expired ones are always first
+            while expiries and next(iter(expiries.values())) <= now:
+                expiries.popitem(last=False)
+            if message_id in expiries:
+                return True
+            expiries[message_id] = now + self._ttl
+            if len(expiries) > self._size:
+                expiries.popitem(last=False)
+            return False
+
+    def __len__(self) -> int:
+        return len(self._expiries)
@@ -0,0 +1,124 @@
+"""Defines the dispatcher running the received messages off the transport thread
+"""
+from dataclasses import dataclass
+from queue import Queue
+import threading
+import traceback
+from time import monotonic
+from typing import Any, Callable, Hashable, List, Optional, Tuple
+
+
+@dataclass
+class QueueStats:
+    """Saturation numbers of one dispatcher queue
+
+    Args:
+        depth (int): Work waiting in the queue now
+        max_depth (int): Deepest the queue has been
+        processed (int): Work run so far
+        total_wait (float): Seconds the processed work waited in the queue, added up
+        max_wait (float): Longest wait of a processed work, in seconds
+    """
+    depth: int = 0
+    max_depth: int = 0
+    processed: int = 0
+    total_wait: float = 0.0
+    max_wait: float = 0.0
+
+    @property
+    def mean_wait(self) -> float:
+        return self.total_wait / self.processed if self.processed else 0.0
+
+
+_Work = Tuple[float, Callable[..., Any], Tuple[Any, ...]]
+
+
+class Dispatcher:
+    """Pool of threads each consuming its own queue of work
+
+    The work of a key, like the id of the entity receiving a message, always
+    goes to the same queue, so it runs in the order it was submitted, while
+    the work of different keys runs in parallel. Submitting only enqueues,
+    so the transport thread delivering the messages is never held by a use
+    case.
+    """
+
+    def __init__(self, workers: int = 4, name: str = "dispatcher"):
+        """
+        Args:
+            workers (int, optional): Number of threads, and of queues. Defaults to 4.
+            name (str, optional): Prefix of the thread names. Defaults to "dispatcher".
+        """
+        if workers < 1:
+            raise ValueError("the dispatcher needs at least one worker")
+        self._queues: List["Queue[Optional[_Work]]"] = [Queue() for _ in range(workers)]
+        self._stats = [QueueStats() for _ in range(workers)]
+        self._threads = [
+            threading.Thread(target=self._work, args=(idx,), name=f"{name}-{idx}", daemon=True)
+            for idx in range(workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def submit(self, key: Hashable, work: Callable[..., Any], *args: Any):
+        """Enqueues the work to run with the arguments on the thread of the key
+
+        Args:
+            key (Hashable): Work of the same key runs in submission order
+            work (Callable): Function to run
+            args (Any): Arguments of the function
+        """
+        idx = hash(key) % len(self._queues)
+        queue = self._queues[idx]
+        queue.put((monotonic(), work, args))
+        stats = self._stats[idx]
+        stats.max_depth = max(stats.max_depth, queue.qsize())
+
+    def _work(self, idx: int):
+        queue = self._queues[idx]
+        stats = self._stats[idx]
+        while True:
+            item = queue.get()
+            if item is None:
+                queue.task_done()
+                return
+            enqueued_at, work, args = item
+            wait = monotonic() - enqueued_at
+            stats.total_wait += wait
+            stats.max_wait = max(stats.max_wait, wait)
+            try:
+                work(*args)
+            except Exception:  # pylint: disable=broad-except
+                traceback.print_exc()
+            stats.processed += 1
+            queue.task_done()
+
+    def stats(self) -> List[QueueStats]:
+        """Numbers of each queue, with its current depth"""
+        for queue, stats in zip(self._queues, self._stats):
+            stats.depth = queue.qsize()
+        return list(self._stats)
+
+    def summary(self) -> str:
+        """One line description of the saturation of the queues"""
+        stats = self.stats()
+        processed = sum(queue.processed for queue in stats)
+        mean_wait = sum(queue.total_wait for queue in stats) / processed if processed else 0.0
+        return (
+            f"{len(stats)} queues, depth {sum(queue.depth for queue in stats)} "
+            f"(max {max(queue.max_depth for queue in stats)}), {processed} processed, "
+            f"wait mean {mean_wait * 1000:.2f}ms max {max(queue.max_wait for queue in stats) * 1000:.2f}ms"
+        )
+
+    def join(self):
+        """Blocks until all the submitted work has run"""
+        for queue in self._queues:
+            queue.join()
+
+    def stop(self):
+        """Runs the work already submitted and stops the threads"""
+        for queue in self._queues:
+            queue.put(None)
+        for thread in self._threads:
+            if thread is not threading.current_thread():
+                thread.join()
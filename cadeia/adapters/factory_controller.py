@@ -1,6 +1,10 @@
 """Defines the factory controller"""
 from logging import Logger
+from time import perf_counter
+from typing import Optional
+from cadeia.adapters.metrics import REGISTRY, MetricsRegistry, use_case_time
 from cadeia.adapters.solutions import Broker
+from cadeia.adapters.topics import topic
 from cadeia.app.factory.requests import DebitFactoryRequest
 
 from cadeia.app.factory.use_cases import DebitFactoryUseCase
@@ -19,14 +23,22 @@ class FactoryController:
             factory_debit_use_case: DebitFactoryUseCase,
             broker: Broker,
             factory: str,
-            logger: Logger
+            logger: Logger,
+            share_group: Optional[str] = None,
+            metrics: MetricsRegistry = REGISTRY
     ):
         self._logger = logger
+        self._share_group = share_group
         self._factory: Factory = Factory(
             factory_id=factory
         )
         self._factory_debit_use_case = factory_debit_use_case
         self._broker = broker
+        self._debit_time = use_case_time(metrics).labels("factory_debit")
+
+    @property
+    def factory_id(self) -> str:
+        return self._factory.factory_id
 
     def _receive_callback(self, order_info: OrderInfo, purpose: str):
         """Callback to be passed to the broker to receive messages
@@ -34,18 +46,28 @@ class FactoryController:
         Args:
             order_info (OrderInfo): Information about the order
         """
-        self._logger.info(
-            f'factory {self._factory.factory_id} received debit order of {order_info.product_class.name}:{order_info.quantity}')
+        self._logger.info('factory %s received debit order of %s:%s',
+                          self._factory.factory_id, order_info.product_class.name, order_info.quantity)
 
+        started = perf_counter()
         self._factory = self._factory_debit_use_case.execute(DebitFactoryRequest(
             factory=self._factory,
             distribution_center=order_info.entity_id,
             product_class=order_info.product_class,
-            quantity_of_items=order_info.quantity
+            quantity_of_items=order_info.quantity,
+            order_id=order_info.order_id or None,
+            trace=order_info.trace
         )).factory
+        self._debit_time.observe(perf_counter() - started)
+
+    def subscribe(self):
+        """Subscribes to the factory topics without blocking"""
+        self._logger.info("factory subscribing to factory/requests/debit with share group %s", self._share_group)
+        self._broker.consume(
+            topic("factory", "debit"),
+            self._receive_callback,
+            share_group=self._share_group)
 
     def start(self):
-        self._logger.info("factory subscribing to factory/#")
-        self._broker.start_consuming(
-            "factory/#",
-            self._receive_callback)
+        self.subscribe()
+        self._broker.loop_forever()
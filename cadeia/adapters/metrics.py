@@ -0,0 +1,332 @@
+"""Defines the counters, gauges and histograms kept by the components, rendered
+    in the Prometheus text format from a local HTTP endpoint or a file
+
+The metrics are updated without locks to keep the message path cheap, so when
+several dispatcher threads increment the same metric at once an update may
+rarely be lost. Their children are looked up once, when the component is built.
+"""
+import atexit
+from bisect import bisect_left
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import os
+import threading
+from types import MethodType
+from typing import Callable, Dict, Generic, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+from weakref import WeakMethod
+
+DEFAULT_BUCKETS = (
+    0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 1.0
+)
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Collector = Callable[[], Iterable[Tuple[Tuple[str, ...], float]]]
+
+
+class Counter:
+    """Value that only goes up"""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def samples(self, name: str) -> Iterator[Tuple[str, str, float]]:
+        yield name, "", self.value
+
+
+class Gauge:
+    """Value that goes up and down"""
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+    def inc(self, amount: int = 1):
+        self.value += amount
+
+    def set(self, value: float):
+        self.value = value
+
+    def samples(self, name: str) -> Iterator[Tuple[str, str, float]]:
+        yield name, "", self.value
+
+
+class Histogram:
+    """Count of the observed values below each bound, with their sum"""
+    __slots__ = ("_bounds", "counts", "sum")
+
+    def __init__(self, bounds: Sequence[float] = DEFAULT_BUCKETS):
+        self._bounds = tuple(bounds)
+        self.counts = [0] * (len(self._bounds) + 1)
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self._bounds, value)] += 1
+        self.sum += value
+
+    @property
+    def count(self) -> int:
+        return sum(self.counts)
+
+    def samples(self, name: str) -> Iterator[Tuple[str, str, float]]:
+        cumulative = 0
+        for bound, count in zip((*self._bounds, "+Inf"), self.counts):
+            cumulative += count
+            yield f"{name}_bucket", f'le="{bound}"', cumulative
+        yield f"{name}_sum", "", self.sum
+        yield f"{name}_count", "", cumulative
+
+
+Metric = TypeVar("Metric", Counter, Gauge, Histogram)
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+class MetricFamily(Generic[Metric]):
+    """Metrics of the same name, one per combination of label values"""
+
+    def __init__(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                 factory: Callable[[], Metric]):
+        self.name = name
+        self.documentation = documentation
+        self.kind = kind
+        self.labelnames = tuple(labelnames)
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], Metric] = {}
+        self._collectors: List[Callable[[], Optional[Collector]]] = []
+        self._lock = threading.Lock()
+
+    def track(self, collector: Collector):
+        """Adds a function called when the metrics are read, whose values are added to the
+            counters or gauges of their label values, so the values the components already
+            keep cost nothing to update
+
+        A method is kept through a weak reference, so tracking does not keep its
+        component alive, and it stops being read once the component is collected.
+
+        Args:
+            collector (Collector): Returns pairs of label values and value
+        """
+        reference = WeakMethod(collector) if isinstance(collector, MethodType) else lambda: collector
+        with self._lock:
+            self._collectors.append(reference)
+
+    def _collect(self) -> Dict[Tuple[str, ...], Metric]:
+        children = dict(self._children)
+        with self._lock:
+            collectors = [reference() for reference in self._collectors]
+            if None in collectors:
+                self._collectors = [
+                    reference for reference, collector in zip(self._collectors, collectors) if collector is not None
+                ]
+        totals: Dict[Tuple[str, ...], float] = {}
+        for collector in collectors:
+            if collector is None:
+                continue
+            for values, value in collector():
+                totals[values] = totals.get(values, 0) + value
+        for values, total in totals.items():
+            existing = children.get(values)
+            children[values] = merged = self._factory()
+            merged.value = total + (existing.value if existing is not None else 0)
+        return children
+
+    def labels(self, *values: str) -> Metric:
+        """Returns the metric of the label values, created on the first call
+
+        Args:
+            values (str): One value per label name, in order
+        """
+        child = self._children.get(values)
+        if child is None:
+            if len(values) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects the labels {self.labelnames}, got {values}")
+            with self._lock:
+                child = self._children.setdefault(values, self._factory())
+        return child
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, child in self._collect().items():
+            labels = ",".join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, values))
+            for sample, extra, value in child.samples(self.name):
+                all_labels = ",".join(label for label in (labels, extra) if label)
+                lines.append(f"{sample}{{{all_labels}}} {value}" if all_labels else f"{sample} {value}")
+        return lines
+
+
+class MetricsRegistry:
+    """Metric families of a process, each one created by the first component asking for it"""
+
+    def __init__(self):
+        self._families: Dict[str, MetricFamily] = {}
+        self._lock = threading.Lock()
+
+    def _family(self, name: str, documentation: str, kind: str, labelnames: Sequence[str],
+                factory: Callable) -> MetricFamily:
+        with self._lock:
+            family = self._families.get(name)
+            if family is None:
+                family = self._families[name] = MetricFamily(name, documentation, kind, labelnames, factory)
+            elif family.kind != kind or family.labelnames != tuple(labelnames):
+                raise ValueError(f"metric {name} is already registered as a {family.kind} of {family.labelnames}")
+            return family
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> "MetricFamily[Counter]":
+        return self._family(name, documentation, "counter", labelnames, Counter)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> "MetricFamily[Gauge]":
+        return self._family(name, documentation, "gauge", labelnames, Gauge)
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> "MetricFamily[Histogram]":
+        return self._family(name, documentation, "histogram", labelnames, lambda: Histogram(buckets))
+
+    def get(self, name: str, *values: str) -> float:
+        """Returns the value of a counter or gauge, or the count of a histogram, 0 if it was never updated"""
+        family = self._families.get(name)
+        child = family._collect().get(values) if family else None  # pylint: disable=protected-access
+        if child is None:
+            return 0
+        return child.count if isinstance(child, Histogram) else child.value
+
+    def render(self) -> str:
+        """Renders every metric in the Prometheus text format"""
+        with self._lock:
+            families = list(self._families.values())
+        return "".join(line + "\n" for family in families for line in family.render())
+
+    def dump(self, path: str):
+        """Writes the rendered metrics to the file, replacing it at once so readers never see a partial file"""
+        temporary = f"{path}.tmp"
+        with open(temporary, "w", encoding="utf-8") as metrics_file:
+            metrics_file.write(self.render())
+        os.replace(temporary, path)
+
+
+REGISTRY = MetricsRegistry()
+"""Registry of the current process, used by the components unless another is given"""
+
+
+@dataclass(frozen=True)
+class MetricsSettings:
+    """Settings of the metrics exposure of a process
+
+    Args:
+        port (Optional[int]): Port of the HTTP endpoint serving /metrics, None disables it
+        host (str): Address the endpoint listens on
+        file (Optional[str]): File the metrics are written to, {process} is replaced by the
+            name of the process. None disables it.
+        interval (float): Seconds between writes of the file
+    """
+    port: Optional[int] = None
+    host: str = "127.0.0.1"
+    file: Optional[str] = None
+    interval: float = 10.0
+
+
+class MetricsExporter:
+    """Serves the metrics of a registry over HTTP and writes them periodically to a file, from daemon threads"""
+
+    def __init__(self, settings: MetricsSettings, registry: MetricsRegistry = REGISTRY, process: str = "main"):
+        self._settings = settings
+        self._registry = registry
+        self._path = settings.file.format(process=process) if settings.file else None
+        self._server: Optional[ThreadingHTTPServer] = None
+        self._stopped = threading.Event()
+        self._threads: List[threading.Thread] = []
+
+    @property
+    def port(self) -> Optional[int]:
+        """Port the endpoint is bound to, useful when the settings ask for port 0"""
+        return self._server.server_address[1] if self._server else None
+
+    def start(self) -> "MetricsExporter":
+        if self._settings.port is not None:
+            registry = self._registry
+
+            class Handler(BaseHTTPRequestHandler):
+                def do_GET(self):  # pylint: disable=invalid-name
+                    if self.path.split("?")[0] not in ("/", "/metrics"):
+                        self.send_error(404)
+                        return
+                    body = registry.render().encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", CONTENT_TYPE)
+                    self.send_header("Content-Length", str(len(body)))
+                    self.end_headers()
+                    self.wfile.write(body)
+
+                def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+                    pass
+
+            self._server = ThreadingHTTPServer((self._settings.host, self._settings.port), Handler)
+            self._server.daemon_threads = True
+            self._threads.append(threading.Thread(
+                target=self._server.serve_forever, name="metrics-http", daemon=True))
+        if self._path:
+            self._threads.append(threading.Thread(target=self._write_periodically, name="metrics-file", daemon=True))
+        for thread in self._threads:
+            thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def _write_periodically(self):
+        while not self._stopped.wait(self._settings.interval):
+            self._registry.dump(self._path)
+
+    def stop(self):
+        """Stops the endpoint and writes the file one last time, if it is running"""
+        if self._stopped.is_set():
+            return
+        self._stopped.set()
+        if self._server:
+            self._server.shutdown()
+            self._server.server_close()
+        for thread in self._threads:
+            thread.join()
+        if self._path:
+            self._registry.dump(self._path)
+
+
+def use_case_time(metrics: MetricsRegistry) -> "MetricFamily[Histogram]":
+    """Returns the histograms of the time the controllers take to execute each use case"""
+    return metrics.histogram("cadeia_use_case_seconds", "Time to execute a use case", ("use_case",))
+
+
+def pending_orders(metrics: MetricsRegistry) -> "MetricFamily[Gauge]":
+    """Returns the gauges of the pending orders, by the component holding them, the
+        entity attribute keeping them and product class
+    """
+    return metrics.gauge(
+        "cadeia_pending_orders", "Orders waiting to be delivered", ("component", "orders", "product_class"))
+
+
+class ProductCounters(dict):
+    """Counters of a family by product, each created on its first use, so catalogs
+        of many skus only get the children of the products actually counted
+    """
+
+    def __init__(self, family: "MetricFamily[Counter]", *values: str):
+        """
+        Args:
+            family (MetricFamily[Counter]): Family whose last label is the product class
+            values (str): Values of the other labels, in order
+        """
+        super().__init__()
+        self._family = family
+        self._values = values
+
+    def __missing__(self, product_class) -> Counter:
+        counter = self[product_class] = self._family.labels(*self._values, product_class.name)
+        return counter
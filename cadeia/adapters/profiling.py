@@ -0,0 +1,210 @@
+"""Defines the sampling profiler turned on and off for a component or the whole process while it runs
+
+The profiler has no cost while off besides a set lookup per received message.
+While on, a single daemon thread samples the stacks of the other threads every
+interval, keeping the samples of a component only while one of its messages is
+being handled, and writes them in the collapsed stack format read by
+flamegraph.pl and speedscope when the profile is stopped or times out.
+"""
+from collections import Counter
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from logging import Logger, getLogger
+import os
+import sys
+import threading
+from time import monotonic, sleep, strftime
+from types import FrameType
+from typing import Dict, Iterator, Mapping, Optional
+
+PROCESS = "process"
+TRUNCATED = "[truncated]"
+
+
+def collapse(frame: Optional[FrameType], root: str) -> str:
+    """Returns the stack of a frame as a collapsed stack line, from the root to the frame"""
+    names = []
+    while frame is not None:
+        code = frame.f_code
+        names.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+    names.append(root)
+    return ";".join(reversed(names))
+
+
+@dataclass
+class Profile:
+    """Samples being collected for a component, or for every thread of the process
+
+    Args:
+        component (str): Kind of the component, or process
+        entity_id (Optional[str]): Id of the component, None samples every thread
+        deadline (float): Monotonic time the profile stops by itself
+        stacks (Counter): Samples of each collapsed stack
+    """
+    component: str
+    entity_id: Optional[str]
+    deadline: float
+    stacks: "Counter[str]" = field(default_factory=Counter)
+
+    @property
+    def tag(self) -> str:
+        return f"{self.component}-{self.entity_id}" if self.entity_id else f"{PROCESS}-{os.getpid()}"
+
+
+class ComponentProfiler:
+    """Sampling profiler of the components of a process, controlled by signals or control messages"""
+
+    def __init__(
+        self,
+        directory: str = ".",
+        interval: float = 0.005,
+        max_duration: float = 300,
+        max_stacks: int = 10000,
+        logger: Optional[Logger] = None
+    ):
+        """
+        Args:
+            directory (str, optional): Directory of the written profiles. Defaults to ".".
+            interval (float, optional): Seconds between samples. Defaults to 0.005.
+            max_duration (float, optional): Seconds a profile runs when no duration is given,
+                and the most it can be asked to run. Defaults to 300.
+            max_stacks (int, optional): Distinct stacks kept per profile, the samples of the
+                stacks past it are counted as truncated. Defaults to 10000.
+            logger (Optional[Logger], optional): Logs the written profiles
+        """
+        self._directory = directory
+        self._interval = interval
+        self._max_duration = max_duration
+        self._max_stacks = max_stacks
+        self._logger = logger or getLogger(__name__)
+        self._profiles: Dict[Optional[str], Profile] = {}
+        self._handling: Dict[int, str] = {}
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self.targets: frozenset = frozenset()
+        """Ids of the components being profiled, checked by the Broker on every message"""
+
+    @contextmanager
+    def attribute(self, entity_id: str) -> Iterator[None]:
+        """Marks the current thread as handling a message of the component while in the block"""
+        thread_id = threading.get_ident()
+        self._handling[thread_id] = entity_id
+        try:
+            yield
+        finally:
+            self._handling.pop(thread_id, None)
+
+    def start(self, component: str = PROCESS, entity_id: Optional[str] = None,
+              duration: Optional[float] = None) -> bool:
+        """Starts profiling a component, or the whole process when no entity id is given
+
+        Args:
+            component (str, optional): Kind of the component, part of the file name
+            entity_id (Optional[str], optional): Id of the component
+            duration (Optional[float], optional): Seconds until the profile stops and is written,
+                limited to the maximum duration
+
+        Returns:
+            bool: False if the component was already being profiled
+        """
+        duration = min(duration or self._max_duration, self._max_duration)
+        with self._lock:
+            if entity_id in self._profiles:
+                return False
+            self._profiles[entity_id] = Profile(component, entity_id, monotonic() + duration)
+            self.targets = frozenset(key for key in self._profiles if key is not None)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._sample, name="profiler", daemon=True)
+                self._thread.start()
+        return True
+
+    def stop(self, entity_id: Optional[str] = None) -> Optional[str]:
+        """Stops profiling a component, or the whole process, and writes its profile
+
+        Returns:
+            Optional[str]: Path of the written profile, None if it was not being profiled
+        """
+        with self._lock:
+            profile = self._profiles.pop(entity_id, None)
+            self.targets = frozenset(key for key in self._profiles if key is not None)
+        return self._write(profile) if profile else None
+
+    def toggle(self, entity_id: Optional[str] = None, component: str = PROCESS):
+        """Stops the profile if it is running, else starts it, meant for signal handlers"""
+        if entity_id in self._profiles:
+            self.stop(entity_id)
+        else:
+            self.start(component, entity_id)
+
+    def handle_control(self, components: Mapping[str, str]):
+        """Returns the transport callback of the control/<entity id>/profile messages
+
+        The payload is start, optionally followed by the seconds to profile, or stop.
+        The messages to components which are not hosted here are ignored.
+
+        Args:
+            components (Mapping[str, str]): Kind of each hosted component by id
+        """
+        def on_control(client, userdata, msg):  # pylint: disable=unused-argument
+            parts = msg.topic.split("/")
+            if len(parts) != 3 or parts[1] not in components:
+                return
+            payload = msg.payload
+            command = (payload if isinstance(payload, str) else bytes(payload).decode("utf-8", "replace")).split()
+            try:
+                if command[:1] == ["start"]:
+                    self.start(components[parts[1]], parts[1], float(command[1]) if len(command) > 1 else None)
+                elif command[:1] == ["stop"]:
+                    self.stop(parts[1])
+                else:
+                    self._logger.warning("ignoring profile command %r of %s", command, parts[1])
+            except ValueError:
+                self._logger.warning("ignoring profile command %r of %s", command, parts[1])
+        return on_control
+
+    def _sample(self):
+        own = threading.get_ident()
+        while True:
+            started = monotonic()
+            # a thread is attributed to a component only if it was handling its messages both
+            # before and after its stack was taken, so the stack can not belong to other work
+            handling_before = dict(self._handling)
+            frames = sys._current_frames()  # pylint: disable=protected-access
+            handling = {
+                thread_id: entity_id for thread_id, entity_id in dict(self._handling).items()
+                if handling_before.get(thread_id) == entity_id
+            }
+            names = {thread.ident: thread.name for thread in threading.enumerate()}
+            expired = []
+            with self._lock:
+                profiles = list(self._profiles.values())
+                if not profiles:
+                    self._thread = None
+                    return
+            for profile in profiles:
+                if started >= profile.deadline:
+                    expired.append(profile.entity_id)
+                    continue
+                for thread_id, frame in frames.items():
+                    if thread_id == own:
+                        continue
+                    if profile.entity_id is not None and handling.get(thread_id) != profile.entity_id:
+                        continue
+                    stack = collapse(frame, names.get(thread_id, str(thread_id)))
+                    if stack not in profile.stacks and len(profile.stacks) >= self._max_stacks:
+                        stack = TRUNCATED
+                    profile.stacks[stack] += 1
+            del frames
+            for entity_id in expired:
+                self.stop(entity_id)
+            sleep(max(0.0, self._interval - (monotonic() - started)))
+
+    def _write(self, profile: Profile) -> str:
+        path = os.path.join(self._directory, f"profile-{profile.tag}-{strftime('%Y%m%d-%H%M%S')}.collapsed")
+        with open(path, "w", encoding="utf-8") as profile_file:
+            for stack, count in profile.stacks.most_common():
+                profile_file.write(f"{stack} {count}\n")
+        self._logger.info("profile of %s written to %s with %s samples",
+                          profile.tag, path, sum(profile.stacks.values()))
+        return path
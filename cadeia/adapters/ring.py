@@ -0,0 +1,334 @@
+"""Defines the shared memory ring buffer and the transport exchanging messages through it
+"""
+import asyncio
+from multiprocessing import shared_memory
+import struct
+from time import monotonic, sleep
+from typing import Callable, Dict, List, Optional, Set, Tuple, Union
+
+from cadeia.adapters.transports import (
+    InMemoryMessage,
+    SharedGroup,
+    Transport,
+    has_wildcards,
+    subscription_filter,
+    topic_matches
+)
+
+_length = struct.Struct("<I")
+_frame_header = struct.Struct("<BBH")
+# indexes of the positions in the header, seen as 64 bit words, the consumer
+# position is on its own cache line, so producer and consumer do not share one
+HEAD = 0
+TAIL = 8
+DATA_OFFSET = 128
+WRAP = 0xFFFFFFFF
+
+FRAME_MESSAGE = 0
+FRAME_SUBSCRIBE = 1
+FRAME_SYNC = 2
+FRAME_STOP = 3
+
+
+def _aligned(size: int) -> int:
+    return (size + 3) & ~3
+
+
+class RingBuffer:
+    """Single producer, single consumer queue of byte records in shared memory
+
+    The producer only writes the head position and the consumer only the tail
+    one, each after the record it wrote or read, so no lock is needed as long
+    as a single thread of one process puts and a single thread of another
+    gets. Records are length prefixed and never split: when one does not fit
+    before the end of the buffer a wrap marker sends both sides back to the
+    start.
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, owner: bool):
+        self._memory = memory
+        self._buffer = memory.buf
+        # native words are read and written whole, struct.pack_into would zero them first
+        self._positions = memory.buf[:DATA_OFFSET].cast("Q")
+        self._owner = owner
+        self.capacity = memory.size - DATA_OFFSET
+        self.max_record = self.capacity // 2 - _length.size
+        self._head = self._positions[HEAD]
+        self._tail = self._positions[TAIL]
+
+    @classmethod
+    def create(cls, capacity: int = 1 << 22, name: Optional[str] = None) -> "RingBuffer":
+        """Allocates a new ring buffer, unlinked when the creator closes it
+
+        Args:
+            capacity (int, optional): Bytes of records, rounded to a multiple of 4. Defaults to 4 MiB.
+            name (Optional[str]): Name of the shared memory, if None a random one is chosen
+        """
+        memory = shared_memory.SharedMemory(name=name, create=True, size=DATA_OFFSET + _aligned(capacity))
+        memory.buf[:DATA_OFFSET] = bytes(DATA_OFFSET)
+        return cls(memory, owner=True)
+
+    @classmethod
+    def attach(cls, name: str) -> "RingBuffer":
+        """Opens the ring buffer created by another process
+
+        Args:
+            name (str): Name of the shared memory
+        """
+        return cls(shared_memory.SharedMemory(name=name), owner=False)
+
+    @property
+    def name(self) -> str:
+        return self._memory.name
+
+    def put(self, record: Union[bytes, bytearray, memoryview]) -> bool:
+        """Appends a record, from the producer side
+
+        Args:
+            record (bytes): Record to append, of at most max_record bytes
+
+        Returns:
+            bool: False if the buffer is too full for the record
+        """
+        length = len(record)
+        if length > self.max_record:
+            raise ValueError(f"record of {length} bytes is larger than {self.max_record}")
+        needed = _aligned(_length.size + length)
+        head = self._head
+        free = self.capacity - (head - self._positions[TAIL])
+        offset = head % self.capacity
+        until_end = self.capacity - offset
+        if until_end < needed:
+            if free < until_end + needed:
+                return False
+            _length.pack_into(self._buffer, DATA_OFFSET + offset, WRAP)
+            head += until_end
+            offset = 0
+        elif free < needed:
+            return False
+        start = DATA_OFFSET + offset
+        _length.pack_into(self._buffer, start, length)
+        self._buffer[start + _length.size:start + _length.size + length] = record
+        self._head = head + needed
+        # published only after the record is written
+        self._positions[HEAD] = self._head
+        return True
+
+    def put_wait(self, record: Union[bytes, bytearray, memoryview], timeout: Optional[float] = None) -> bool:
+        """Appends a record, backing off while the buffer is full
+
+        Args:
+            record (bytes): Record to append
+            timeout (Optional[float]): Maximum seconds to wait, if None waits forever
+
+        Returns:
+            bool: False if the timeout expired with the buffer still full
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        delay = 0.0
+        while not self.put(record):
+            if deadline is not None and monotonic() >= deadline:
+                return False
+            sleep(delay)
+            delay = min(max(delay * 2, 1e-5), 1e-3)
+        return True
+
+    def drain(self, callback: Callable[[memoryview], None], max_records: Optional[int] = None) -> int:
+        """Passes the available records to the callback, from the consumer side
+
+        Args:
+            callback (Callable[[memoryview], None]): Called with each record, as a view
+                over the shared memory that is only valid during the call
+            max_records (Optional[int]): Maximum number of records, if None reads all available
+
+        Returns:
+            int: Number of records read
+        """
+        head = self._positions[HEAD]
+        read = 0
+        while self._tail != head and (max_records is None or read < max_records):
+            offset = self._tail % self.capacity
+            start = DATA_OFFSET + offset
+            length = _length.unpack_from(self._buffer, start)[0]
+            if length == WRAP:
+                self._tail += self.capacity - offset
+                continue
+            with self._buffer[start + _length.size:start + _length.size + length] as record:
+                callback(record)
+            self._tail += _aligned(_length.size + length)
+            # published only after the record is consumed, so the producer can not overwrite it
+            self._positions[TAIL] = self._tail
+            read += 1
+        return read
+
+    def get(self) -> Optional[bytes]:
+        """Removes the oldest record, from the consumer side
+
+        Returns:
+            Optional[bytes]: Copy of the record, None if the buffer is empty
+        """
+        records: List[bytes] = []
+        self.drain(lambda record: records.append(bytes(record)), max_records=1)
+        return records[0] if records else None
+
+    def __len__(self) -> int:
+        """Bytes in use, records and padding"""
+        return self._positions[HEAD] - self._positions[TAIL]
+
+    def close(self):
+        """Detaches from the shared memory, which is freed if this is the creator"""
+        self._positions.release()
+        self._buffer = None
+        try:
+            self._memory.close()
+        except BufferError:
+            # a view of a record is still referenced, the mapping goes away with the process
+            pass
+        if self._owner:
+            self._memory.unlink()
+
+
+def encode_frame(kind: int, topic: str = "", payload: Union[bytes, str] = b"", qos: int = 0) -> bytes:
+    """Frames a message, or a control command, to be put in a ring buffer
+
+    Args:
+        kind (int): FRAME_MESSAGE, FRAME_SUBSCRIBE, FRAME_SYNC or FRAME_STOP
+        topic (str, optional): Topic of the message, or topic filter to subscribe
+        payload (Union[bytes, str], optional): Payload of the message, as encoded by a codec
+        qos (int, optional): MQTT quality of service
+
+    Returns:
+        bytes: Frame
+    """
+    encoded_topic = topic.encode()
+    if isinstance(payload, str):
+        payload = payload.encode()
+    return _frame_header.pack(kind, qos, len(encoded_topic)) + encoded_topic + payload
+
+
+def decode_frame(frame: memoryview) -> Tuple[int, int, str, memoryview]:
+    """Splits a frame read from a ring buffer
+
+    Args:
+        frame (memoryview): Frame read from a ring buffer
+
+    Returns:
+        Tuple[int, int, str, memoryview]: Kind, qos, topic and payload, a view over the frame
+    """
+    kind, qos, topic_length = _frame_header.unpack_from(frame)
+    start = _frame_header.size
+    return kind, qos, str(frame[start:start + topic_length], "utf-8"), frame[start + topic_length:]
+
+
+class RingTransport(Transport):
+    """Transport of a domain process whose network I/O runs in another process
+
+    Publishes and subscriptions are framed into the outbound ring buffer and
+    the messages the I/O process receives arrive through the inbound one,
+    so the encoded orders cross the processes as bytes, without pickling.
+    Like the rings, it must be used by a single thread at a time: the one
+    serving it, and the one waiting for readiness before it serves. A publish
+    is acknowledged once it is in the outbound ring. Each topic filter is
+    subscribed once by the I/O process, and its messages are handed to the
+    local subscribers as by the in memory transport.
+    """
+
+    def __init__(self, inbound: RingBuffer, outbound: RingBuffer, ready: Callable[[Optional[float]], bool]):
+        """
+        Args:
+            inbound (RingBuffer): Messages received by the I/O process
+            outbound (RingBuffer): Messages and subscriptions for the I/O process
+            ready (Callable[[Optional[float]], bool]): Waits, up to the given seconds,
+                for the I/O process to have every subscription acknowledged
+        """
+        self._inbound = inbound
+        self._outbound = outbound
+        self._ready = ready
+        self._exact_handlers: Dict[str, List[Callable]] = {}
+        self._wildcard_handlers: Dict[str, List[Callable]] = {}
+        self._shared_groups: Dict[Tuple[str, str], SharedGroup] = {}
+        self._subscribed: Set[str] = set()
+        self._stopped = False
+
+    def publish(
+        self,
+        topic: str,
+        payload: Union[bytes, str],
+        qos: int = 0,
+        on_ack: Optional[Callable[[], None]] = None
+    ):
+        self._outbound.put_wait(encode_frame(FRAME_MESSAGE, topic, payload, qos))
+        if on_ack:
+            on_ack()
+
+    def subscribe(self, topic: str, callback: Callable, qos: int = 1):
+        topic_filter = subscription_filter(topic)
+        if topic != topic_filter:
+            group = topic.split("/", 2)[1]
+            self._shared_groups.setdefault((group, topic_filter), SharedGroup()).callbacks.append(callback)
+        elif has_wildcards(topic_filter):
+            self._wildcard_handlers.setdefault(topic_filter, []).append(callback)
+        else:
+            self._exact_handlers.setdefault(topic_filter, []).append(callback)
+        # the I/O process forwards each message of a subscription once, whatever the local subscribers
+        if topic not in self._subscribed:
+            self._subscribed.add(topic)
+            self._outbound.put_wait(encode_frame(FRAME_SUBSCRIBE, topic, qos=qos))
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        self._outbound.put_wait(encode_frame(FRAME_SYNC))
+        return self._ready(timeout)
+
+    def _deliver(self, frame: memoryview):
+        _, qos, topic, payload = decode_frame(frame)
+        msg = InMemoryMessage(topic=topic, payload=payload, qos=qos)
+        for handler in list(self._exact_handlers.get(msg.topic, [])):
+            handler(self, None, msg)
+        for topic_filter, handlers in list(self._wildcard_handlers.items()):
+            if topic_matches(topic_filter, msg.topic):
+                for handler in handlers:
+                    handler(self, None, msg)
+        for (_, topic_filter), group in list(self._shared_groups.items()):
+            if topic_matches(topic_filter, msg.topic):
+                group.pick()(self, None, msg)
+
+    def drain(self, max_messages: Optional[int] = None) -> int:
+        """Delivers the messages waiting in the inbound ring
+
+        Args:
+            max_messages (Optional[int]): Maximum number of messages, if None delivers all waiting
+
+        Returns:
+            int: Number of delivered messages
+        """
+        return self._inbound.drain(self._deliver, max_records=max_messages)
+
+    def loop_forever(self):
+        delay = 0.0
+        while not self._stopped:
+            if self.drain(256):
+                delay = 0.0
+                continue
+            sleep(delay)
+            delay = min(max(delay * 2, 1e-5), 1e-3)
+
+    async def serve(self, batch_size: int = 256):
+        """Delivers the inbound messages from the running event loop until stopped,
+            backing off up to a millisecond while the ring is empty
+
+        Args:
+            batch_size (int, optional): Messages delivered between yields. Defaults to 256.
+        """
+        delay = 0.0
+        while not self._stopped:
+            if self.drain(batch_size):
+                delay = 0.0
+                await asyncio.sleep(0)
+                continue
+            await asyncio.sleep(delay)
+            delay = min(max(delay * 2, 1e-5), 1e-3)
+
+    def stop(self):
+        if not self._stopped:
+            self._stopped = True
+            self._outbound.put_wait(encode_frame(FRAME_STOP), timeout=1)
@@ -1,38 +1,184 @@
 """Defines MQTT Solutions
 """
-import json
+from time import perf_counter, time
 import traceback
-from typing import Callable, Optional
-import paho.mqtt.client as paho
+from typing import Callable, List, Optional
 
-from cadeia.domain.entities import OrderInfo, ProductClasses
+from cadeia.adapters.codecs import decode_message, split_batch
+from cadeia.adapters.dedup import DedupCache, DedupSettings
+from cadeia.adapters.dispatch import Dispatcher
+from cadeia.adapters.metrics import REGISTRY, MetricsRegistry
+from cadeia.adapters.profiling import ComponentProfiler
+from cadeia.adapters.topics import TopicMatcher
+from cadeia.adapters.transports import Transport
+from cadeia.domain.catalog import Catalog
+
+
+def shared_topic(topic: str, share_group: Optional[str] = None) -> str:
+    """Builds the topic filter of a MQTT v5 shared subscription
+
+    Args:
+        topic (str): Topic filter to subscribe
+        share_group (Optional[str]): Name of the group sharing the subscription,
+            if None the filter is returned unchanged
+
+    Returns:
+        str: Topic filter to be subscribed
+    """
+    if not share_group:
+        return topic
+    return f"$share/{share_group}/{topic}"
 
 
 class Broker:
-    def __init__(self, client_callback: Callable[[Callable], paho.Client]):
-        self._client_callback = client_callback
-        self._client = None
+    def __init__(
+        self,
+        transport_callback: Callable[[], Transport],
+        dispatcher: Optional[Dispatcher] = None,
+        entity_id: Optional[str] = None,
+        component: str = "unknown",
+        metrics: MetricsRegistry = REGISTRY,
+        profiler: Optional[ComponentProfiler] = None,
+        dedup: Optional[DedupSettings] = DedupSettings(),
+        catalog: Optional[Catalog] = None
+    ):
+        """
+        Args:
+            transport_callback (Callable[[], Transport]): Returns the transport to subscribe
+            dispatcher (Optional[Dispatcher]): When given, the messages are decoded and handled
+                by its threads instead of by the thread of the transport
+            entity_id (Optional[str]): Id of the consuming entity, its messages are handled in
+                order by the same dispatcher thread
+            component (str): Kind of the consuming entity, label of its metrics
+            metrics (MetricsRegistry): Registry of the received messages and decode time metrics
+            profiler (Optional[ComponentProfiler]): When given, the handling of the messages is
+                attributed to the entity while the profiler targets it
+            dedup (Optional[DedupSettings]): Cache of the received message ids, the messages
+                whose id is in it are dropped before the callback. None disables it.
+            catalog (Optional[Catalog]): Catalog the skus of the messages are decoded with,
+                None when the products are the ProductClasses
+        """
+        self._transport_callback = transport_callback
+        self._dispatcher = dispatcher
+        self._key = entity_id or id(self)
+        self._subscriptions: List[str] = []
+        self._matcher: Optional[TopicMatcher] = None
+        self._component = component
+        self._profiler = profiler
+        self._catalog = catalog
+        self._received = metrics.counter(
+            "cadeia_messages_received_total", "Messages received by the components", ("component", "purpose"))
+        self._received_by_purpose = {
+            purpose: self._received.labels(component, purpose) for purpose in ("credit", "debit")
+        }
+        self._decode_time = metrics.histogram(
+            "cadeia_decode_seconds", "Time to decode a received message", ("component",)).labels(component)
+        self._decode_errors = metrics.counter(
+            "cadeia_decode_errors_total", "Received payloads that could not be decoded", ("component",)
+        ).labels(component)
+        self._rejected = metrics.counter(
+            "cadeia_messages_rejected_total", "Received messages dropped because their topic is not consumed",
+            ("component",)).labels(component)
+        self._dedup = DedupCache(dedup) if dedup and dedup.size > 0 else None
+        self._dedup_hits = metrics.counter(
+            "cadeia_dedup_hits_total", "Received messages dropped as repeats of a message already handled",
+            ("component",)).labels(component)
+        self._dedup_misses = metrics.counter(
+            "cadeia_dedup_misses_total", "Received messages whose id was not in the dedup cache", ("component",)
+        ).labels(component)
 
     def process_message(self, callback: Callable):
-        def decorated(client, userdata, msg):
+        def handle(raw_payload, received_at: float):
+            if self._profiler is not None and self._key in self._profiler.targets:
+                with self._profiler.attribute(self._key):
+                    handle_payloads(raw_payload, received_at)
+            else:
+                handle_payloads(raw_payload, received_at)
+
+        def handle_payloads(raw_payload, received_at: float):
             try:
-                processed_msg = json.loads(msg.payload)
-                callback(
-                    OrderInfo(
-                        entity_id=processed_msg["entity_id"],
-                        product_class=ProductClasses.A
-                        if processed_msg["product_class"] == "A" else ProductClasses.B
-                        if processed_msg["product_class"] == "B" else ProductClasses.C,
-                        quantity=processed_msg["quantity"]
-                    ),
-                    purpose=processed_msg["purpose"]
-                )
+                payloads = split_batch(raw_payload)
             except Exception as exc:
+                self._decode_errors.inc()
                 traceback.print_exc()
+                return
+            for payload in payloads:
+                started = perf_counter()
+                try:
+                    message = decode_message(payload, self._catalog)
+                except Exception as exc:
+                    self._decode_errors.inc()
+                    traceback.print_exc()
+                    continue
+                self._decode_time.observe(perf_counter() - started)
+                received = self._received_by_purpose.get(message.purpose)
+                if received is None:
+                    received = self._received.labels(self._component, message.purpose)
+                received.inc()
+                if self._dedup is not None and message.message_id:
+                    if self._dedup.seen(message.message_id):
+                        self._dedup_hits.inc()
+                        continue
+                    self._dedup_misses.inc()
+                trace = message.order_info.trace
+                if trace is not None:
+                    trace.add_hop(self._component, "received", received_at)
+                    trace.add_hop(self._component, "handled")
+                try:
+                    callback(message.order_info, purpose=message.purpose)
+                except Exception as exc:
+                    traceback.print_exc()
+
+        def decorated(client, userdata, msg):
+            # a transport shared by many components may hand over messages of topics
+            # subscribed by others, they are dropped before being decoded
+            if self._matcher is not None and not self._matcher.matches(msg.topic):
+                self._rejected.inc()
+                return
+            if self._dispatcher:
+                self._dispatcher.submit(self._key, handle, msg.payload, time())
+            else:
+                handle(msg.payload, time())
         return decorated
 
-    def start_consuming(self, topic: str, callback: Callable):
-        if not self._client:
-            self._client = self._client_callback(self.process_message(callback))
-        self._client.subscribe(topic, qos=1)  # type: ignore
-        self._client.loop_forever()  # type: ignore
+    def subscribe(self, topic: str, share_group: Optional[str] = None):
+        """Registers an extra topic to be consumed along with the one given to consume
+
+        Args:
+            topic (str): Topic filter to subscribe
+            share_group (Optional[str]): Shared subscription group, see start_consuming
+        """
+        self._subscriptions.append(shared_topic(topic, share_group))
+
+    def consume(self, topic: str, callback: Callable, share_group: Optional[str] = None):
+        """Subscribes to the topic without blocking, its messages are delivered
+            while the transport runs
+
+        Args:
+            topic (str): Topic filter to subscribe
+            callback (Callable): Called with the order info and purpose of each message
+            share_group (Optional[str]): When given, the topic is subscribed as a
+                shared subscription of this group, so each message is delivered
+                to only one of the group's consumers
+        """
+        transport = self._transport_callback()
+        message_callback = self.process_message(callback)
+        subscriptions = [*self._subscriptions, shared_topic(topic, share_group)]
+        self._matcher = TopicMatcher(subscriptions)
+        for subscription in subscriptions:
+            transport.subscribe(subscription, message_callback, qos=1)
+
+    def loop_forever(self):
+        """Blocks running the transport"""
+        self._transport_callback().loop_forever()
+
+    def start_consuming(self, topic: str, callback: Callable, share_group: Optional[str] = None):
+        """Subscribes to the topic and blocks consuming its messages, see consume
+
+        Args:
+            topic (str): Topic filter to subscribe
+            callback (Callable): Called with the order info and purpose of each message
+            share_group (Optional[str]): Shared subscription group
+        """
+        self.consume(topic, callback, share_group=share_group)
+        self.loop_forever()
@@ -1,13 +1,19 @@
 """Defines the store controller"""
 from logging import Logger
-from typing import Union
+from time import perf_counter
+from typing import Iterator, Optional, Tuple, Union
+from cadeia.adapters.metrics import REGISTRY, MetricsRegistry, ProductCounters, pending_orders, use_case_time
 from cadeia.adapters.solutions import Broker
+from cadeia.adapters.topics import topic
+from cadeia.adapters.tracing import TraceCollector
 from cadeia.app.store.requests import CreditStoreRequest, DebitStoreRequest
 
 from cadeia.app.store.use_cases import DebitStoreUseCase, StoreReceiveCreditUseCase
+from cadeia.domain.catalog import Catalog, Sku, new_store
 from cadeia.domain.entities import (
     InventoryState,
     OrderInfo,
+    PendingOrders,
     ProductClasses,
     ProductContainer,
     Store
@@ -24,11 +30,16 @@ class StoreController:
             store_debit_use_case: DebitStoreUseCase,
             broker: Broker,
             store: Union[Store, str],
-            logger: Logger
+            logger: Logger,
+            metrics: MetricsRegistry = REGISTRY,
+            traces: Optional[TraceCollector] = None,
+            catalog: Optional[Catalog] = None
     ):
         self._logger = logger
-        if isinstance(store, (str,)):
-            self._store: Store = Store(
+        if isinstance(store, (str,)) and catalog is not None:
+            self._store: Store = new_store(store, catalog)
+        elif isinstance(store, (str,)):
+            self._store = Store(
                 store_id=store,
                 warehouses={
                     ProductClasses.A: ProductContainer(
@@ -45,9 +56,9 @@ class StoreController:
                     )
                 },
                 pending_cd_orders={
-                    ProductClasses.A: [],
-                    ProductClasses.B: [],
-                    ProductClasses.C: []
+                    ProductClasses.A: PendingOrders(),
+                    ProductClasses.B: PendingOrders(),
+                    ProductClasses.C: PendingOrders()
                 }
             )
         else:
@@ -55,6 +66,22 @@ class StoreController:
         self._store_receive_credit_use_case = store_receive_credit_use_case
         self._store_debit_use_case = store_debit_use_case
         self._broker = broker
+        self._traces = traces
+        self._credit_time = use_case_time(metrics).labels("store_credit")
+        self._debit_time = use_case_time(metrics).labels("store_debit")
+        pending_orders(metrics).track(self._pending_orders)
+        stock_outs = metrics.counter(
+            "cadeia_stock_outs_total", "Purchases refused for lack of stock", ("product_class",))
+        self._stock_outs = ProductCounters(stock_outs)
+
+    def _pending_orders(self) -> Iterator[Tuple[Tuple[str, str, str], int]]:
+        """Returns the number of pending orders of each product class, read with the metrics"""
+        for product_class, orders in self._store.pending_cd_orders.items():
+            yield ("store", "pending_cd_orders", product_class.name), len(orders)
+
+    @property
+    def store_id(self) -> str:
+        return self._store.store_id
 
     def _receive_callback(self, order_info: OrderInfo, purpose: str):
         """Callback to be passed to the broker to receive messages
@@ -64,30 +91,40 @@ class StoreController:
         """
 
         if purpose == "credit":
-            self._logger.info(
-                f'store {self._store.store_id} received credit of {order_info.product_class.name}:{order_info.quantity}')
+            self._logger.info('store %s received credit of %s:%s',
+                              self._store.store_id, order_info.product_class.name, order_info.quantity)
+            started = perf_counter()
             self._store = self._store_receive_credit_use_case.execute(CreditStoreRequest(
                 store=self._store,
                 product_class=order_info.product_class,
-                quantity_of_items=order_info.quantity
+                quantity_of_items=order_info.quantity,
+                order_id=order_info.order_id or None
             )).store
+            self._credit_time.observe(perf_counter() - started)
+            if order_info.trace is not None and self._traces is not None:
+                order_info.trace.add_hop("store", "done")
+                self._traces.record(order_info.trace)
         else:
             self.buy(product_class=order_info.product_class, quantity=order_info.quantity)
 
-    def buy(self, product_class: ProductClasses, quantity: int) -> bool:
+    def buy(self, product_class: Union[ProductClasses, Sku], quantity: int) -> bool:
         """Access the debit store use case
 
         Args:
-            product_class (ProductClasses): Class of product to buy
+            product_class (Union[ProductClasses, Sku]): Class or sku of product to buy
             quantity (int): Quantity of product to receive
         """
         self._logger.info('store %s received buy order of %s:%s', self._store.store_id, product_class.name, quantity)
+        started = perf_counter()
         res = self._store_debit_use_case.execute(DebitStoreRequest(
             store=self._store,
             product_class=product_class,
             quantity_of_items=quantity
         ))
+        self._debit_time.observe(perf_counter() - started)
         self._store = res.store
+        if not res.success:
+            self._stock_outs[product_class].inc()
         self._logger.info(
             'store %s buy order of %s:%s result was %s store has %s items of %s remaining, state is %s',
             self._store.store_id,
@@ -100,6 +137,13 @@ class StoreController:
         )
         return res.success
 
+    def subscribe(self):
+        """Subscribes to the purchases and the credits of the store without blocking"""
+        self._logger.info("store subscribing to store/%s/debit and store/%s/credit",
+                          self._store.store_id, self._store.store_id)
+        self._broker.subscribe(topic("store", "debit", self._store.store_id))
+        self._broker.consume(topic("store", "credit", self._store.store_id), self._receive_callback)
+
     def start(self):
-        self._logger.info("store subscribing to store/%s", self._store.store_id)
-        self._broker.start_consuming(f"store/{self._store.store_id}", self._receive_callback)
+        self.subscribe()
+        self._broker.loop_forever()
@@ -1,31 +1,51 @@
 """Defines module strategies implementations"""
-import json
 from logging import Logger
-from typing import Any, Callable, Union
-import paho.mqtt.client as paho
+from random import random
+from typing import Callable
 
+from cadeia.adapters.codecs import JSON_CODEC, Codec
+from cadeia.adapters.metrics import REGISTRY, Counter, MetricsRegistry, ProductCounters
+from cadeia.adapters.topics import topic
+from cadeia.adapters.transports import Transport
 from cadeia.app.cd.strategies import CDRequestCreditStrategy, CDSendCreditStrategy
 from cadeia.app.factory.strategies import FactorySendCreditStrategy
 from cadeia.app.store.strategies import RequestCreditStrategy
 
 from cadeia.domain.entities import (
-    OrderInfo
+    OrderInfo,
+    TraceContext
 )
 
 
+def sent_counter(metrics: MetricsRegistry, component: str, purpose: str) -> Counter:
+    """Returns the counter of the messages of a purpose published by a kind of component"""
+    return metrics.counter(
+        "cadeia_messages_sent_total", "Messages published by the components", ("component", "purpose")
+    ).labels(component, purpose)
+
+
+def reorder_counters(metrics: MetricsRegistry, component: str) -> ProductCounters:
+    """Returns the counters of the orders a kind of component places to replenish its stock, by product class"""
+    reorders = metrics.counter(
+        "cadeia_reorders_total", "Orders placed to replenish the stock", ("component", "product_class"))
+    return ProductCounters(reorders, component)
+
+
 class PahoCDRequestCreditStrategy(CDRequestCreditStrategy):
     """Interface for the transmition of order requests"""
 
-    def __init__(self, paho_client_callback: Callable[[], paho.Client], logger: Logger) -> None:
-        self._client_callback = paho_client_callback
+    def __init__(
+        self,
+        transport_callback: Callable[[], Transport],
+        logger: Logger,
+        codec: Codec = JSON_CODEC,
+        metrics: MetricsRegistry = REGISTRY
+    ) -> None:
+        self._transport_callback = transport_callback
         self._logger = logger
-        self._has_started = False
-        self._client: Union[paho.Client, None] = None
-
-    def _decorate_publish_message(self, order_info: OrderInfo):
-        def decorated(*args, **kwargs):  # pylint: disable=unused-argument
-            self._publish(order_info)
-        return decorated
+        self._codec = codec
+        self._sent = sent_counter(metrics, "cd", "debit")
+        self._reorders = reorder_counters(metrics, "cd")
 
     def _publish(self, order_info: OrderInfo):
 
@@ -33,43 +53,34 @@ class PahoCDRequestCreditStrategy(CDRequestCreditStrategy):
                           order_info.product_class.name,
                           order_info.quantity
                           )
-        self._client.publish(  # type: ignore
-            topic="factory/any_factory",
-            payload=json.dumps(
-                {
-                    "entity_id": order_info.entity_id,
-                    "product_class": order_info.product_class.name,
-                    "quantity": order_info.quantity,
-                    "purpose": "debit"
-                })
+        if order_info.trace is not None:
+            order_info.trace.add_hop("cd", "sent")
+        self._transport_callback().publish(
+            topic=topic("factory", "debit"),
+            payload=self._codec.encode(order_info, "debit")
         )
+        self._sent.inc()
+        self._reorders[order_info.product_class].inc()
 
     def request_credit(self, order_info: OrderInfo):
         """Sends the order request to a broker"""
-        if not self._client:
-            self._client = self._client_callback(  # type: ignore
-                connection_callback=self._decorate_publish_message(order_info)
-            )
-        else:
-            self._publish(order_info)
-        if self._client and not self._has_started:
-            self._client.loop_start()
-            self._has_started = True
+        self._publish(order_info)
 
 
 class PahoCDSendCreditStrategy(CDSendCreditStrategy):
     """Interface for the transmition of credit to stores"""
 
-    def __init__(self, paho_client_callback: Callable[[], paho.Client], logger: Logger) -> None:
-        self._client_callback = paho_client_callback
+    def __init__(
+        self,
+        transport_callback: Callable[[], Transport],
+        logger: Logger,
+        codec: Codec = JSON_CODEC,
+        metrics: MetricsRegistry = REGISTRY
+    ) -> None:
+        self._transport_callback = transport_callback
         self._logger = logger
-        self._has_started = False
-        self._client: Union[None, paho.Client] = None
-
-    def _decorate_publish_message(self, order_info: OrderInfo):
-        def decorated(*args, **kwargs):  # pylint: disable=unused-argument
-            self._publish(order_info)
-        return decorated
+        self._codec = codec
+        self._sent = sent_counter(metrics, "cd", "credit")
 
     def _publish(self, order_info: OrderInfo):
 
@@ -78,42 +89,33 @@ class PahoCDSendCreditStrategy(CDSendCreditStrategy):
                           order_info.quantity
                           )
 
-        self._client.publish(  # type: ignore
-            f"store/{order_info.entity_id}",
-            payload=json.dumps({
-                "entity_id": order_info.entity_id,
-                "product_class": order_info.product_class.name,
-                "quantity": order_info.quantity,
-                "purpose": "credit"
-            })
+        if order_info.trace is not None:
+            order_info.trace.add_hop("cd", "sent")
+        self._transport_callback().publish(
+            topic("store", "credit", order_info.entity_id),
+            payload=self._codec.encode(order_info, "credit")
         )
+        self._sent.inc()
 
     def send_credit(self, order_info: OrderInfo):
         """Sends the order request to a broker"""
-        if not self._client:
-            self._client = self._client_callback(  # type: ignore
-                connection_callback=self._decorate_publish_message(order_info)
-            )
-        else:
-            self._publish(order_info)
-        if self._client and not self._has_started:
-            self._client.loop_start()
-            self._has_started = True
+        self._publish(order_info)
 
 
 class PahoFactorySendCreditStrategy(FactorySendCreditStrategy):
     """Interface for the transmition of order requests"""
 
-    def __init__(self, paho_client_callback: Callable[[], paho.Client], logger: Logger) -> None:
-        self._client_callback = paho_client_callback
+    def __init__(
+        self,
+        transport_callback: Callable[[], Transport],
+        logger: Logger,
+        codec: Codec = JSON_CODEC,
+        metrics: MetricsRegistry = REGISTRY
+    ) -> None:
+        self._transport_callback = transport_callback
         self._logger = logger
-        self._has_started = False
-        self._client: Union[None, paho.Client] = None
-
-    def _decorate_publish_message(self, order_info: OrderInfo):
-        def decorated(*args, **kwargs):  # pylint: disable=unused-argument
-            self._publish(order_info)
-        return decorated
+        self._codec = codec
+        self._sent = sent_counter(metrics, "factory", "credit")
 
     def _publish(self, order_info: OrderInfo):
 
@@ -122,42 +124,36 @@ class PahoFactorySendCreditStrategy(FactorySendCreditStrategy):
                           order_info.quantity
                           )
 
-        self._client.publish(  # type: ignore
-            f"cd/{order_info.entity_id}",
-            payload=json.dumps({
-                "entity_id": order_info.entity_id,
-                "product_class": order_info.product_class.name,
-                "quantity": order_info.quantity,
-                "purpose": "credit"
-            })
+        if order_info.trace is not None:
+            order_info.trace.add_hop("factory", "sent")
+        self._transport_callback().publish(
+            topic("cd", "credit", order_info.entity_id),
+            payload=self._codec.encode(order_info, "credit")
         )
+        self._sent.inc()
 
     def send_credit(self, order_info: OrderInfo):
         """Sends the order request to a broker"""
-        if not self._client:
-            self._client = self._client_callback(  # type: ignore
-                connection_callback=self._decorate_publish_message(order_info)
-            )
-        else:
-            self._publish(order_info)
-        if self._client and not self._has_started:
-            self._client.loop_start()
-            self._has_started = True
+        self._publish(order_info)
 
 
 class PahoRequestCreditStrategy(RequestCreditStrategy):
     """Interface for the transmition of order requests"""
 
-    def __init__(self, paho_client_callback: Callable[[Any], paho.Client], logger: Logger) -> None:
-        self._client_callback = paho_client_callback
+    def __init__(
+        self,
+        transport_callback: Callable[[], Transport],
+        logger: Logger,
+        codec: Codec = JSON_CODEC,
+        metrics: MetricsRegistry = REGISTRY,
+        trace_rate: float = 0.0
+    ) -> None:
+        self._transport_callback = transport_callback
         self._logger = logger
-        self._has_started = False
-        self._client: Union[None, paho.Client] = None
-
-    def _decorate_publish_message(self, order_info: OrderInfo):
-        def decorated(*args, **kwargs):  # pylint: disable=unused-argument
-            self._publish(order_info)
-        return decorated
+        self._codec = codec
+        self._sent = sent_counter(metrics, "store", "debit")
+        self._trace_rate = trace_rate
+        self._reorders = reorder_counters(metrics, "store")
 
     def _publish(self, order_info: OrderInfo):
         self._logger.info("store is requesting credit to cd of %s:%s",
@@ -165,25 +161,17 @@ class PahoRequestCreditStrategy(RequestCreditStrategy):
                           order_info.quantity
                           )
 
-        self._client.publish(  # type: ignore
-            topic="cd/any_cd",
-            payload=json.dumps(
-                {
-                    "entity_id": order_info.entity_id,
-                    "product_class": order_info.product_class.name,
-                    "quantity": order_info.quantity,
-                    "purpose": "debit"
-                })
+        if order_info.trace is None and self._trace_rate and random() < self._trace_rate:
+            order_info.trace = TraceContext(order_info.order_id)
+        if order_info.trace is not None:
+            order_info.trace.add_hop("store", "sent")
+        self._transport_callback().publish(
+            topic=topic("cd", "debit"),
+            payload=self._codec.encode(order_info, "debit")
         )
+        self._sent.inc()
+        self._reorders[order_info.product_class].inc()
 
     def request_credit(self, order_info: OrderInfo):
         """Sends the order request to a broker"""
-        if not self._client:
-            self._client = self._client_callback(  # type: ignore
-                connection_callback=self._decorate_publish_message(order_info)
-            )
-        else:
-            self._publish(order_info)
-        if self._client and not self._has_started:
-            self._client.loop_start()
-            self._has_started = True
+        self._publish(order_info)
@@ -0,0 +1,44 @@
+from time import sleep
+
+import pytest
+
+from cadeia.adapters.batching import BatchingTransport, BatchSettings
+from cadeia.adapters.codecs import BINARY_CODEC, JSON_CODEC
+from cadeia.adapters.solutions import Broker
+from cadeia.adapters.transports import InMemoryTransport
+from cadeia.domain.entities import OrderInfo, ProductClasses
+
+
+@pytest.mark.parametrize("compress", [False, True])
+def test_batch_is_fanned_out_by_the_broker(compress: bool):
+    """Tests that orders published together arrive as one message and reach the callback one by one"""
+    transport = InMemoryTransport()
+    batching = BatchingTransport(transport, BatchSettings(max_delay=60, max_messages=100, compress=compress))
+    received = []
+    Broker(lambda: transport).consume("store/loja", lambda order_info, purpose: received.append(order_info))
+
+    orders = [OrderInfo("loja", ProductClasses.A, quantity) for quantity in range(1, 4)]
+    batching.publish("store/loja", BINARY_CODEC.encode(orders[0], "credit"))
+    batching.publish("store/loja", JSON_CODEC.encode(orders[1], "credit"))
+    batching.publish("store/loja", BINARY_CODEC.encode(orders[2], "credit"))
+    assert transport.drain() == 0
+
+    batching.flush()
+    assert transport.drain() == 1
+    assert received == orders
+
+
+def test_batch_is_published_when_full_or_after_the_window():
+    """Tests both the size and the time flush triggers"""
+    transport = InMemoryTransport()
+    batching = BatchingTransport(transport, BatchSettings(max_delay=0.01, max_messages=2))
+    payload = BINARY_CODEC.encode(OrderInfo("cd", ProductClasses.C, 1), "credit")
+
+    batching.publish("cd/cd", payload)
+    batching.publish("cd/cd", payload)
+    assert transport.drain() == 1
+
+    batching.publish("cd/cd", payload)
+    sleep(0.1)
+    assert transport.drain() == 1
+    batching.stop()
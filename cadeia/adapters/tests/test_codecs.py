@@ -0,0 +1,121 @@
+from uuid import uuid4
+
+import pytest
+
+from cadeia.adapters.codecs import BINARY_CODEC, JSON_CODEC, decode_message, uuid_bytes
+from cadeia.domain.catalog import Catalog
+from cadeia.domain.entities import OrderInfo, ProductClasses, TraceContext
+
+
+@pytest.mark.parametrize("entity_id", [str(uuid4()), "loja_dos_sonhos", "ÇD"])
+@pytest.mark.parametrize("purpose", ["debit", "credit"])
+def test_binary_codec_round_trip(entity_id: str, purpose: str):
+    """Tests that orders survive encoding, both with uuid and free form entity ids"""
+    order = OrderInfo(entity_id=entity_id, product_class=ProductClasses.B, quantity=300)
+    message = BINARY_CODEC.decode(memoryview(BINARY_CODEC.encode(order, purpose)))
+    assert message.order_info == order
+    assert message.order_info.order_id == order.order_id
+    assert message.purpose == purpose
+
+
+@pytest.mark.parametrize("order_id", ["pedido-1", ""])
+def test_codecs_carry_free_form_and_missing_order_ids(order_id: str):
+    """Tests that order ids which are not uuids, or are unknown, survive encoding"""
+    order = OrderInfo(entity_id="cd", product_class=ProductClasses.C, quantity=5, order_id=order_id)
+    for codec in (BINARY_CODEC, JSON_CODEC):
+        assert codec.decode(codec.encode(order, "credit")).order_info.order_id == order_id
+
+
+@pytest.mark.parametrize("codec", [BINARY_CODEC, JSON_CODEC])
+def test_codecs_carry_the_trace(codec):
+    """Tests that the trace id and hops survive encoding, and that untraced orders stay untraced
+
+    Args:
+        codec (Codec): Codec tested
+    """
+    trace = TraceContext("pedido-1", [("store", "sent", 1700000000.25), ("cd", "received", 1700000000.5)])
+    order = OrderInfo(entity_id=str(uuid4()), product_class=ProductClasses.A, quantity=7, trace=trace)
+    assert decode_message(codec.encode(order, "debit")).order_info.trace == trace
+    order.trace = None
+    assert decode_message(codec.encode(order, "debit")).order_info.trace is None
+
+
+def test_binary_codec_encodes_negative_quantities():
+    """Tests that the zigzag varint keeps the sign of the quantity"""
+    order = OrderInfo(entity_id="cd", product_class=ProductClasses.A, quantity=-42)
+    assert BINARY_CODEC.decode(BINARY_CODEC.encode(order, "debit")).order_info.quantity == -42
+
+
+def test_binary_payload_is_much_smaller_than_json():
+    """Tests the size of an uuid addressed message in both formats"""
+    order = OrderInfo(entity_id=str(uuid4()), product_class=ProductClasses.C, quantity=20)
+    assert len(BINARY_CODEC.encode(order, "credit")) * 4 < len(JSON_CODEC.encode(order, "credit"))
+
+
+def test_decode_message_accepts_every_format():
+    """Tests that receivers accept payloads of any codec, so a deployment can mix them"""
+    order = OrderInfo(entity_id=str(uuid4()), product_class=ProductClasses.A, quantity=7)
+    for payload in [
+        BINARY_CODEC.encode(order, "credit"),
+        JSON_CODEC.encode(order, "credit"),
+        JSON_CODEC.encode(order, "credit").encode()
+    ]:
+        assert decode_message(payload).order_info == order
+
+
+@pytest.mark.parametrize("message_id", [str(uuid4()), "mensagem-1"])
+@pytest.mark.parametrize("codec", [BINARY_CODEC, JSON_CODEC])
+def test_codecs_carry_the_message_id(codec, message_id: str):
+    """Tests that the given message id survives encoding, and that each encoding gets a new one otherwise
+
+    Args:
+        codec (Codec): Codec tested
+        message_id (str): Id given to the message
+    """
+    order = OrderInfo(entity_id="cd", product_class=ProductClasses.B, quantity=3)
+    assert decode_message(codec.encode(order, "credit", message_id)).message_id == message_id
+    assert decode_message(codec.encode(order, "credit")).message_id != \
+        decode_message(codec.encode(order, "credit")).message_id
+
+
+
+@pytest.mark.parametrize("entity_id", [
+    "7A1F9A52-2A44-4D2B-9A0C-0F6E8E0C1D3A",
+    "7a1f9a52 2a44 4d2b 9a0c 0f6e8e0c1d3a",
+    "7a1f9a52-2a44-4d2b-9a0c--f6e8e0c1d3a",
+    "7a1f9a522a444d2b9a0c0f6e8e0c1d3a0000",
+    " a1f9a52-2a44-4d2b-9a0c-0f6e8e0c1d3a"
+])
+def test_only_canonical_uuids_are_packed(entity_id: str):
+    """Tests that ids which would not read back the same are written as strings
+
+    Args:
+        entity_id (str): Id looking like an uuid
+    """
+    assert uuid_bytes(entity_id) is None
+    order = OrderInfo(entity_id=entity_id, product_class=ProductClasses.A, quantity=1)
+    assert BINARY_CODEC.decode(BINARY_CODEC.encode(order, "debit")).order_info.entity_id == entity_id
+
+@pytest.mark.parametrize("codec", [BINARY_CODEC, JSON_CODEC])
+def test_codecs_carry_the_skus_of_a_catalog(codec):
+    """Tests that skus are decoded with the catalog, and refused without it by the binary codec
+
+    Args:
+        codec (Codec): Codec tested
+    """
+    catalog = Catalog.synthetic(10000)
+    order = OrderInfo(entity_id="loja", product_class=catalog.sku(9999), quantity=4)
+    message = decode_message(codec.encode(order, "debit"), catalog)
+    assert message.order_info.product_class is catalog.sku(9999)
+    if codec is BINARY_CODEC:
+        with pytest.raises(ValueError):
+            decode_message(codec.encode(order, "debit"))
+
+
+def test_binary_codec_keeps_the_version_of_product_class_messages():
+    """Tests that only the messages of skus get the new version, so older decoders still read the others"""
+    catalog = Catalog.synthetic(3)
+    legacy = BINARY_CODEC.encode(OrderInfo(entity_id="loja", product_class=ProductClasses.C, quantity=4), "debit")
+    sku = BINARY_CODEC.encode(OrderInfo(entity_id="loja", product_class=catalog.sku(2), quantity=4), "debit")
+    assert (legacy[1], sku[1]) == (BINARY_CODEC.CLASS_VERSION, BINARY_CODEC.VERSION)
+    assert decode_message(legacy, catalog).order_info.product_class is ProductClasses.C
@@ -0,0 +1,43 @@
+from cadeia.adapters.codecs import BINARY_CODEC, JSON_CODEC
+from cadeia.adapters.dedup import DedupCache, DedupSettings
+from cadeia.adapters.metrics import MetricsRegistry
+from cadeia.adapters.solutions import Broker
+from cadeia.adapters.transports import InMemoryTransport
+from cadeia.domain.entities import OrderInfo, ProductClasses
+
+
+def test_cache_forgets_ids_after_their_ttl_or_when_full():
+    """Tests the time and size eviction of the message ids"""
+    now = [0.0]
+    cache = DedupCache(DedupSettings(size=2, ttl=10), clock=lambda: now[0])
+    assert not cache.seen("a")
+    assert cache.seen("a")
+    now[0] = 5
+    assert not cache.seen("b")
+    assert not cache.seen("c")
+    assert not cache.seen("a")
+    now[0] = 20
+    assert not cache.seen("a")
+    assert len(cache) == 1
+
+
+def test_broker_drops_repeated_deliveries():
+    """Tests that a message delivered twice, once through each of two overlapping subscriptions,
+        reaches the callback once, and that messages without an id are never dropped
+    """
+    metrics = MetricsRegistry()
+    transport = InMemoryTransport()
+    received = []
+    broker = Broker(lambda: transport, entity_id="cd-1", component="cd", metrics=metrics)
+    broker.subscribe("cd/#")
+    broker.consume("cd/cd-1", lambda order_info, purpose: received.append(order_info))
+
+    order = OrderInfo(entity_id="store-1", product_class=ProductClasses.A, quantity=1)
+    transport.publish("cd/cd-1", BINARY_CODEC.encode(order, "debit"))
+    transport.publish("cd/cd-1", JSON_CODEC.encode(order, "debit"))
+    transport.publish("cd/cd-1", '{"entity_id": "store-1", "product_class": "A", "quantity": 1, "purpose": "debit"}')
+    transport.drain()
+
+    assert len(received) == 4
+    assert metrics.get("cadeia_dedup_misses_total", "cd") == 2
+    assert metrics.get("cadeia_dedup_hits_total", "cd") == 2
@@ -0,0 +1,46 @@
+import threading
+
+from cadeia.adapters.dispatch import Dispatcher
+
+
+def test_work_of_a_key_runs_in_order_on_one_thread():
+    """Tests that the work of each key keeps its order and always runs on the same thread"""
+    dispatcher = Dispatcher(workers=4)
+    ran = {key: [] for key in ("store-1", "store-2", "cd-1")}
+    threads = {key: set() for key in ran}
+
+    def work(key, number):
+        ran[key].append(number)
+        threads[key].add(threading.current_thread().name)
+
+    for number in range(200):
+        for key in ran:
+            dispatcher.submit(key, work, key, number)
+    dispatcher.join()
+    dispatcher.stop()
+    assert all(numbers == list(range(200)) for numbers in ran.values())
+    assert all(len(names) == 1 for names in threads.values())
+
+
+def test_slow_work_does_not_hold_other_queues_and_is_reported():
+    """Tests that a blocked key leaves the other queues running, and that its wait shows in the stats"""
+    dispatcher = Dispatcher(workers=2)
+    release = threading.Event()
+    done = threading.Event()
+    blocked_key = "store-1"
+    other_key = next(key for key in (f"store-{idx}" for idx in range(2, 100))
+                     if hash(key) % 2 != hash(blocked_key) % 2)
+
+    dispatcher.submit(blocked_key, release.wait)
+    dispatcher.submit(blocked_key, lambda: None)
+    dispatcher.submit(other_key, done.set)
+    assert done.wait(timeout=5)
+    assert sum(queue.depth for queue in dispatcher.stats()) == 1
+
+    release.set()
+    dispatcher.join()
+    stats = dispatcher.stats()
+    assert sum(queue.processed for queue in stats) == 3
+    assert max(queue.max_depth for queue in stats) >= 2
+    assert max(queue.max_wait for queue in stats) > 0
+    dispatcher.stop()
@@ -0,0 +1,50 @@
+from cadeia.adapters.transports import InMemoryTransport, topic_matches
+
+
+def test_topic_matches_follows_mqtt_wildcards():
+    """Tests the + and # wildcards, including # matching its parent level"""
+    assert topic_matches("cd/#", "cd/any_cd")
+    assert topic_matches("cd/#", "cd")
+    assert topic_matches("store/+", "store/loja_dos_sonhos")
+    assert not topic_matches("store/+", "store/loja_dos_sonhos/credit")
+    assert not topic_matches("cd/any_cd", "cd/other_cd")
+    assert not topic_matches("#", "$SYS/uptime")
+
+
+def test_messages_are_delivered_in_order_when_drained():
+    """Tests that the messages published while delivering are queued, not delivered reentrantly"""
+    transport = InMemoryTransport()
+    received = []
+
+    def forward(client, userdata, msg):  # pylint: disable=unused-argument
+        received.append(msg.payload)
+        transport.publish("store/b", b"forwarded")
+        received.append("after publish")
+
+    transport.subscribe("store/a", forward)
+    transport.subscribe("store/#", lambda client, userdata, msg: received.append(msg.topic))
+    transport.publish("store/a", b"first")
+
+    assert received == []
+    assert transport.drain() == 2
+    assert received == [b"first", "after publish", "store/a", "store/b"]
+
+
+def test_shared_subscription_delivers_each_message_to_one_member():
+    """Tests that the members of a share group are served in round robin"""
+    transport = InMemoryTransport()
+    received = {"first": 0, "second": 0, "broadcast": 0}
+
+    def count(name):
+        def callback(client, userdata, msg):  # pylint: disable=unused-argument
+            received[name] += 1
+        return callback
+
+    transport.subscribe("$share/cds/cd/any_cd", count("first"))
+    transport.subscribe("$share/cds/cd/any_cd", count("second"))
+    transport.subscribe("cd/#", count("broadcast"))
+    for _ in range(4):
+        transport.publish("cd/any_cd", b"")
+    transport.drain()
+
+    assert received == {"first": 2, "second": 2, "broadcast": 4}
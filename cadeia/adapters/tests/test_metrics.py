@@ -0,0 +1,96 @@
+import gc
+from logging import getLogger
+from urllib.request import urlopen
+
+from cadeia.adapters.metrics import MetricsExporter, MetricsRegistry, MetricsSettings
+from cadeia.adapters.transports import InMemoryTransport
+from cadeia.domain.entities import ProductClasses
+from cadeia.main.factories import get_cd, get_factory, get_store
+
+
+def test_metrics_are_rendered_in_the_prometheus_text_format():
+    """Tests the samples of a labelled counter and the cumulative buckets of a histogram"""
+    metrics = MetricsRegistry()
+    metrics.counter("sent_total", "Sent messages", ("purpose",)).labels("de\"bit").inc(2)
+    histogram = metrics.histogram("decode_seconds", "Decode time", buckets=(0.001, 0.01)).labels()
+    for value in (0.0005, 0.005, 0.5):
+        histogram.observe(value)
+    assert metrics.render() == (
+        "# HELP sent_total Sent messages\n"
+        "# TYPE sent_total counter\n"
+        'sent_total{purpose="de\\"bit"} 2\n'
+        "# HELP decode_seconds Decode time\n"
+        "# TYPE decode_seconds histogram\n"
+        'decode_seconds_bucket{le="0.001"} 1\n'
+        'decode_seconds_bucket{le="0.01"} 2\n'
+        'decode_seconds_bucket{le="+Inf"} 3\n'
+        "decode_seconds_sum 0.5055\n"
+        "decode_seconds_count 3\n"
+    )
+
+
+def test_chain_updates_the_component_metrics():
+    """Tests that a purchase without stock counts a stock-out and a reorder, and that the
+        messages it triggers through the cd and the factory are counted on both sides
+    """
+    metrics = MetricsRegistry()
+    transport = InMemoryTransport()
+    logger = getLogger("test_metrics")
+    components = [
+        get_factory(logger, transport_callback=lambda: transport, metrics=metrics),
+        get_cd(logger, transport_callback=lambda: transport, metrics=metrics),
+        store := get_store(logger, transport_callback=lambda: transport, metrics=metrics)
+    ]
+    for component in components:
+        component.subscribe()
+
+    assert not store.buy(ProductClasses.A, 1)
+    assert metrics.get("cadeia_pending_orders", "store", "pending_cd_orders", "A") == 1
+    while transport.drain():
+        pass
+
+    assert metrics.get("cadeia_stock_outs_total", "A") == 1
+    assert metrics.get("cadeia_reorders_total", "store", "A") == 1
+    assert metrics.get("cadeia_reorders_total", "cd", "A") >= 1
+    assert metrics.get("cadeia_messages_sent_total", "store", "debit") == 1
+    assert metrics.get("cadeia_messages_received_total", "cd", "debit") == 1
+    assert metrics.get("cadeia_messages_received_total", "store", "credit") == 1
+    assert metrics.get("cadeia_pending_orders", "store", "pending_cd_orders", "A") == 0
+    assert metrics.get("cadeia_use_case_seconds", "factory_debit") >= 1
+    assert metrics.get("cadeia_decode_seconds", "store") == 1
+
+
+def test_collected_controllers_stop_being_read():
+    """Tests that the pending order gauges tracked by a controller do not keep it alive, and
+        leave the metrics once it is collected
+    """
+    metrics = MetricsRegistry()
+    transport = InMemoryTransport()
+    store = get_store(getLogger("test_metrics"), transport_callback=lambda: transport, metrics=metrics)
+    store.subscribe()
+    store.buy(ProductClasses.B, 1)
+    assert metrics.get("cadeia_pending_orders", "store", "pending_cd_orders", "B") == 1
+
+    del store
+    transport = None
+    gc.collect()
+    assert metrics.get("cadeia_pending_orders", "store", "pending_cd_orders", "B") == 0
+
+def test_exporter_serves_and_writes_the_metrics(tmp_path):
+    """Tests the HTTP endpoint and the file written when the exporter stops
+
+    Args:
+        tmp_path (Path): Temporary directory
+    """
+    metrics = MetricsRegistry()
+    metrics.gauge("pending_orders", "Pending orders").labels().set(3)
+    exporter = MetricsExporter(
+        MetricsSettings(port=0, file=str(tmp_path / "{process}.prom"), interval=60), metrics, process="shard-1"
+    ).start()
+    try:
+        with urlopen(f"http://127.0.0.1:{exporter.port}/metrics", timeout=5) as response:
+            served = response.read().decode()
+    finally:
+        exporter.stop()
+    assert "pending_orders 3\n" in served
+    assert (tmp_path / "shard-1.prom").read_text() == served
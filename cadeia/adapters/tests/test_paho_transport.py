@@ -0,0 +1,62 @@
+from itertools import count
+from unittest.mock import MagicMock
+
+from cadeia.adapters.transports import InMemoryMessage, PahoTransport
+
+
+def get_fake_client(message_callback, connection_callback):
+    client = MagicMock()
+    client.on_message = message_callback
+    client.on_connect = connection_callback
+    mids = count(1)
+    client.subscribe.side_effect = lambda topic, qos: (0, next(mids))
+    return client
+
+
+def test_transport_is_ready_once_every_subscription_is_acknowledged():
+    """Tests that the readiness waits for the connection and for the subacks of the subscriptions"""
+    transport = PahoTransport(get_fake_client)
+    transport.connect()
+    transport.subscribe("store/a", MagicMock())
+    transport.subscribe("cd/#", MagicMock())
+    assert not transport.wait_ready(timeout=0)
+
+    client = transport._get_client()  # pylint: disable=protected-access
+    client.loop_start.assert_called_once()
+    client.on_connect(client, None, {}, 0)
+    assert client.subscribe.call_count == 2
+    client.on_subscribe(client, None, 1, [1])
+    assert not transport.wait_ready(timeout=0)
+    client.on_subscribe(client, None, 2, [1])
+    assert transport.wait_ready(timeout=0)
+
+    transport.subscribe("factory/#", MagicMock())
+    assert not transport.wait_ready(timeout=0)
+    client.on_subscribe(client, None, 3, [1])
+    assert transport.wait_ready(timeout=0)
+
+    client.on_disconnect(client, None, 0)
+    assert not transport.wait_ready(timeout=0)
+
+
+def test_shared_subscription_hands_each_message_to_one_local_member():
+    """Tests that the members of a share group in the process take turns on the messages the
+        broker delivers once, while a plain subscription to the same filter gets all of them
+    """
+    transport = PahoTransport(get_fake_client)
+    members = [MagicMock(), MagicMock()]
+    plain = MagicMock()
+    for member in members:
+        transport.subscribe("$share/cds/cd/requests/debit", member)
+    transport.subscribe("cd/requests/debit", plain)
+    client = transport._get_client()  # pylint: disable=protected-access
+    client.on_connect(client, None, {}, 0)
+    assert client.subscribe.call_count == 2
+
+    messages = [InMemoryMessage(topic="cd/requests/debit", payload=str(number)) for number in range(4)]
+    for msg in messages:
+        client.on_message(client, None, msg)
+
+    assert [call.args[2] for call in members[0].call_args_list] == messages[0::2]
+    assert [call.args[2] for call in members[1].call_args_list] == messages[1::2]
+    assert plain.call_count == 4
@@ -0,0 +1,64 @@
+from time import monotonic
+
+from cadeia.adapters.codecs import JSON_CODEC
+from cadeia.adapters.profiling import ComponentProfiler
+from cadeia.adapters.solutions import Broker
+from cadeia.adapters.transports import InMemoryTransport
+from cadeia.domain.entities import OrderInfo, ProductClasses
+
+
+def busy_store_use_case(order_info, purpose):  # pylint: disable=unused-argument
+    deadline = monotonic() + 0.2
+    while monotonic() < deadline:
+        pass
+
+
+def idle_cd_use_case(order_info, purpose):  # pylint: disable=unused-argument
+    pass
+
+
+def test_control_message_profiles_only_the_component(tmp_path):
+    """Tests that a profile started by a control message keeps the stacks of its component
+        handling messages, and is written tagged with the component when stopped
+
+    Args:
+        tmp_path (Path): Temporary directory
+    """
+    transport = InMemoryTransport()
+    profiler = ComponentProfiler(str(tmp_path), interval=0.001)
+    Broker(lambda: transport, entity_id="store-1", component="store", profiler=profiler).consume(
+        "store/store-1", busy_store_use_case)
+    Broker(lambda: transport, entity_id="cd-1", component="cd", profiler=profiler).consume(
+        "cd/cd-1", idle_cd_use_case)
+    transport.subscribe("control/+/profile", profiler.handle_control({"store-1": "store", "cd-1": "cd"}))
+
+    transport.publish("control/store-1/profile", "start 60")
+    transport.publish("control/unknown/profile", "start")
+    transport.drain()
+    assert profiler.targets == {"store-1"}
+    order = OrderInfo(entity_id="store-1", product_class=ProductClasses.A, quantity=1)
+    transport.publish("store/store-1", JSON_CODEC.encode(order, "debit"))
+    transport.publish("cd/cd-1", JSON_CODEC.encode(order, "debit"))
+    transport.drain()
+    transport.publish("control/store-1/profile", "stop")
+    transport.drain()
+
+    assert not profiler.targets
+    [profile] = tmp_path.glob("profile-store-store-1-*.collapsed")
+    stacks = profile.read_text().splitlines()
+    assert stacks and all("busy_store_use_case" in stack for stack in stacks)
+
+
+def test_process_profile_samples_every_thread(tmp_path):
+    """Tests that toggling the process profile twice writes the samples of the other threads
+
+    Args:
+        tmp_path (Path): Temporary directory
+    """
+    profiler = ComponentProfiler(str(tmp_path), interval=0.001)
+    profiler.toggle()
+    busy_store_use_case(None, "debit")
+    profiler.toggle()
+    [profile] = tmp_path.glob("profile-process-*.collapsed")
+    assert any(stack.startswith("MainThread;") and "busy_store_use_case" in stack
+               for stack in profile.read_text().splitlines())
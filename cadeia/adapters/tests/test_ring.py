@@ -0,0 +1,69 @@
+import multiprocessing
+from random import Random
+
+import pytest
+
+from cadeia.adapters.ring import FRAME_MESSAGE, RingBuffer, decode_frame, encode_frame
+
+
+def test_records_keep_their_order_across_wraps():
+    """Tests that records of any size come out in order, wrapping around the end of a small ring"""
+    ring = RingBuffer.create(256)
+    random = Random(0)
+    sent, received = [], []
+    try:
+        for idx in range(5000):
+            if random.random() < 0.55:
+                record = bytes([idx % 251]) * random.randint(0, ring.max_record)
+                if ring.put(record):
+                    sent.append(record)
+            elif (record := ring.get()) is not None:
+                received.append(record)
+        while (record := ring.get()) is not None:
+            received.append(record)
+    finally:
+        ring.close()
+    assert sent and received == sent
+
+
+def test_full_ring_refuses_records():
+    """Tests that a full ring refuses records until the consumer frees space, and rejects oversized ones"""
+    ring = RingBuffer.create(64)
+    try:
+        assert ring.put(bytes(20)) and ring.put(bytes(20))
+        assert not ring.put(bytes(20))
+        assert ring.get() == bytes(20)
+        assert ring.put(bytes(20))
+        with pytest.raises(ValueError):
+            ring.put(bytes(ring.max_record + 1))
+    finally:
+        ring.close()
+
+
+def produce(name: str, count: int):
+    ring = RingBuffer.attach(name)
+    for idx in range(count):
+        ring.put_wait(encode_frame(FRAME_MESSAGE, f"store/{idx}", idx.to_bytes(4, "little") * (1 + idx % 16)))
+    ring.close()
+
+
+def test_frames_cross_processes_in_order():
+    """Tests that a frame producer process and a consumer process exchange every frame in order"""
+    ring = RingBuffer.create(4096)
+    received = []
+
+    def consume(frame):
+        _, _, topic, payload = decode_frame(frame)
+        received.append((topic, bytes(payload)))
+
+    producer = multiprocessing.Process(target=produce, args=(ring.name, 20000))
+    producer.start()
+    try:
+        while len(received) < 20000 and (producer.is_alive() or len(ring)):
+            ring.drain(consume)
+        producer.join()
+    finally:
+        ring.close()
+    assert received == [
+        (f"store/{idx}", idx.to_bytes(4, "little") * (1 + idx % 16)) for idx in range(20000)
+    ]
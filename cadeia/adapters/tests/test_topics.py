@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+import pytest
+
+from cadeia.adapters.codecs import JSON_CODEC
+from cadeia.adapters.metrics import MetricsRegistry
+from cadeia.adapters.solutions import Broker
+from cadeia.adapters.topics import TopicMatcher
+from cadeia.adapters.transports import topic_matches
+from cadeia.domain.entities import OrderInfo, ProductClasses
+
+TOPICS = ["cd", "cd/cd-1", "cd/cd-1/credit", "cd/requests/debit", "store//credit", "$SYS/load", "x/cd-1/credit"]
+
+
+@pytest.mark.parametrize("topic_filter", ["cd/#", "#", "+/cd-1/+", "cd/+/credit", "cd/requests/debit", "$SYS/#"])
+def test_matcher_follows_the_mqtt_rules(topic_filter: str):
+    """Tests that the compiled filters match the same topics as topic_matches
+
+    Args:
+        topic_filter (str): Filter compiled
+    """
+    matcher = TopicMatcher([f"$share/cds/{topic_filter}"])
+    for topic in TOPICS:
+        assert matcher.matches(topic) == topic_matches(topic_filter, topic), topic
+
+
+def test_broker_rejects_topics_it_does_not_consume_before_decoding():
+    """Tests that a message of a topic subscribed by another component of the transport
+        is dropped without being decoded, and that the consumed topics are handled
+    """
+    metrics = MetricsRegistry()
+    transport = MagicMock()
+    received = []
+    broker = Broker(lambda: transport, entity_id="cd-1", component="cd", metrics=metrics)
+    broker.subscribe("cd/cd-1/credit")
+    broker.consume("cd/requests/debit", lambda order_info, purpose: received.append(purpose), share_group="cds")
+    handle = transport.subscribe.call_args.args[1]
+
+    handle(None, None, SimpleNamespace(topic="cd/cd-2/credit", payload=b"not even a message"))
+    order = OrderInfo(entity_id="store-1", product_class=ProductClasses.A, quantity=1)
+    handle(None, None, SimpleNamespace(topic="cd/requests/debit", payload=JSON_CODEC.encode(order, "debit")))
+    handle(None, None, SimpleNamespace(topic="cd/cd-1/credit", payload=JSON_CODEC.encode(order, "credit")))
+
+    assert received == ["debit", "credit"]
+    assert metrics.get("cadeia_messages_rejected_total", "cd") == 1
+    assert metrics.get("cadeia_decode_errors_total", "cd") == 0
@@ -0,0 +1,44 @@
+from logging import getLogger
+
+from cadeia.adapters.metrics import MetricsRegistry
+from cadeia.adapters.tracing import TraceCollector, breakdown
+from cadeia.adapters.transports import InMemoryTransport
+from cadeia.domain.entities import ProductClasses, TraceContext
+from cadeia.main.factories import get_cd, get_factory, get_store
+
+
+def test_breakdown_assigns_each_interval_to_its_stage():
+    """Tests the stages of an order the cd had to request from the factory"""
+    trace = TraceContext("pedido-1", [
+        ("store", "sent", 0.0), ("cd", "received", 1.0), ("cd", "handled", 1.5), ("cd", "sent", 2.0),
+        ("factory", "received", 3.0), ("factory", "handled", 3.25), ("factory", "sent", 4.0),
+        ("cd", "received", 5.0), ("cd", "handled", 5.5), ("cd", "sent", 6.0),
+        ("store", "received", 7.0), ("store", "handled", 7.5), ("store", "done", 8.0)
+    ])
+    result = breakdown(trace)
+    assert (result.replenish, result.transit, result.queueing, result.use_case, result.factory_turnaround) == \
+        (8.0, 4.0, 1.5, 1.5, 1.0)
+
+
+def test_traced_orders_go_through_the_factory_and_back():
+    """Tests that a traced store order carries the hops of the cd and factory messages it sets off"""
+    metrics = MetricsRegistry()
+    traces = TraceCollector(rate=1.0, metrics=metrics)
+    transport = InMemoryTransport()
+    logger = getLogger("test_tracing")
+    store = get_store(logger, transport_callback=lambda: transport, metrics=metrics, traces=traces)
+    for component in (
+        get_factory(logger, transport_callback=lambda: transport, metrics=metrics),
+        get_cd(logger, transport_callback=lambda: transport, metrics=metrics),
+        store
+    ):
+        component.subscribe()
+
+    store.buy(ProductClasses.A, 1)
+    while transport.drain():
+        pass
+
+    assert len(traces.recent) == 1
+    order = traces.recent[0]
+    assert order.hops == 13 and order.factory_turnaround > 0
+    assert metrics.get("cadeia_order_replenish_seconds") == 1
@@ -0,0 +1,69 @@
+"""Defines the topics the components exchange messages through, and the matcher
+    the Broker checks the topics of the received messages with
+
+Each topic names the kind of the addressed component, then its id, or requests
+when any component of the kind may handle the message, then the purpose:
+
+    store/<store id>/debit      purchases of the clients
+    store/<store id>/credit     deliveries of the cds
+    cd/requests/debit           orders of the stores, to any cd
+    cd/<cd id>/credit           deliveries of the factories
+    factory/requests/debit      orders of the cds, to any factory
+
+So each component subscribes only to the messages meant for it.
+"""
+import re
+from typing import Iterable, Optional, Pattern
+
+from cadeia.adapters.transports import has_wildcards, subscription_filter
+
+REQUESTS = "requests"
+
+
+def topic(component: str, purpose: str, entity_id: str = REQUESTS) -> str:
+    """Builds the topic of a message
+
+    Args:
+        component (str): Kind of the addressed component, store, cd or factory
+        purpose (str): debit or credit
+        entity_id (str, optional): Id of the addressed component. Defaults to any component of the kind.
+
+    Returns:
+        str: Topic of the message
+    """
+    return f"{component}/{entity_id}/{purpose}"
+
+
+def _filter_pattern(topic_filter: str) -> str:
+    levels = topic_filter.split("/")
+    pattern = "/".join(
+        "[^/]*" if level == "+" else "" if level == "#" else re.escape(level) for level in levels
+    )
+    if levels[-1] == "#":
+        pattern = pattern[:-1] + "(?:/.*)?" if len(levels) > 1 else ".*"
+    # as in MQTT, filters starting with a wildcard do not match the $ topics
+    return f"(?!\\$){pattern}" if levels[0] in ("+", "#") else pattern
+
+
+class TopicMatcher:
+    """Topic filters compiled once, checking the topic of every received message
+        with a set lookup, or a single regular expression when there are wildcards
+    """
+
+    def __init__(self, topic_filters: Iterable[str]):
+        """
+        Args:
+            topic_filters (Iterable[str]): MQTT topic filters, shared subscriptions included
+        """
+        filters = {subscription_filter(topic_filter) for topic_filter in topic_filters}
+        self._exact = frozenset(topic_filter for topic_filter in filters if not has_wildcards(topic_filter))
+        wildcards = sorted(topic_filter for topic_filter in filters if has_wildcards(topic_filter))
+        self._pattern: Optional[Pattern[str]] = re.compile(
+            "|".join(f"(?:{_filter_pattern(topic_filter)})" for topic_filter in wildcards)
+        ) if wildcards else None
+
+    def matches(self, topic_name: str) -> bool:
+        """Checks if a topic matches any of the filters, following the MQTT rules"""
+        if topic_name in self._exact:
+            return True
+        return self._pattern is not None and self._pattern.fullmatch(topic_name) is not None
@@ -0,0 +1,116 @@
+"""Defines the collector rebuilding the time to replenish of the traced orders
+    from the hops their messages went through
+
+The hops are taken with the wall clock of each process, so the breakdown of
+orders crossing hosts is only as good as the synchronization of their clocks.
+"""
+from collections import deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from cadeia.adapters.metrics import REGISTRY, MetricsRegistry
+from cadeia.domain.entities import TraceContext
+
+STAGES = ("transit", "queueing", "use_case", "pending", "factory_turnaround")
+
+
+@dataclass
+class OrderBreakdown:
+    """Where the time to replenish of an order went, in seconds
+
+    Args:
+        trace_id (str): Id of the order that started the trace
+        replenish (float): From the store requesting the order to the store handling its credit
+        transit (float): Between a component publishing a message and the next one receiving it
+        queueing (float): Between a component receiving a message and starting to handle it
+        use_case (float): Handling the messages, up to publishing the next one
+        pending (float): Waiting at the cd for a credit of another order to fulfill this one
+        factory_turnaround (float): From the factory receiving the order to publishing its credit
+        hops (int): Number of events of the trace
+    """
+    trace_id: str
+    replenish: float = 0.0
+    transit: float = 0.0
+    queueing: float = 0.0
+    use_case: float = 0.0
+    pending: float = 0.0
+    factory_turnaround: float = 0.0
+    hops: int = 0
+
+
+def breakdown(trace: TraceContext) -> OrderBreakdown:
+    """Splits the time between the first and the last hop of a trace in stages
+
+    Args:
+        trace (TraceContext): Trace of a fulfilled order
+
+    Returns:
+        OrderBreakdown: Time of each stage
+    """
+    result = OrderBreakdown(trace_id=trace.trace_id, hops=len(trace.hops))
+    if not trace.hops:
+        return result
+    result.replenish = trace.hops[-1][2] - trace.hops[0][2]
+    for (_, _, previous), (component, event, at) in zip(trace.hops, trace.hops[1:]):
+        elapsed = at - previous
+        if event == "received":
+            result.transit += elapsed
+        elif component == "factory":
+            result.factory_turnaround += elapsed
+        elif event == "handled":
+            result.queueing += elapsed
+        elif event == "resumed":
+            result.pending += elapsed
+        else:
+            result.use_case += elapsed
+    return result
+
+
+class TraceCollector:
+    """Collects the traces of the fulfilled orders into latency histograms,
+        keeping the breakdown of the most recent ones
+    """
+
+    def __init__(self, rate: float = 0.01, metrics: MetricsRegistry = REGISTRY, keep: int = 1000):
+        """
+        Args:
+            rate (float, optional): Fraction of the store orders traced. Defaults to 0.01.
+            metrics (MetricsRegistry, optional): Registry of the replenish and stage histograms
+            keep (int, optional): Number of recent breakdowns kept. Defaults to 1000.
+        """
+        self.rate = rate
+        buckets = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+        self._replenish = metrics.histogram(
+            "cadeia_order_replenish_seconds", "Time from a store order to its credit, of the traced orders",
+            buckets=buckets).labels()
+        stages = metrics.histogram(
+            "cadeia_order_stage_seconds", "Time of the traced orders spent in each stage", ("stage",),
+            buckets=buckets)
+        self._stages = {stage: stages.labels(stage) for stage in STAGES}
+        self.recent: Deque[OrderBreakdown] = deque(maxlen=keep)
+
+    def record(self, trace: TraceContext) -> OrderBreakdown:
+        """Adds the trace of a fulfilled order
+
+        Args:
+            trace (TraceContext): Trace carried by the credit of the order
+
+        Returns:
+            OrderBreakdown: Time of each stage of the order
+        """
+        result = breakdown(trace)
+        self._replenish.observe(result.replenish)
+        for stage, histogram in self._stages.items():
+            histogram.observe(getattr(result, stage))
+        self.recent.append(result)
+        return result
+
+    def summary(self) -> Optional[Dict[str, float]]:
+        """Returns the mean replenish and stage times of the recent orders, None if there is none"""
+        recent = list(self.recent)
+        if not recent:
+            return None
+        return {
+            stage: sum(getattr(order, stage) for order in recent) / len(recent)
+            for stage in ("replenish", *STAGES)
+        }
@@ -0,0 +1,490 @@
+"""Defines the transports the brokers and strategies exchange messages through
+"""
+from abc import ABC, abstractmethod
+import asyncio
+from collections import OrderedDict, deque
+from dataclasses import dataclass
+import threading
+from typing import Callable, Deque, Dict, List, Optional, Set, Tuple, Union
+import paho.mqtt.client as paho
+
+
+def subscription_filter(topic: str) -> str:
+    """Removes the shared subscription prefix of a topic filter
+
+    Args:
+        topic (str): Topic filter, possibly in the $share/<group>/<filter> form
+
+    Returns:
+        str: Filter that the topics of the received messages match
+    """
+    if topic.startswith("$share/"):
+        return topic.split("/", 2)[2]
+    return topic
+
+
+def has_wildcards(topic_filter: str) -> bool:
+    """Checks if a topic filter has MQTT wildcards
+
+    Args:
+        topic_filter (str): Topic filter
+
+    Returns:
+        bool: True if the filter has + or # levels
+    """
+    return "+" in topic_filter or "#" in topic_filter
+
+
+def topic_matches(topic_filter: str, topic: str) -> bool:
+    """Checks if a topic matches a topic filter following the MQTT rules
+
+    Args:
+        topic_filter (str): Topic filter, with + and # wildcards
+        topic (str): Topic of a message
+
+    Returns:
+        bool: True if the topic matches the filter
+    """
+    filter_levels = topic_filter.split("/")
+    topic_levels = topic.split("/")
+    if topic.startswith("$") and filter_levels[0] in ("+", "#"):
+        return False
+    for idx, level in enumerate(filter_levels):
+        if level == "#":
+            return True
+        if idx >= len(topic_levels) or level not in ("+", topic_levels[idx]):
+            return False
+    return len(filter_levels) == len(topic_levels)
+
+
+class Transport(ABC):
+    """Interface of the publish/subscribe channel used by the components"""
+
+    @abstractmethod
+    def publish(
+        self,
+        topic: str,
+        payload: Union[bytes, str],
+        qos: int = 0,
+        on_ack: Optional[Callable[[], None]] = None
+    ):
+        """Publishes a message
+
+        Args:
+            topic (str): Topic of the message
+            payload (Union[bytes, str]): Message payload
+            qos (int, optional): MQTT quality of service. Defaults to 0.
+            on_ack (Optional[Callable[[], None]]): Called once the message is
+                acknowledged, from the thread running the transport
+        """
+        ...
+
+    @abstractmethod
+    def subscribe(self, topic: str, callback: Callable, qos: int = 1):
+        """Subscribes to a topic filter, dispatching its messages to the callback
+
+        Args:
+            topic (str): Topic filter, shared subscriptions are accepted
+            callback (Callable): Paho like message callback, called with client, userdata and msg
+            qos (int, optional): MQTT quality of service. Defaults to 1.
+        """
+        ...
+
+    @abstractmethod
+    def loop_forever(self):
+        """Blocks the caller while the transport is running"""
+        ...
+
+    @abstractmethod
+    def stop(self):
+        """Stops the transport and releases the callers of loop_forever"""
+        ...
+
+    def connect(self):
+        """Opens the connection right away, instead of on the first publish or subscription"""
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until the connection is open and every subscription is in place
+
+        Args:
+            timeout (Optional[float]): Maximum seconds to wait, if None waits forever
+
+        Returns:
+            bool: False if the timeout expired before the transport was ready
+        """
+        return True
+
+    async def serve(self):
+        """Runs the transport from an asyncio event loop until it is stopped"""
+        await asyncio.get_running_loop().run_in_executor(None, self.loop_forever)
+
+
+class SharedGroup:
+    """Subscribers of a shared subscription, served in round robin"""
+
+    def __init__(self):
+        self.callbacks: List[Callable] = []
+        self._next = 0
+
+    def pick(self) -> Callable:
+        callback = self.callbacks[self._next % len(self.callbacks)]
+        self._next += 1
+        return callback
+
+
+class PahoTransport(Transport):
+    """Single paho client shared by every broker and strategy of a process
+
+    The client is connected on first use and its network loop runs in one
+    background thread, or in the given asyncio event loop, which then must be
+    the thread using the transport. Messages published before the connection
+    is acknowledged are sent as soon as it is, and subscriptions are renewed
+    on every connect. The transport is ready once it is connected and the
+    broker has acknowledged every subscription. The broker delivers each message
+    of a shared subscription once to the process, so it is handed to only one of
+    the local members of the share group, in round robin.
+    """
+
+    def __init__(
+        self,
+        client_callback: Callable[..., paho.Client],
+        loop: Optional[asyncio.AbstractEventLoop] = None
+    ):
+        self._client_callback = client_callback
+        self._loop = loop
+        self._misc_task: Optional[asyncio.Task] = None
+        self._client: Optional[paho.Client] = None
+        self._lock = threading.RLock()
+        self._connected = False
+        self._stopped = threading.Event()
+        self._pending_publishes: List[Tuple[str, Union[bytes, str], int, Optional[Callable]]] = []
+        self._subscriptions: Dict[str, int] = {}
+        self._pending_subscriptions: Set[int] = set()
+        self._ready = threading.Event()
+        self._exact_handlers: Dict[str, List[Callable]] = {}
+        self._wildcard_handlers: Dict[str, List[Callable]] = {}
+        self._shared_groups: Dict[Tuple[str, str], SharedGroup] = {}
+        self._ack_lock = threading.Lock()
+        self._ack_callbacks: Dict[int, Callable[[], None]] = {}
+        self._early_acks: "OrderedDict[int, None]" = OrderedDict()
+
+    def _get_client(self) -> paho.Client:
+        with self._lock:
+            if not self._client:
+                self._client = self._client_callback(
+                    message_callback=self._on_message,
+                    connection_callback=self._on_connect
+                )
+                self._client.on_disconnect = self._on_disconnect
+                self._client.on_publish = self._on_publish
+                self._client.on_subscribe = self._on_subscribe
+                if self._loop:
+                    self._attach_to_loop(self._client)
+                else:
+                    self._client.loop_start()
+            return self._client
+
+    def _attach_to_loop(self, client: paho.Client):
+        client.on_socket_open = self._on_socket_open
+        client.on_socket_close = self._on_socket_close
+        client.on_socket_register_write = self._on_socket_register_write
+        client.on_socket_unregister_write = self._on_socket_unregister_write
+        # the client callback has already connected, so the socket is open
+        self._on_socket_open(client, None, client.socket())
+        if client.want_write():
+            self._on_socket_register_write(client, None, client.socket())
+        self._misc_task = self._loop.create_task(self._misc_loop(client))  # type: ignore
+
+    def _on_socket_open(self, client, userdata, sock):  # pylint: disable=unused-argument
+        self._loop.add_reader(sock, client.loop_read)  # type: ignore
+
+    def _on_socket_close(self, client, userdata, sock):  # pylint: disable=unused-argument
+        self._loop.remove_reader(sock)  # type: ignore
+        self._loop.remove_writer(sock)  # type: ignore
+
+    def _on_socket_register_write(self, client, userdata, sock):  # pylint: disable=unused-argument
+        self._loop.add_writer(sock, client.loop_write)  # type: ignore
+
+    def _on_socket_unregister_write(self, client, userdata, sock):  # pylint: disable=unused-argument
+        self._loop.remove_writer(sock)  # type: ignore
+
+    async def _misc_loop(self, client: paho.Client):
+        """Keeps the connection alive and reconnects it when run by an event loop"""
+        while not self._stopped.is_set():
+            if client.loop_misc() == paho.MQTT_ERR_NO_CONN:
+                try:
+                    client.reconnect()
+                except OSError:
+                    pass
+            await asyncio.sleep(1)
+
+    def _on_connect(self, client, userdata, flags, rc, properties=None):  # pylint: disable=unused-argument
+        with self._lock:
+            self._connected = True
+            pending, self._pending_publishes = self._pending_publishes, []
+            self._pending_subscriptions.clear()
+            # the lock is held until the mids are recorded, so no suback is missed
+            for topic, qos in self._subscriptions.items():
+                self._send_subscription(client, topic, qos)
+            if not self._pending_subscriptions:
+                self._ready.set()
+        for topic, payload, qos, on_ack in pending:
+            self._publish(client, topic, payload, qos, on_ack)
+
+    def _send_subscription(self, client: paho.Client, topic: str, qos: int):
+        _, mid = client.subscribe(topic, qos=qos)
+        if mid is not None:
+            self._pending_subscriptions.add(mid)
+            self._ready.clear()
+
+    def _on_subscribe(self, client, userdata, mid, granted_qos, properties=None):  # pylint: disable=unused-argument
+        with self._lock:
+            self._pending_subscriptions.discard(mid)
+            if self._connected and not self._pending_subscriptions:
+                self._ready.set()
+
+    def _on_disconnect(self, client, userdata, rc, properties=None):  # pylint: disable=unused-argument
+        with self._lock:
+            self._connected = False
+            self._ready.clear()
+
+    def _on_message(self, client, userdata, msg):
+        for handler in list(self._exact_handlers.get(msg.topic, [])):
+            handler(client, userdata, msg)
+        for topic_filter, handlers in list(self._wildcard_handlers.items()):
+            if topic_matches(topic_filter, msg.topic):
+                for handler in handlers:
+                    handler(client, userdata, msg)
+        for (_, topic_filter), group in list(self._shared_groups.items()):
+            if topic_matches(topic_filter, msg.topic):
+                group.pick()(client, userdata, msg)
+
+    def _on_publish(self, client, userdata, mid, properties=None):  # pylint: disable=unused-argument
+        with self._ack_lock:
+            on_ack = self._ack_callbacks.pop(mid, None)
+            if on_ack is None:
+                # the ack may arrive before publish registers its callback
+                self._early_acks[mid] = None
+                if len(self._early_acks) > 65536:
+                    self._early_acks.popitem(last=False)
+        if on_ack:
+            on_ack()
+
+    def _publish(self, client: paho.Client, topic: str, payload: Union[bytes, str], qos: int,
+                 on_ack: Optional[Callable[[], None]]):
+        info = client.publish(topic, payload=payload, qos=qos)
+        if on_ack:
+            with self._ack_lock:
+                acked = info.mid in self._early_acks
+                if acked:
+                    del self._early_acks[info.mid]
+                else:
+                    self._ack_callbacks[info.mid] = on_ack
+            if acked:
+                on_ack()
+        return info
+
+    def publish(
+        self,
+        topic: str,
+        payload: Union[bytes, str],
+        qos: int = 0,
+        on_ack: Optional[Callable[[], None]] = None
+    ):
+        client = self._get_client()
+        with self._lock:
+            if not self._connected:
+                self._pending_publishes.append((topic, payload, qos, on_ack))
+                return None
+        return self._publish(client, topic, payload, qos, on_ack)
+
+    def subscribe(self, topic: str, callback: Callable, qos: int = 1):
+        client = self._get_client()
+        topic_filter = subscription_filter(topic)
+        with self._lock:
+            self._subscriptions[topic] = qos
+            if topic != topic_filter:
+                group = topic.split("/", 2)[1]
+                self._shared_groups.setdefault((group, topic_filter), SharedGroup()).callbacks.append(callback)
+            elif has_wildcards(topic_filter):
+                self._wildcard_handlers.setdefault(topic_filter, []).append(callback)
+            else:
+                self._exact_handlers.setdefault(topic_filter, []).append(callback)
+            if self._connected:
+                self._send_subscription(client, topic, qos)
+
+    def connect(self):
+        self._get_client()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        self._get_client()
+        return self._ready.wait(timeout)
+
+    def loop_forever(self):
+        self._get_client()
+        self._stopped.wait()
+
+    async def serve(self):
+        if not self._loop:
+            await super().serve()
+            return
+        self._get_client()
+        await self._loop.run_in_executor(None, self._stopped.wait)
+
+    def stop(self):
+        with self._lock:
+            client, self._client = self._client, None
+            self._connected = False
+            self._ready.clear()
+        self._stopped.set()
+        if self._misc_task:
+            self._misc_task.cancel()
+        if client:
+            client.disconnect()
+            client.loop_stop()
+
+
+@dataclass
+class InMemoryMessage:
+    """Message delivered by the in memory transport, mirrors paho's MQTTMessage"""
+    topic: str
+    payload: Union[bytes, str]
+    qos: int = 0
+    on_ack: Optional[Callable[[], None]] = None
+
+
+class InMemoryTransport(Transport):
+    """Message bus delivering the messages inside the process, with no network
+
+    Published messages are queued and delivered in order by the thread pumping
+    the bus, either through drain or loop_forever. Queueing keeps the use cases
+    from being reentered while a publish they did is still on the stack.
+    The topic wildcards and the shared subscriptions behave as in MQTT, with
+    the members of a share group served in round robin.
+    """
+
+    def __init__(self):
+        self._queue: Deque[InMemoryMessage] = deque()
+        self._condition = threading.Condition()
+        self._pump_lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._exact_handlers: Dict[str, List[Callable]] = {}
+        self._wildcard_handlers: Dict[str, List[Callable]] = {}
+        self._shared_groups: Dict[Tuple[str, str], SharedGroup] = {}
+        self._serving_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._serving_thread: Optional[int] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def publish(
+        self,
+        topic: str,
+        payload: Union[bytes, str],
+        qos: int = 0,
+        on_ack: Optional[Callable[[], None]] = None
+    ):
+        with self._condition:
+            self._queue.append(InMemoryMessage(topic=topic, payload=payload, qos=qos, on_ack=on_ack))
+            self._condition.notify()
+        self._wake_serving_loop()
+
+    def _wake_serving_loop(self):
+        if not self._serving_loop or not self._wakeup:
+            return
+        if threading.get_ident() == self._serving_thread:
+            self._wakeup.set()
+        else:
+            self._serving_loop.call_soon_threadsafe(self._wakeup.set)
+
+    def subscribe(self, topic: str, callback: Callable, qos: int = 1):
+        topic_filter = subscription_filter(topic)
+        with self._condition:
+            if topic != topic_filter:
+                group = topic.split("/", 2)[1]
+                self._shared_groups.setdefault((group, topic_filter), SharedGroup()).callbacks.append(callback)
+            elif has_wildcards(topic_filter):
+                self._wildcard_handlers.setdefault(topic_filter, []).append(callback)
+            else:
+                self._exact_handlers.setdefault(topic_filter, []).append(callback)
+
+    def deliver(self, msg: InMemoryMessage):
+        """Dispatches a message to the subscribers of its topic
+
+        Args:
+            msg (InMemoryMessage): Message to be delivered
+        """
+        if msg.on_ack:
+            msg.on_ack()
+        for handler in list(self._exact_handlers.get(msg.topic, [])):
+            handler(self, None, msg)
+        for topic_filter, handlers in list(self._wildcard_handlers.items()):
+            if topic_matches(topic_filter, msg.topic):
+                for handler in handlers:
+                    handler(self, None, msg)
+        for (_, topic_filter), group in list(self._shared_groups.items()):
+            if topic_matches(topic_filter, msg.topic):
+                group.pick()(self, None, msg)
+
+    def drain(self, max_messages: Optional[int] = None) -> int:
+        """Delivers the queued messages, including the ones published while delivering
+
+        Args:
+            max_messages (Optional[int]): Maximum number of messages to deliver,
+                if None delivers until the queue is empty
+
+        Returns:
+            int: Number of delivered messages
+        """
+        delivered = 0
+        while max_messages is None or delivered < max_messages:
+            with self._condition:
+                if not self._queue:
+                    break
+                msg = self._queue.popleft()
+            self.deliver(msg)
+            delivered += 1
+        return delivered
+
+    def loop_forever(self):
+        """Pumps the bus until stopped, only one caller pumps and the others just block"""
+        if not self._pump_lock.acquire(blocking=False):  # pylint: disable=consider-using-with
+            self._stopped.wait()
+            return
+        try:
+            while not self._stopped.is_set():
+                with self._condition:
+                    while not self._queue and not self._stopped.is_set():
+                        self._condition.wait()
+                    if self._stopped.is_set():
+                        break
+                    msg = self._queue.popleft()
+                self.deliver(msg)
+        finally:
+            self._pump_lock.release()
+
+    async def serve(self, batch_size: int = 256):
+        """Pumps the bus from the running event loop until stopped, yielding
+            to the other tasks after every batch of delivered messages
+
+        Args:
+            batch_size (int, optional): Messages delivered between yields. Defaults to 256.
+        """
+        self._serving_loop = asyncio.get_running_loop()
+        self._serving_thread = threading.get_ident()
+        self._wakeup = asyncio.Event()
+        try:
+            while not self._stopped.is_set():
+                if self.drain(batch_size):
+                    await asyncio.sleep(0)
+                    continue
+                self._wakeup.clear()
+                if not self._queue and not self._stopped.is_set():
+                    await self._wakeup.wait()
+        finally:
+            self._serving_loop = None
+            self._wakeup = None
+
+    def stop(self):
+        with self._condition:
+            self._stopped.set()
+            self._condition.notify_all()
+        self._wake_serving_loop()
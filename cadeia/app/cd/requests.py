@@ -1,8 +1,11 @@
 """Defines the DistributionCenter use cases's requests"""
 from dataclasses import dataclass
+from typing import Optional
+
 from cadeia.domain.entities import (
     ProductClasses,
-    DistributionCenter
+    DistributionCenter,
+    TraceContext
 )
 
 
@@ -14,6 +17,8 @@ class CreditDistributionCenterRequest:
     distribution_center: DistributionCenter
     product_class: ProductClasses
     quantity_of_items: int
+    order_id: Optional[str] = None
+    trace: Optional[TraceContext] = None
 
 
 @ dataclass
@@ -25,3 +30,5 @@ class DebitDistributionCenterRequest:
     product_class: ProductClasses
     quantity_of_items: int
     store_id: str
+    order_id: Optional[str] = None
+    trace: Optional[TraceContext] = None
@@ -0,0 +1,74 @@
+"""Data for cd use case tests"""
+from unittest.mock import MagicMock
+import pytest
+from cadeia.app.cd.use_cases import (
+    DebitDistributionCenterUseCase,
+    DistributionCenterReceiveCreditUseCase
+)
+from cadeia.domain.entities import (
+    DistributionCenter,
+    InventoryState,
+    ProductClasses,
+    ProductContainer
+)
+
+
+@pytest.fixture
+def distribution_center_red() -> DistributionCenter:
+    """Distribution center with a little less then a quarter of stock
+
+    Returns:
+        DistributionCenter: Distribution center with less then a quarter of stock
+    """
+    return DistributionCenter(
+        distribution_center_id='cd_dos_sonhos',
+        warehouses={
+            ProductClasses.A: ProductContainer(
+                state=InventoryState.RED,
+                quantity_of_items=100
+            ),
+            ProductClasses.B: ProductContainer(
+                state=InventoryState.RED,
+                quantity_of_items=60
+            ),
+            ProductClasses.C: ProductContainer(
+                state=InventoryState.RED,
+                quantity_of_items=20
+            )
+        },
+        pending_store_orders={
+            ProductClasses.A: [],
+            ProductClasses.B: [],
+            ProductClasses.C: []
+        },
+        pending_factory_orders={
+            ProductClasses.A: [],
+            ProductClasses.B: [],
+            ProductClasses.C: []
+        }
+    )
+
+
+@pytest.fixture
+def credit_cd_use_case() -> DistributionCenterReceiveCreditUseCase:
+    """Returns the use case to credit a distribution center
+
+    Returns:
+        DistributionCenterReceiveCreditUseCase: Use Case
+    """
+    return DistributionCenterReceiveCreditUseCase(
+        send_credit_strategy=MagicMock()
+    )
+
+
+@pytest.fixture
+def debit_cd_use_case() -> DebitDistributionCenterUseCase:
+    """Returns an use case to debit a distribution center
+
+    Returns:
+        DebitDistributionCenterUseCase: Use Case
+    """
+    return DebitDistributionCenterUseCase(
+        request_credit_strategy=MagicMock(),
+        send_credit_strategy=MagicMock()
+    )
@@ -0,0 +1,77 @@
+from cadeia.app.cd.requests import CreditDistributionCenterRequest
+from cadeia.app.cd.use_cases import DistributionCenterReceiveCreditUseCase
+from cadeia.domain.entities import (
+    DistributionCenter,
+    OrderInfo,
+    ProductClasses
+)
+
+
+def test_credit_fulfills_the_factory_order_with_its_id(
+    distribution_center_red: DistributionCenter,
+    credit_cd_use_case: DistributionCenterReceiveCreditUseCase
+):
+    """Tests if a credit carrying an order id fulfills that order, even when
+        other pending orders have the same quantity, and unknown ids are ignored
+
+    Args:
+        distribution_center_red (DistributionCenter): Almost empty cd
+        credit_cd_use_case (DistributionCenterReceiveCreditUseCase): Credit Use Case
+    """
+    pending = distribution_center_red.pending_factory_orders[ProductClasses.A]
+    older = OrderInfo(distribution_center_red.distribution_center_id, ProductClasses.A, quantity=150)
+    newer = OrderInfo(distribution_center_red.distribution_center_id, ProductClasses.A, quantity=150)
+    pending.append(older)
+    pending.append(newer)
+    distribution_center = credit_cd_use_case.execute(CreditDistributionCenterRequest(
+        distribution_center=distribution_center_red,
+        product_class=ProductClasses.A,
+        quantity_of_items=150,
+        order_id=newer.order_id
+    )).distribution_center
+    assert older in pending and newer not in pending
+    assert pending.total_quantity == 150
+    assert distribution_center.warehouses[ProductClasses.A].quantity_of_items == 250
+
+    distribution_center = credit_cd_use_case.execute(CreditDistributionCenterRequest(
+        distribution_center=distribution_center,
+        product_class=ProductClasses.A,
+        quantity_of_items=150,
+        order_id=newer.order_id
+    )).distribution_center
+    assert distribution_center.warehouses[ProductClasses.A].quantity_of_items == 250
+    assert list(pending) == [older]
+
+
+def test_credit_without_id_fulfills_the_oldest_order_of_its_quantity(
+    distribution_center_red: DistributionCenter,
+    credit_cd_use_case: DistributionCenterReceiveCreditUseCase
+):
+    """Tests if a credit with no order id fulfills the oldest pending order of the same
+        quantity, and is ignored when no pending order has it
+
+    Args:
+        distribution_center_red (DistributionCenter): Almost empty cd
+        credit_cd_use_case (DistributionCenterReceiveCreditUseCase): Credit Use Case
+    """
+    pending = distribution_center_red.pending_factory_orders[ProductClasses.A]
+    other = OrderInfo(distribution_center_red.distribution_center_id, ProductClasses.A, quantity=50)
+    older = OrderInfo(distribution_center_red.distribution_center_id, ProductClasses.A, quantity=150)
+    newer = OrderInfo(distribution_center_red.distribution_center_id, ProductClasses.A, quantity=150)
+    for order in (other, older, newer):
+        pending.append(order)
+    distribution_center = credit_cd_use_case.execute(CreditDistributionCenterRequest(
+        distribution_center=distribution_center_red,
+        product_class=ProductClasses.A,
+        quantity_of_items=150
+    )).distribution_center
+    assert list(pending) == [other, newer]
+    assert distribution_center.warehouses[ProductClasses.A].quantity_of_items == 250
+
+    distribution_center = credit_cd_use_case.execute(CreditDistributionCenterRequest(
+        distribution_center=distribution_center,
+        product_class=ProductClasses.A,
+        quantity_of_items=70
+    )).distribution_center
+    assert list(pending) == [other, newer]
+    assert distribution_center.warehouses[ProductClasses.A].quantity_of_items == 250
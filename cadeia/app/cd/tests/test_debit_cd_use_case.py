@@ -0,0 +1,39 @@
+from cadeia.app.cd.requests import DebitDistributionCenterRequest
+from cadeia.app.cd.use_cases import DebitDistributionCenterUseCase
+from cadeia.domain.entities import (
+    DistributionCenter,
+    OrderInfo,
+    ProductClasses
+)
+
+
+def test_reorder_considers_the_pending_totals(
+    distribution_center_red: DistributionCenter,
+    debit_cd_use_case: DebitDistributionCenterUseCase
+):
+    """Tests if an order the cd can not serve makes it order from the factory what is
+        missing after its pending factory orders arrive and its pending store orders leave
+
+    Args:
+        distribution_center_red (DistributionCenter): Almost empty cd
+        debit_cd_use_case (DebitDistributionCenterUseCase): Debit Use Case
+    """
+    pending_factory = distribution_center_red.pending_factory_orders[ProductClasses.A]
+    pending_store = distribution_center_red.pending_store_orders[ProductClasses.A]
+    pending_factory.append(OrderInfo(distribution_center_red.distribution_center_id, ProductClasses.A, quantity=150))
+    pending_store.append(OrderInfo("loja_vizinha", ProductClasses.A, quantity=30))
+
+    debit_cd_use_case.execute(DebitDistributionCenterRequest(
+        distribution_center=distribution_center_red,
+        product_class=ProductClasses.A,
+        quantity_of_items=120,
+        store_id="loja_dos_sonhos"
+    ))
+    requested_order = debit_cd_use_case._request_credit_strategy.request_credit.call_args.kwargs[  # type: ignore # pylint: disable=protected-access
+        "order_info"
+    ]
+    # 500 items fill the cd, which will have 100 + 150 - 30 once its pending orders are done
+    assert requested_order.quantity == 280
+    assert requested_order in pending_factory
+    assert pending_factory.total_quantity == 430 == sum(order.quantity for order in pending_factory)
+    assert pending_store.total_quantity == 150 == sum(order.quantity for order in pending_store)
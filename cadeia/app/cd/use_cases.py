@@ -10,8 +10,7 @@ from cadeia.app.cd.responses import (
 from cadeia.app.cd.strategies import CDRequestCreditStrategy, CDSendCreditStrategy
 from cadeia.domain.entities import (
     InventoryState,
-    ProductClasses,
-    sum_order_info_quantity,
+    new_order_id,
     OrderInfo
 )
 
@@ -36,48 +35,49 @@ class DistributionCenterReceiveCreditUseCase:
             CreditDistributionCenterResponse: Response of creditting operation
         """
 
-        to_exclude_idx = -1
-        for idx, order in enumerate(
-            request.distribution_center.pending_factory_orders[request.product_class]
-        ):
-            if order.product_class == request.product_class and \
-                    order.quantity == request.quantity_of_items:
-                to_exclude_idx = idx
+        pending_orders = request.distribution_center.pending_factory_orders[request.product_class]
+        if request.order_id:
+            order = pending_orders.pop(request.order_id)
+        else:
+            order = pending_orders.pop_matching(request.quantity_of_items)
 
-        if to_exclude_idx == -1:
+        if order is None:
             return CreditDistributionCenterResponse(
                 distribution_center=request.distribution_center
             )
         request.distribution_center.warehouses[request.product_class].quantity_of_items += \
             request.quantity_of_items
-        request.distribution_center.pending_factory_orders[request.product_class].pop(
-            to_exclude_idx
-        )
 
         request.distribution_center.warehouses[request.product_class].quantity_of_items = min(
             request.distribution_center.warehouses[request.product_class].quantity_of_items,
             request.product_class.value * request.distribution_center.warehouse_multiplier
         )
 
-        if len(request.distribution_center.pending_store_orders[request.product_class]) > 0:
+        store_order = request.distribution_center.pending_store_orders[request.product_class].first()
+        if store_order is not None:
             if request.distribution_center.warehouses[request.product_class].quantity_of_items >= \
-                    request.distribution_center.pending_store_orders[request.product_class][0].quantity:
-                self._send_credit_strategy.send_credit(
-                    request.distribution_center.pending_store_orders[request.product_class][0]
-                )
+                    store_order.quantity:
+                if store_order.trace is not None:
+                    if request.trace is not None and request.trace.trace_id == store_order.trace.trace_id:
+                        store_order.trace = request.trace
+                    else:
+                        store_order.trace.add_hop("cd", "resumed")
+                self._send_credit_strategy.send_credit(store_order)
                 request.distribution_center.warehouses[request.product_class].quantity_of_items -= \
-                    request.distribution_center.pending_store_orders[request.product_class][0].quantity
-                request.distribution_center.pending_store_orders[request.product_class].pop(0)
+                    store_order.quantity
+                request.distribution_center.pending_store_orders[request.product_class].pop(
+                    store_order.order_id
+                )
 
         request.distribution_center.warehouses[request.product_class].state = InventoryState.RED
 
         if request.distribution_center.warehouses[request.product_class].quantity_of_items > \
-                request.product_class.value * InventoryState.GREEN.value * request.distribution_center.warehouse_multiplier:
+                request.product_class.green * request.distribution_center.warehouse_multiplier:
             request.distribution_center.warehouses[
                 request.product_class
             ].state = InventoryState.GREEN
         elif request.distribution_center.warehouses[request.product_class].quantity_of_items > \
-                request.product_class.value * InventoryState.YELLOW.value * request.distribution_center.warehouse_multiplier:
+                request.product_class.yellow * request.distribution_center.warehouse_multiplier:
             request.distribution_center.warehouses[
                 request.product_class
             ].state = InventoryState.YELLOW
@@ -115,24 +115,22 @@ class DebitDistributionCenterUseCase:
             self._send_credit_strategy.send_credit(OrderInfo(
                 entity_id=request.store_id,
                 product_class=request.product_class,
-                quantity=request.quantity_of_items
+                quantity=request.quantity_of_items,
+                order_id=request.order_id or new_order_id(),
+                trace=request.trace
             ))
         elif request.distribution_center.warehouses[request.product_class].quantity_of_items < \
                 request.product_class.value * request.distribution_center.warehouse_multiplier:
-            expected_quantity_after_future_credit = sum(
-                [request.distribution_center.warehouses[request.product_class].quantity_of_items,
-                    sum_order_info_quantity(
-                        request.distribution_center.pending_factory_orders[request.product_class]
-                ),
-                    -sum_order_info_quantity(
-                        request.distribution_center.pending_store_orders[request.product_class]
-                )
-                ])
+            expected_quantity_after_future_credit = \
+                request.distribution_center.warehouses[request.product_class].quantity_of_items + \
+                request.distribution_center.pending_factory_orders[request.product_class].total_quantity - \
+                request.distribution_center.pending_store_orders[request.product_class].total_quantity
 
             order = OrderInfo(
                 entity_id=request.distribution_center.distribution_center_id, product_class=request.product_class,
                 quantity=request.product_class.value * request.distribution_center.warehouse_multiplier -
-                expected_quantity_after_future_credit)
+                expected_quantity_after_future_credit,
+                trace=request.trace.fork() if request.trace else None)
             self._request_credit_strategy.request_credit(
                 order_info=order
             )
@@ -140,19 +138,21 @@ class DebitDistributionCenterUseCase:
             request.distribution_center.pending_store_orders[request.product_class].append(OrderInfo(
                 entity_id=request.store_id,
                 product_class=request.product_class,
-                quantity=request.quantity_of_items
+                quantity=request.quantity_of_items,
+                order_id=request.order_id or new_order_id(),
+                trace=request.trace
             ))
             return DebitDistributionCenterResponse(request.distribution_center)
 
         request.distribution_center.warehouses[request.product_class].state = InventoryState.RED
 
         if request.distribution_center.warehouses[request.product_class].quantity_of_items > \
-                request.product_class.value * InventoryState.GREEN.value * request.distribution_center.warehouse_multiplier:
+                request.product_class.green * request.distribution_center.warehouse_multiplier:
             request.distribution_center.warehouses[
                 request.product_class
             ].state = InventoryState.GREEN
         elif request.distribution_center.warehouses[request.product_class].quantity_of_items > \
-                request.product_class.value * InventoryState.YELLOW.value * request.distribution_center.warehouse_multiplier:
+                request.product_class.yellow * request.distribution_center.warehouse_multiplier:
             request.distribution_center.warehouses[
                 request.product_class
             ].state = InventoryState.YELLOW
@@ -160,24 +160,20 @@ class DebitDistributionCenterUseCase:
         if request.distribution_center.warehouses[
             request.product_class
         ].state == InventoryState.RED:
-            expected_quantity_after_future_credit = sum(
-                [request.distribution_center.warehouses[request.product_class].quantity_of_items,
-                    sum_order_info_quantity(
-                        request.distribution_center.pending_factory_orders[request.product_class]
-                ),
-                    -sum_order_info_quantity(
-                        request.distribution_center.pending_store_orders[request.product_class]
-                )
-                ])
+            expected_quantity_after_future_credit = \
+                request.distribution_center.warehouses[request.product_class].quantity_of_items + \
+                request.distribution_center.pending_factory_orders[request.product_class].total_quantity - \
+                request.distribution_center.pending_store_orders[request.product_class].total_quantity
 
             order = OrderInfo(
                 entity_id=request.distribution_center.distribution_center_id, product_class=request.product_class,
                 quantity=request.product_class.value * request.distribution_center.warehouse_multiplier -
-                expected_quantity_after_future_credit)
+                expected_quantity_after_future_credit,
+                trace=request.trace.fork() if request.trace else None)
             self._request_credit_strategy.request_credit(
                 order_info=order
             )
-            request.distribution_center.pending_factory_orders[ProductClasses.A].append(order)
+            request.distribution_center.pending_factory_orders[request.product_class].append(order)
         return DebitDistributionCenterResponse(
             distribution_center=request.distribution_center
         )
@@ -1,8 +1,11 @@
 """Defines the Factory use cases's requests"""
 from dataclasses import dataclass
+from typing import Optional
+
 from cadeia.domain.entities import (
     ProductClasses,
-    Factory
+    Factory,
+    TraceContext
 )
 
 
@@ -15,3 +18,5 @@ class DebitFactoryRequest:
     product_class: ProductClasses
     quantity_of_items: int
     distribution_center: str
+    order_id: Optional[str] = None
+    trace: Optional[TraceContext] = None
@@ -4,7 +4,7 @@ from cadeia.app.factory.requests import (
 )
 from cadeia.app.factory.responses import DebitFactoryResponse
 from cadeia.app.factory.strategies import FactorySendCreditStrategy
-from cadeia.domain.entities import OrderInfo
+from cadeia.domain.entities import OrderInfo, new_order_id
 
 
 class DebitFactoryUseCase:
@@ -29,7 +29,9 @@ class DebitFactoryUseCase:
         order = OrderInfo(
             entity_id=request.distribution_center,
             product_class=request.product_class,
-            quantity=request.quantity_of_items
+            quantity=request.quantity_of_items,
+            order_id=request.order_id or new_order_id(),
+            trace=request.trace
         )
         self._send_credit_strategy.send_credit(
             order_info=order
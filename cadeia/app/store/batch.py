@@ -0,0 +1,166 @@
+"""Defines the array kernels of the batched store use cases
+
+The kernels run on the arrays of a StoreTable. When NumPy is installed, see
+the vectorized extra, the debits and credits of a batch are applied with
+array operations, else each one is applied in turn. Both give the same
+result as executing the requests one by one, in the order of the batch.
+"""
+from typing import Callable, List, Optional, Sequence
+
+from cadeia.domain.entities import InventoryState, OrderInfo, ProductClasses
+from cadeia.domain.tables import CLASS_INDEX, PRODUCT_CLASSES, STATE_CODES, StoreTable
+
+try:
+    import numpy
+except ImportError:  # pragma: no cover
+    numpy = None  # type: ignore
+
+_RED = STATE_CODES[InventoryState.RED]
+_YELLOW = STATE_CODES[InventoryState.YELLOW]
+_GREEN = STATE_CODES[InventoryState.GREEN]
+
+
+def classify(quantity_of_items: int, capacity: int) -> int:
+    """State code of a container holding the quantity, as the store use cases classify it"""
+    if quantity_of_items > capacity * InventoryState.GREEN.value:
+        return _GREEN
+    if quantity_of_items > capacity * InventoryState.YELLOW.value:
+        return _YELLOW
+    return _RED
+
+
+def slots_of(
+    table: StoreTable,
+    store_indexes: Sequence[int],
+    product_classes: Sequence[ProductClasses]
+) -> List[int]:
+    """Positions in the table arrays of the containers addressed by a batch"""
+    width = len(PRODUCT_CLASSES)
+    return [index * width + CLASS_INDEX[product_class]
+            for index, product_class in zip(store_indexes, product_classes)]
+
+
+def reorder(table: StoreTable, slot: int) -> Optional[OrderInfo]:
+    """Files the order that refills a red container, as DebitStoreUseCase does
+
+    Returns:
+        Optional[OrderInfo]: The order, None if the pending orders already refill it
+    """
+    index, class_index = divmod(slot, len(PRODUCT_CLASSES))
+    product_class = PRODUCT_CLASSES[class_index]
+    pending_orders = table.view(index).pending_cd_orders[product_class]
+    expected_quantity_after_future_credit = table.quantities[slot] + pending_orders.total_quantity
+    if product_class.value <= expected_quantity_after_future_credit:
+        return None
+    order = OrderInfo(
+        entity_id=table.store_ids[index],
+        product_class=product_class,
+        quantity=product_class.value - expected_quantity_after_future_credit
+    )
+    pending_orders.append(order)
+    return order
+
+
+def debit(
+    table: StoreTable,
+    slots: Sequence[int],
+    quantities: Sequence[int],
+    on_red: Callable[[Sequence[int]], None]
+) -> List[bool]:
+    """Applies debits one by one, calling on_red with each container left red
+
+    Returns:
+        List[bool]: Whether each debit had enough items
+    """
+    success = []
+    for slot, quantity in zip(slots, quantities):
+        capacity = PRODUCT_CLASSES[slot % len(PRODUCT_CLASSES)].value
+        enough = table.quantities[slot] > quantity
+        if enough:
+            table.quantities[slot] -= quantity
+        table.states[slot] = classify(table.quantities[slot], capacity)
+        if table.states[slot] == _RED:
+            on_red([slot])
+        success.append(enough)
+    return success
+
+
+def credit(table: StoreTable, slots: Sequence[int], quantities: Sequence[int]):
+    """Applies credits one by one, clamped to the capacity of the containers"""
+    for slot, quantity in zip(slots, quantities):
+        capacity = PRODUCT_CLASSES[slot % len(PRODUCT_CLASSES)].value
+        table.quantities[slot] = min(table.quantities[slot] + quantity, capacity)
+        table.states[slot] = classify(table.quantities[slot], capacity)
+
+
+def _rounds(slots: "numpy.ndarray") -> List["numpy.ndarray"]:
+    """Splits the positions of a batch in rounds where no container repeats,
+        the nth round holding the nth request to each container
+    """
+    if not len(slots):
+        return []
+    order = numpy.argsort(slots, kind="stable")
+    sorted_slots = slots[order]
+    starts = numpy.flatnonzero(numpy.r_[True, sorted_slots[1:] != sorted_slots[:-1]])
+    group_start = numpy.repeat(starts, numpy.diff(numpy.r_[starts, len(slots)]))
+    rank = numpy.empty(len(slots), dtype=numpy.intp)
+    rank[order] = numpy.arange(len(slots)) - group_start
+    return [numpy.flatnonzero(rank == round_number) for round_number in range(rank.max() + 1)]
+
+
+def _arrays(table: StoreTable, slots: Sequence[int], quantities: Sequence[int]):
+    width = len(PRODUCT_CLASSES)
+    capacities = numpy.array([product_class.value for product_class in PRODUCT_CLASSES], dtype=numpy.int64)
+    slots_array = numpy.asarray(slots, dtype=numpy.intp)
+    return (
+        # views sharing the memory of the table arrays
+        numpy.frombuffer(table.quantities, dtype=numpy.int64),
+        numpy.frombuffer(table.states, dtype=numpy.int8),
+        slots_array,
+        numpy.asarray(quantities, dtype=numpy.int64),
+        capacities[slots_array % width]
+    )
+
+
+def _classify_array(quantity: "numpy.ndarray", capacity: "numpy.ndarray") -> "numpy.ndarray":
+    return numpy.where(
+        quantity > capacity * InventoryState.GREEN.value, _GREEN,
+        numpy.where(quantity > capacity * InventoryState.YELLOW.value, _YELLOW, _RED)
+    ).astype(numpy.int8)
+
+
+def debit_vectorized(
+    table: StoreTable,
+    slots: Sequence[int],
+    quantities: Sequence[int],
+    on_red: Callable[[Sequence[int]], None]
+) -> List[bool]:
+    """Applies debits with NumPy, calling on_red with the containers left red by
+        each round, before the next round debits them again
+
+    Returns:
+        List[bool]: Whether each debit had enough items
+    """
+    table_quantities, table_states, slots_array, quantities_array, capacities = _arrays(table, slots, quantities)
+    success = numpy.zeros(len(slots_array), dtype=bool)
+    for positions in _rounds(slots_array):
+        round_slots = slots_array[positions]
+        current = table_quantities[round_slots]
+        enough = current > quantities_array[positions]
+        current = numpy.where(enough, current - quantities_array[positions], current)
+        table_quantities[round_slots] = current
+        states = _classify_array(current, capacities[positions])
+        table_states[round_slots] = states
+        success[positions] = enough
+        on_red(round_slots[states == _RED].tolist())
+    return success.tolist()
+
+
+def credit_vectorized(table: StoreTable, slots: Sequence[int], quantities: Sequence[int]):
+    """Applies credits with NumPy, clamped to the capacity of the containers"""
+    table_quantities, table_states, slots_array, quantities_array, capacities = _arrays(table, slots, quantities)
+    for positions in _rounds(slots_array):
+        round_slots = slots_array[positions]
+        current = numpy.minimum(table_quantities[round_slots] + quantities_array[positions], capacities[positions])
+        table_quantities[round_slots] = current
+        table_states[round_slots] = _classify_array(current, capacities[positions])
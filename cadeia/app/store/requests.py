@@ -1,9 +1,12 @@
 """Defines the store use cases's requests"""
 from dataclasses import dataclass
+from typing import Optional, Sequence
+
 from cadeia.domain.entities import (
     ProductClasses,
     Store
 )
+from cadeia.domain.tables import StoreTable
 
 
 @ dataclass
@@ -14,6 +17,7 @@ class CreditStoreRequest:
     store: Store
     product_class: ProductClasses
     quantity_of_items: int
+    order_id: Optional[str] = None
 
 
 @ dataclass
@@ -24,3 +28,26 @@ class DebitStoreRequest:
     store: Store
     product_class: ProductClasses
     quantity_of_items: int
+
+
+@ dataclass
+class DebitStoreBatchRequest:
+    """Request to debit many stores of a table at once, the nth debit takes
+        quantities[n] items of product_classes[n] from the store at store_indexes[n]
+    """
+    stores: StoreTable
+    store_indexes: Sequence[int]
+    product_classes: Sequence[ProductClasses]
+    quantities: Sequence[int]
+
+
+@ dataclass
+class CreditStoreBatchRequest:
+    """Request to credit many stores of a table at once, see DebitStoreBatchRequest,
+        with the ids of the orders being fulfilled when they are known
+    """
+    stores: StoreTable
+    store_indexes: Sequence[int]
+    product_classes: Sequence[ProductClasses]
+    quantities: Sequence[int]
+    order_ids: Optional[Sequence[Optional[str]]] = None
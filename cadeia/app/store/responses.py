@@ -1,7 +1,8 @@
 
 from dataclasses import dataclass
+from typing import List
 
-from cadeia.domain.entities import Store
+from cadeia.domain.entities import OrderInfo, Store
 
 
 @dataclass
@@ -17,3 +18,20 @@ class CreditStoreResponse:
     """Response of an store credit use case
     """
     store: Store
+
+
+@dataclass
+class DebitStoreBatchResponse:
+    """Response of the batched store debit use case, with the orders requested
+        to refill the stores
+    """
+    success: List[bool]
+    orders: List[OrderInfo]
+
+
+@dataclass
+class CreditStoreBatchResponse:
+    """Response of the batched store credit use case, credits that matched no
+        pending order are not applied
+    """
+    credited: List[bool]
@@ -1,6 +1,7 @@
 """Strategies
 """
 from abc import ABC, abstractmethod
+from typing import Sequence
 from cadeia.domain.entities import (
     OrderInfo
 )
@@ -12,3 +13,8 @@ class RequestCreditStrategy(ABC):
     def request_credit(self, order_info: OrderInfo):
         """Sends the order request to a broker"""
         ...
+
+    def request_credit_batch(self, orders: Sequence[OrderInfo]):
+        """Sends many order requests, one by one unless overridden"""
+        for order_info in orders:
+            self.request_credit(order_info=order_info)
@@ -0,0 +1,91 @@
+from random import Random
+from unittest.mock import MagicMock
+
+import pytest
+
+from cadeia.app.store import batch
+from cadeia.app.store.requests import (
+    CreditStoreBatchRequest,
+    CreditStoreRequest,
+    DebitStoreBatchRequest,
+    DebitStoreRequest
+)
+from cadeia.app.store.use_cases import DebitStoreUseCase, StoreReceiveCreditUseCase
+from cadeia.domain.entities import InventoryState, ProductClasses
+from cadeia.domain.tables import StoreTable
+
+
+def build_table(number_of_stores: int) -> StoreTable:
+    table = StoreTable()
+    for idx in range(number_of_stores):
+        table.add(f"store-{idx}", quantity_of_items=20, state=InventoryState.YELLOW)
+    return table
+
+
+def snapshot(table: StoreTable):
+    return [store.as_store() for store in table]
+
+
+@pytest.fixture(params=["numpy", "python"])
+def kernels(request, monkeypatch):
+    """Runs the test with the NumPy kernels and with the plain python ones"""
+    if request.param == "numpy":
+        pytest.importorskip("numpy")
+    else:
+        monkeypatch.setattr(batch, "numpy", None)
+    return request.param
+
+
+def test_batches_match_executing_one_by_one(kernels: str):
+    """Tests that batched debits, with repeated stores, and the credits of the
+        orders they request leave the stores as the single request use cases do
+
+    Args:
+        kernels (str): Kernels used by the batch
+    """
+    random = Random(42)
+    debits = [
+        (random.randrange(20), random.choice(list(ProductClasses)), random.randint(0, 30))
+        for _ in range(500)
+    ]
+    batched, single = build_table(20), build_table(20)
+
+    batch_strategy = MagicMock()
+    response = DebitStoreUseCase(batch_strategy).execute_batch(DebitStoreBatchRequest(
+        stores=batched,
+        store_indexes=[index for index, _, _ in debits],
+        product_classes=[product_class for _, product_class, _ in debits],
+        quantities=[quantity for _, _, quantity in debits]
+    ))
+    single_strategy = MagicMock()
+    single_use_case = DebitStoreUseCase(single_strategy)
+    success = [
+        single_use_case.execute(DebitStoreRequest(
+            store=single.view(index),
+            product_class=product_class,
+            quantity_of_items=quantity
+        )).success for index, product_class, quantity in debits
+    ]
+    assert response.success == success
+    assert snapshot(batched) == snapshot(single)
+    batch_strategy.request_credit_batch.assert_called_once_with(response.orders)
+    assert len(response.orders) == single_strategy.request_credit.call_count
+
+    orders = response.orders
+    StoreReceiveCreditUseCase().execute_batch(CreditStoreBatchRequest(
+        stores=batched,
+        store_indexes=[batched.index_of(order.entity_id) for order in orders],
+        product_classes=[order.product_class for order in orders],
+        quantities=[order.quantity for order in orders],
+        order_ids=[order.order_id for order in orders]
+    ))
+    for call in single_strategy.request_credit.call_args_list:
+        order = call.kwargs["order_info"]
+        StoreReceiveCreditUseCase().execute(CreditStoreRequest(
+            store=single[order.entity_id],
+            product_class=order.product_class,
+            quantity_of_items=order.quantity,
+            order_id=order.order_id
+        ))
+    assert snapshot(batched) == snapshot(single)
+    assert all(len(orders) == 0 for store in batched for orders in store.as_store().pending_cd_orders.values())
@@ -90,3 +90,38 @@ def test_store_remains_green_and_unchanged_if_receives_nonregistered_order(
     assert store.warehouses[ProductClasses.A].quantity_of_items == 100
     assert store.warehouses[ProductClasses.A].state == InventoryState.GREEN
     assert len(store.pending_cd_orders[ProductClasses.A]) == 0
+
+
+def test_credit_fulfills_the_order_with_its_id(
+    store_red: Store,
+    credit_store_use_case: StoreReceiveCreditUseCase
+):
+    """Tests if a credit carrying an order id fulfills that order, even when
+        other pending orders have the same quantity, and unknown ids are ignored
+
+    Args:
+        store_red (Store): Almost empty Store
+        credit_store_use_case (StoreReceiveCreditUseCase): Credit Use Case
+    """
+    initial_quantity = store_red.warehouses[ProductClasses.A].quantity_of_items
+    older = OrderInfo(store_red.store_id, ProductClasses.A, quantity=30)
+    newer = OrderInfo(store_red.store_id, ProductClasses.A, quantity=30)
+    store_red.pending_cd_orders[ProductClasses.A].append(older)
+    store_red.pending_cd_orders[ProductClasses.A].append(newer)
+    store = credit_store_use_case.execute(CreditStoreRequest(
+        store=store_red,
+        product_class=ProductClasses.A,
+        quantity_of_items=30,
+        order_id=newer.order_id
+    )).store
+    assert older in store.pending_cd_orders[ProductClasses.A]
+    assert newer not in store.pending_cd_orders[ProductClasses.A]
+    assert store.pending_cd_orders[ProductClasses.A].total_quantity == 30
+    store = credit_store_use_case.execute(CreditStoreRequest(
+        store=store,
+        product_class=ProductClasses.A,
+        quantity_of_items=30,
+        order_id=newer.order_id
+    )).store
+    assert store.warehouses[ProductClasses.A].quantity_of_items == initial_quantity + 30
+    assert len(store.pending_cd_orders[ProductClasses.A]) == 1
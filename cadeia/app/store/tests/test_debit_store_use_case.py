@@ -129,8 +129,10 @@ def test_green_store_turns_red_considers_awaiting_orders(
             quantity=70
         )
     )
-    assert OrderInfo(
-        entity_id=store.store_id,
-        product_class=ProductClasses.A,
-        quantity=70
-    ) in store.pending_cd_orders[ProductClasses.A]
+    requested_order = debit_store_use_case._request_credit_strategy.request_credit.call_args.kwargs[  # type: ignore # pylint: disable=protected-access
+        "order_info"
+    ]
+    assert requested_order in store.pending_cd_orders[ProductClasses.A]
+    assert requested_order.quantity == 70
+    assert requested_order.product_class == ProductClasses.A
+    assert requested_order.entity_id == store.store_id
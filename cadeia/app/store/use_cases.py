@@ -1,14 +1,23 @@
 """Defines the module use cases"""
+from typing import List, Sequence
+
+from cadeia.app.store import batch
 from cadeia.app.store.requests import (
+    CreditStoreBatchRequest,
+    DebitStoreBatchRequest,
     DebitStoreRequest,
     CreditStoreRequest
 )
-from cadeia.app.store.responses import CreditStoreResponse, DebitStoreResponse
+from cadeia.app.store.responses import (
+    CreditStoreBatchResponse,
+    CreditStoreResponse,
+    DebitStoreBatchResponse,
+    DebitStoreResponse
+)
 from cadeia.app.store.strategies import RequestCreditStrategy
 from cadeia.domain.entities import (
     InventoryState,
     ProductClasses,
-    sum_order_info_quantity,
     OrderInfo
 )
 
@@ -27,20 +36,19 @@ class StoreReceiveCreditUseCase:
             CreditStoreResponse: Response of creditting operation
         """
 
-        to_exclude_idx = -1
-        for idx, order in enumerate(request.store.pending_cd_orders[request.product_class]):
-            if order.product_class == request.product_class and \
-                    order.quantity == request.quantity_of_items:
-                to_exclude_idx = idx
+        pending_orders = request.store.pending_cd_orders[request.product_class]
+        if request.order_id:
+            order = pending_orders.pop(request.order_id)
+        else:
+            order = pending_orders.pop_matching(request.quantity_of_items)
 
-        if to_exclude_idx == -1:
+        if order is None:
             return CreditStoreResponse(
                 store=request.store
             )
 
         request.store.warehouses[request.product_class].quantity_of_items += \
             request.quantity_of_items
-        request.store.pending_cd_orders[request.product_class].pop(to_exclude_idx)
 
         request.store.warehouses[request.product_class].quantity_of_items = min(
             request.store.warehouses[request.product_class].quantity_of_items,
@@ -49,16 +57,46 @@ class StoreReceiveCreditUseCase:
         request.store.warehouses[request.product_class].state = InventoryState.RED
 
         if request.store.warehouses[request.product_class].quantity_of_items > \
-                request.product_class.value * InventoryState.GREEN.value:
+                request.product_class.green:
             request.store.warehouses[request.product_class].state = InventoryState.GREEN
         elif request.store.warehouses[request.product_class].quantity_of_items > \
-                request.product_class.value * InventoryState.YELLOW.value:
+                request.product_class.yellow:
             request.store.warehouses[request.product_class].state = InventoryState.YELLOW
 
         return CreditStoreResponse(
             store=request.store
         )
 
+    def execute_batch(self, request: CreditStoreBatchRequest) -> CreditStoreBatchResponse:
+        """Credits many stores of a table in one pass, with the same result as
+            executing the credits one by one
+
+        Args:
+            request (CreditStoreBatchRequest): Credits of the batch
+
+        Returns:
+            CreditStoreBatchResponse: Which credits fulfilled a pending order
+        """
+        order_ids = request.order_ids or [None] * len(request.quantities)
+        credited: List[bool] = []
+        for index, product_class, quantity, order_id in zip(
+            request.store_indexes, request.product_classes, request.quantities, order_ids
+        ):
+            pending_orders = request.stores.view(index).pending_cd_orders[product_class]
+            if order_id:
+                credited.append(pending_orders.pop(order_id) is not None)
+            else:
+                credited.append(pending_orders.pop_matching(quantity) is not None)
+
+        slots = batch.slots_of(request.stores, request.store_indexes, request.product_classes)
+        credited_slots = [slot for slot, matched in zip(slots, credited) if matched]
+        credited_quantities = [quantity for quantity, matched in zip(request.quantities, credited) if matched]
+        if batch.numpy is not None:
+            batch.credit_vectorized(request.stores, credited_slots, credited_quantities)
+        else:
+            batch.credit(request.stores, credited_slots, credited_quantities)
+        return CreditStoreBatchResponse(credited=credited)
+
 
 class DebitStoreUseCase:
     """Use case of an purchase on a store
@@ -89,17 +127,16 @@ class DebitStoreUseCase:
         request.store.warehouses[request.product_class].state = InventoryState.RED
 
         if request.store.warehouses[request.product_class].quantity_of_items > \
-                request.product_class.value * InventoryState.GREEN.value:
+                request.product_class.green:
             request.store.warehouses[request.product_class].state = InventoryState.GREEN
         elif request.store.warehouses[request.product_class].quantity_of_items > \
-                request.product_class.value * InventoryState.YELLOW.value:
+                request.product_class.yellow:
             request.store.warehouses[request.product_class].state = InventoryState.YELLOW
 
         if request.store.warehouses[request.product_class].state == InventoryState.RED:
-            expected_quantity_after_future_credit = sum(
-                [request.store.warehouses[request.product_class].quantity_of_items,
-                 sum_order_info_quantity(
-                     request.store.pending_cd_orders[request.product_class])])
+            expected_quantity_after_future_credit = \
+                request.store.warehouses[request.product_class].quantity_of_items + \
+                request.store.pending_cd_orders[request.product_class].total_quantity
 
             if request.product_class.value > expected_quantity_after_future_credit:
                 order = OrderInfo(
@@ -115,3 +152,34 @@ class DebitStoreUseCase:
             success=success,
             store=request.store
         )
+
+    def execute_batch(self, request: DebitStoreBatchRequest) -> DebitStoreBatchResponse:
+        """Debits many stores of a table in one pass, with the same result as
+            executing the debits one by one, the orders refilling the stores
+            are requested as a batch
+
+        Args:
+            request (DebitStoreBatchRequest): Debits of the batch
+
+        Returns:
+            DebitStoreBatchResponse: Result of each debit and the requested orders
+        """
+        orders = []
+
+        def on_red(slots: Sequence[int]):
+            for slot in slots:
+                order = batch.reorder(request.stores, slot)
+                if order is not None:
+                    orders.append(order)
+
+        slots = batch.slots_of(request.stores, request.store_indexes, request.product_classes)
+        if batch.numpy is not None:
+            success = batch.debit_vectorized(request.stores, slots, request.quantities, on_red)
+        else:
+            success = batch.debit(request.stores, slots, request.quantities, on_red)
+        if orders:
+            self._request_credit_strategy.request_credit_batch(orders)
+        return DebitStoreBatchResponse(
+            success=success,
+            orders=orders
+        )
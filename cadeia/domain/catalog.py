@@ -0,0 +1,171 @@
+"""Defines the catalogs of products loaded from data, for deployments with far more
+    products than the three ProductClasses
+
+A Sku can be used wherever a ProductClasses member is: its value is its
+capacity, and its green and yellow thresholds are the quantities above which
+its containers are in those states. The skus of a catalog get dense ids, from 0
+in the order they were loaded, which index the arrays of the inventories, so
+reaching the container of a sku takes the same time in a catalog of any size.
+"""
+from array import array
+import csv
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from cadeia.domain.entities import (
+    DistributionCenter,
+    InventoryState,
+    PendingOrders,
+    Store
+)
+from cadeia.domain.tables import STATE_CODES, ProductContainerView
+
+SkuRow = Union[Tuple[str, int], Tuple[str, int, float, float]]
+
+
+class Sku:
+    """Product of a catalog, duck typed as a ProductClasses member"""
+    __slots__ = ("name", "value", "index", "green", "yellow")
+
+    def __init__(self, name: str, value: int, index: int, green: Optional[float] = None,
+                 yellow: Optional[float] = None):
+        """
+        Args:
+            name (str): Name of the product, unique in the catalog
+            value (int): Capacity of the containers of a store
+            index (int): Dense id of the sku in its catalog
+            green (Optional[float], optional): Fraction of the capacity above which a container is green.
+                Defaults to InventoryState.GREEN.
+            yellow (Optional[float], optional): Fraction of the capacity above which a container is yellow.
+                Defaults to InventoryState.YELLOW.
+        """
+        self.name = name
+        self.value = value
+        self.index = index
+        self.green = value * (InventoryState.GREEN.value if green is None else green)
+        self.yellow = value * (InventoryState.YELLOW.value if yellow is None else yellow)
+
+    def __repr__(self) -> str:
+        return f"Sku({self.name!r}, {self.value})"
+
+
+class Catalog:
+    """Skus of a deployment, found by name or by dense id"""
+
+    def __init__(self, rows: Iterable[SkuRow]):
+        """
+        Args:
+            rows (Iterable[SkuRow]): Name and capacity of each sku, optionally followed by
+                its green and yellow thresholds as fractions of the capacity
+
+        Raises:
+            ValueError: If a name is repeated
+        """
+        self._skus: List[Sku] = []
+        self._by_name: Dict[str, Sku] = {}
+        for name, capacity, *thresholds in rows:
+            if name in self._by_name:
+                raise ValueError(f"sku {name} is repeated in the catalog")
+            sku = Sku(name, int(capacity), len(self._skus), *thresholds)
+            self._skus.append(sku)
+            self._by_name[name] = sku
+
+    @classmethod
+    def from_csv(cls, path: str) -> "Catalog":
+        """Loads a catalog from a csv file with the columns name and capacity, and
+            optionally green and yellow, as fractions of the capacity
+
+        Args:
+            path (str): Path of the file
+        """
+        with open(path, newline="", encoding="utf-8") as catalog_file:
+            return cls(
+                (row["name"], int(row["capacity"]),
+                 *((float(row["green"]), float(row["yellow"])) if row.get("green") and row.get("yellow") else ()))
+                for row in csv.DictReader(catalog_file)
+            )
+
+    @classmethod
+    def synthetic(cls, size: int, capacities: Sequence[int] = (100, 60, 20)) -> "Catalog":
+        """Builds a catalog of skus named sku-<n>, with capacities taken in turn, for benchmarks and tests"""
+        return cls((f"sku-{index}", capacities[index % len(capacities)]) for index in range(size))
+
+    def __getitem__(self, name: str) -> Sku:
+        """Sku of a name, like ProductClasses[name]"""
+        return self._by_name[name]
+
+    def sku(self, index: int) -> Sku:
+        """Sku of a dense id"""
+        return self._skus[index]
+
+    def __iter__(self) -> Iterator[Sku]:
+        return iter(self._skus)
+
+    def __len__(self) -> int:
+        return len(self._skus)
+
+    def __contains__(self, sku: object) -> bool:
+        return isinstance(sku, Sku) and sku.index < len(self._skus) and self._skus[sku.index] is sku
+
+
+class Inventory:
+    """Containers of an entity for every sku of a catalog, in two typed arrays indexed by
+        the sku id, behaves as the dict of ProductContainer of a Store
+    """
+    __slots__ = ("catalog", "quantities", "states")
+
+    def __init__(self, catalog: Catalog, quantity_of_items: int = 0, state: InventoryState = InventoryState.RED):
+        self.catalog = catalog
+        self.quantities = array("q", [quantity_of_items]) * len(catalog)
+        self.states = array("b", [STATE_CODES[state]]) * len(catalog)
+
+    def __getitem__(self, sku: Sku) -> ProductContainerView:
+        return ProductContainerView(self, sku.index)  # type: ignore
+
+    def __iter__(self) -> Iterator[Sku]:
+        return iter(self.catalog)
+
+    def __len__(self) -> int:
+        return len(self.catalog)
+
+    def items(self) -> Iterator[Tuple[Sku, ProductContainerView]]:
+        return ((sku, self[sku]) for sku in self.catalog)
+
+
+class PendingOrdersBySku:
+    """Pending orders of an entity by sku, allocated on the first access so the skus
+        that were never ordered take no memory. Iterating yields only those skus.
+    """
+    __slots__ = ("_orders",)
+
+    def __init__(self):
+        self._orders: Dict[Sku, PendingOrders] = {}
+
+    def __getitem__(self, sku: Sku) -> PendingOrders:
+        orders = self._orders.get(sku)
+        if orders is None:
+            orders = self._orders[sku] = PendingOrders()
+        return orders
+
+    def __iter__(self) -> Iterator[Sku]:
+        return iter(self._orders)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def items(self):
+        return self._orders.items()
+
+
+def new_store(store_id: str, catalog: Catalog) -> Store:
+    """Returns an empty store holding every sku of the catalog"""
+    return Store(store_id=store_id, warehouses=Inventory(catalog), pending_cd_orders=PendingOrdersBySku())
+
+
+def new_distribution_center(distribution_center_id: str, catalog: Catalog) -> DistributionCenter:
+    """Returns an empty distribution center holding every sku of the catalog"""
+    return DistributionCenter(
+        distribution_center_id=distribution_center_id,
+        warehouses=Inventory(catalog),
+        pending_store_orders=PendingOrdersBySku(),
+        pending_factory_orders=PendingOrdersBySku()
+    )
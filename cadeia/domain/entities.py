@@ -1,8 +1,10 @@
 """Defines the module entities"""
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from enum import Enum
 from functools import reduce
-from typing import Dict, List
+from time import time
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+from uuid import uuid4
 
 
 class InventoryState(Enum):
@@ -21,6 +23,16 @@ class ProductClasses(Enum):
     B = 60
     C = 20
 
+    @property
+    def green(self) -> float:
+        """Quantity above which a store container is green"""
+        return self.value * InventoryState.GREEN.value
+
+    @property
+    def yellow(self) -> float:
+        """Quantity above which a store container is yellow"""
+        return self.value * InventoryState.YELLOW.value
+
 
 @dataclass
 class Factory:
@@ -36,31 +48,154 @@ class ProductContainer:
     quantity_of_items: int
 
 
+def new_order_id() -> str:
+    """Returns an unique order id"""
+    return str(uuid4())
+
+
+Hop = Tuple[str, str, float]
+
+
+@dataclass
+class TraceContext:
+    """Defines the trace of the messages set off by an order, each hop is
+        the kind of component, the event and its wall clock time
+    """
+    trace_id: str
+    hops: List[Hop] = field(default_factory=list)
+
+    def add_hop(self, component: str, event: str, at: Optional[float] = None):
+        """Records an event of the order, at the current time unless given"""
+        self.hops.append((component, event, time() if at is None else at))
+
+    def fork(self) -> "TraceContext":
+        """Returns a copy of the trace, for an order placed because of this one"""
+        return TraceContext(self.trace_id, list(self.hops))
+
+
 @dataclass
 class OrderInfo:
-    """Defines a container for the order of new products"""
+    """Defines a container for the order of new products, the order id
+        travels with the credits that fulfill the order, an empty order id
+        means it is unknown. The trace, when the order is traced, travels
+        with every message the order sets off.
+    """
     entity_id: str
     product_class: ProductClasses
     quantity: int
+    order_id: str = field(default_factory=new_order_id, compare=False)
+    trace: Optional[TraceContext] = field(default=None, compare=False, repr=False)
 
 
-def sum_order_info_quantity(order_list: List[OrderInfo]):
+def sum_order_info_quantity(order_list: Iterable[OrderInfo]):
+    if isinstance(order_list, PendingOrders):
+        return order_list.total_quantity
     return reduce(lambda acc, order: acc + order.quantity, order_list, 0)
 
 
+class PendingOrders:
+    """Pending orders of a product class, kept in arrival order and keyed by order id,
+        with the total quantity of the orders kept up to date on every change
+    """
+    __slots__ = ("_orders", "total_quantity")
+
+    def __init__(self, orders: Iterable[OrderInfo] = ()):
+        self._orders: Dict[str, OrderInfo] = {}
+        self.total_quantity = 0
+        for order in orders:
+            self.append(order)
+
+    def append(self, order: OrderInfo):
+        """Adds an order to the end of the line"""
+        replaced = self._orders.get(order.order_id)
+        if replaced is not None:
+            self.total_quantity -= replaced.quantity
+        self._orders[order.order_id] = order
+        self.total_quantity += order.quantity
+
+    def _remove(self, order_id: str) -> OrderInfo:
+        order = self._orders.pop(order_id)
+        self.total_quantity -= order.quantity
+        return order
+
+    def pop(self, order_id: str) -> Optional[OrderInfo]:
+        """Removes an order by its id
+
+        Args:
+            order_id (str): Id of the order
+
+        Returns:
+            Optional[OrderInfo]: The removed order, None if it is not pending
+        """
+        return self._remove(order_id) if order_id in self._orders else None
+
+    def pop_matching(self, quantity: int) -> Optional[OrderInfo]:
+        """Removes the oldest order of the given quantity, linear on the number
+            of orders, only for credits whose order id is unknown
+
+        Args:
+            quantity (int): Quantity of the order
+
+        Returns:
+            Optional[OrderInfo]: The removed order, None if no order matches
+        """
+        for order_id, order in self._orders.items():
+            if order.quantity == quantity:
+                return self._remove(order_id)
+        return None
+
+    def first(self) -> Optional[OrderInfo]:
+        """Returns the oldest order, None if there is none"""
+        return next(iter(self._orders.values()), None)
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def __iter__(self) -> Iterator[OrderInfo]:
+        return iter(self._orders.values())
+
+    def __contains__(self, order: object) -> bool:
+        return isinstance(order, OrderInfo) and order.order_id in self._orders
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, PendingOrders) and list(self) == list(other)
+
+    def __repr__(self) -> str:
+        return f"PendingOrders({list(self)!r})"
+
+
+def _as_pending_orders(
+    pending_orders: Dict[ProductClasses, Iterable[OrderInfo]]
+) -> Dict[ProductClasses, PendingOrders]:
+    if not isinstance(pending_orders, dict):
+        # mappings such as the pending orders by sku of a catalog already hold PendingOrders
+        return pending_orders
+    return {
+        product_class: orders if isinstance(orders, PendingOrders) else PendingOrders(orders)
+        for product_class, orders in pending_orders.items()
+    }
+
+
 @dataclass
 class Store:
-    """Defines the entity of an Store"""
+    """Defines the entity of an Store, pending orders given as lists are converted"""
     store_id: str
     warehouses: Dict[ProductClasses, ProductContainer]
-    pending_cd_orders: Dict[ProductClasses, List[OrderInfo]]
+    pending_cd_orders: Dict[ProductClasses, PendingOrders]
+
+    def __post_init__(self):
+        self.pending_cd_orders = _as_pending_orders(self.pending_cd_orders)
 
 
 @dataclass
 class DistributionCenter:
-    """Defines the entity of an Distribuition Center"""
+    """Defines the entity of an Distribuition Center, pending orders given as lists are converted"""
     distribution_center_id: str
     warehouses: Dict[ProductClasses, ProductContainer]
-    pending_store_orders: Dict[ProductClasses, List[OrderInfo]]
-    pending_factory_orders: Dict[ProductClasses, List[OrderInfo]]
+    pending_store_orders: Dict[ProductClasses, PendingOrders]
+    pending_factory_orders: Dict[ProductClasses, PendingOrders]
     warehouse_multiplier: int = 5
+
+    def __post_init__(self):
+        self.pending_store_orders = _as_pending_orders(self.pending_store_orders)
+        self.pending_factory_orders = _as_pending_orders(self.pending_factory_orders)
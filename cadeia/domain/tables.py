@@ -0,0 +1,210 @@
+"""Defines compact, array backed, representations of large numbers of entities"""
+from array import array
+from typing import Dict, Iterator, List, Optional, Union
+
+from cadeia.domain.entities import (
+    InventoryState,
+    PendingOrders,
+    ProductClasses,
+    ProductContainer,
+    Store
+)
+
+PRODUCT_CLASSES = tuple(ProductClasses)
+CLASS_INDEX: Dict[ProductClasses, int] = {
+    product_class: idx for idx, product_class in enumerate(PRODUCT_CLASSES)
+}
+INVENTORY_STATES = tuple(InventoryState)
+STATE_CODES: Dict[InventoryState, int] = {state: code for code, state in enumerate(INVENTORY_STATES)}
+
+
+class ProductContainerView:
+    """Product container of a store kept in a StoreTable, behaves as a ProductContainer"""
+    __slots__ = ("_table", "_slot")
+
+    def __init__(self, table: "StoreTable", slot: int):
+        self._table = table
+        self._slot = slot
+
+    @property
+    def quantity_of_items(self) -> int:
+        return self._table.quantities[self._slot]
+
+    @quantity_of_items.setter
+    def quantity_of_items(self, value: int):
+        self._table.quantities[self._slot] = value
+
+    @property
+    def state(self) -> InventoryState:
+        return INVENTORY_STATES[self._table.states[self._slot]]
+
+    @state.setter
+    def state(self, value: InventoryState):
+        self._table.states[self._slot] = STATE_CODES[value]
+
+    def __repr__(self) -> str:
+        return f"ProductContainerView(state={self.state}, quantity_of_items={self.quantity_of_items})"
+
+
+class _WarehousesView:
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "StoreTable", index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, product_class: ProductClasses) -> ProductContainerView:
+        return ProductContainerView(self._table, self._table.slot(self._index, product_class))
+
+    def __iter__(self) -> Iterator[ProductClasses]:
+        return iter(PRODUCT_CLASSES)
+
+    def __len__(self) -> int:
+        return len(PRODUCT_CLASSES)
+
+    def items(self):
+        return [(product_class, self[product_class]) for product_class in PRODUCT_CLASSES]
+
+
+class _PendingOrdersView:
+    __slots__ = ("_table", "_index")
+
+    def __init__(self, table: "StoreTable", index: int):
+        self._table = table
+        self._index = index
+
+    def __getitem__(self, product_class: ProductClasses) -> PendingOrders:
+        slot = self._table.slot(self._index, product_class)
+        pending_orders = self._table.pending.get(slot)
+        if pending_orders is None:
+            pending_orders = self._table.pending[slot] = PendingOrders()
+        return pending_orders
+
+    def __iter__(self) -> Iterator[ProductClasses]:
+        return iter(PRODUCT_CLASSES)
+
+    def __len__(self) -> int:
+        return len(PRODUCT_CLASSES)
+
+
+class StoreView:
+    """Store kept in a StoreTable, behaves as a Store so the store use cases
+        and controller can run on it
+    """
+    __slots__ = ("_table", "_index", "warehouses", "pending_cd_orders")
+
+    def __init__(self, table: "StoreTable", index: int):
+        self._table = table
+        self._index = index
+        self.warehouses = _WarehousesView(table, index)
+        self.pending_cd_orders = _PendingOrdersView(table, index)
+
+    @property
+    def store_id(self) -> str:
+        return self._table.store_ids[self._index]
+
+    @property
+    def index(self) -> int:
+        return self._index
+
+    def as_store(self) -> Store:
+        """Copies the view to a Store"""
+        return Store(
+            store_id=self.store_id,
+            warehouses={
+                product_class: ProductContainer(
+                    state=container.state,
+                    quantity_of_items=container.quantity_of_items
+                ) for product_class, container in self.warehouses.items()
+            },
+            pending_cd_orders={
+                product_class: PendingOrders(self.pending_cd_orders[product_class])
+                for product_class in PRODUCT_CLASSES
+            }
+        )
+
+    def __repr__(self) -> str:
+        return f"StoreView({self.as_store()!r})"
+
+
+class StoreTable:
+    """Stores of a large fleet kept in typed arrays
+
+    The quantity and state of each product container live in flat arrays
+    indexed by store index and product class, instead of in a Store with a
+    dict of ProductContainer objects. Pending orders are only allocated for
+    the containers that had orders. Views returned by the table behave as
+    Store objects for the existing use cases.
+    """
+
+    def __init__(self):
+        self.store_ids: List[str] = []
+        self.quantities = array("q")
+        self.states = array("b")
+        self.pending: Dict[int, PendingOrders] = {}
+        self._indexes: Dict[str, int] = {}
+
+    @staticmethod
+    def slot(index: int, product_class: ProductClasses) -> int:
+        """Position in the arrays of the container of a product class of a store"""
+        return index * len(PRODUCT_CLASSES) + CLASS_INDEX[product_class]
+
+    def add(
+        self,
+        store_id: str,
+        quantity_of_items: int = 0,
+        state: InventoryState = InventoryState.RED
+    ) -> int:
+        """Adds a store with the same quantity and state on all of its containers
+
+        Args:
+            store_id (str): Id of the store
+            quantity_of_items (int, optional): Initial quantity. Defaults to 0.
+            state (InventoryState, optional): Initial state. Defaults to RED.
+
+        Returns:
+            int: Index of the store in the table
+        """
+        if store_id in self._indexes:
+            raise ValueError(f"store {store_id} is already in the table")
+        index = len(self.store_ids)
+        self.store_ids.append(store_id)
+        self._indexes[store_id] = index
+        self.quantities.extend([quantity_of_items] * len(PRODUCT_CLASSES))
+        self.states.extend([STATE_CODES[state]] * len(PRODUCT_CLASSES))
+        return index
+
+    def add_store(self, store: Union[Store, StoreView]) -> int:
+        """Copies a store to the table
+
+        Returns:
+            int: Index of the store in the table
+        """
+        index = self.add(store.store_id)
+        view = self.view(index)
+        for product_class in PRODUCT_CLASSES:
+            view.warehouses[product_class].quantity_of_items = store.warehouses[product_class].quantity_of_items
+            view.warehouses[product_class].state = store.warehouses[product_class].state
+            for order in store.pending_cd_orders[product_class]:
+                view.pending_cd_orders[product_class].append(order)
+        return index
+
+    def index_of(self, store_id: str) -> Optional[int]:
+        """Index of a store, None if it is not in the table"""
+        return self._indexes.get(store_id)
+
+    def view(self, index: int) -> StoreView:
+        """Store at an index"""
+        return StoreView(self, index)
+
+    def __getitem__(self, store_id: str) -> StoreView:
+        return StoreView(self, self._indexes[store_id])
+
+    def __contains__(self, store_id: object) -> bool:
+        return store_id in self._indexes
+
+    def __len__(self) -> int:
+        return len(self.store_ids)
+
+    def __iter__(self) -> Iterator[StoreView]:
+        return (StoreView(self, index) for index in range(len(self.store_ids)))
@@ -0,0 +1,53 @@
+"""Tests of the catalogs of skus and the array backed inventories"""
+from unittest.mock import MagicMock
+
+import pytest
+
+from cadeia.app.store.requests import CreditStoreRequest, DebitStoreRequest
+from cadeia.app.store.use_cases import DebitStoreUseCase, StoreReceiveCreditUseCase
+from cadeia.domain.catalog import Catalog, new_store
+from cadeia.domain.entities import InventoryState
+
+
+def test_catalog_is_loaded_from_csv(tmp_path):
+    """Tests that the skus get dense ids in the file order, and their thresholds or the default ones
+
+    Args:
+        tmp_path (Path): Directory of the catalog file
+    """
+    path = tmp_path / "catalog.csv"
+    path.write_text("name,capacity,green,yellow\nparafuso,1000,0.8,0.4\nporca,40,,\n", encoding="utf-8")
+    catalog = Catalog.from_csv(str(path))
+
+    assert [sku.name for sku in catalog] == ["parafuso", "porca"]
+    assert catalog["porca"] is catalog.sku(1) and catalog["porca"] in catalog
+    assert (catalog["parafuso"].green, catalog["parafuso"].yellow) == (800, 400)
+    assert (catalog["porca"].green, catalog["porca"].yellow) == (20, 10)
+    with pytest.raises(ValueError):
+        Catalog([("porca", 40), ("porca", 50)])
+
+
+def test_store_use_cases_run_on_inventories():
+    """Tests that a debit and the credit of the order it causes go through the inventory
+        arrays, and that only the ordered sku gets pending orders
+    """
+    catalog = Catalog.synthetic(10000)
+    store = new_store("loja", catalog)
+    sku = catalog.sku(7654)
+    store.warehouses[sku].quantity_of_items = 20
+    strategy = MagicMock()
+
+    DebitStoreUseCase(strategy).execute(DebitStoreRequest(store=store, product_class=sku, quantity_of_items=15))
+    order = strategy.request_credit.call_args.kwargs["order_info"]
+    assert order.product_class is sku and order.quantity == sku.value - 5
+    assert store.warehouses.quantities[sku.index] == 5
+    assert store.warehouses[sku].state == InventoryState.RED
+    assert list(store.pending_cd_orders) == [sku]
+
+    StoreReceiveCreditUseCase().execute(CreditStoreRequest(
+        store=store, product_class=sku, quantity_of_items=order.quantity, order_id=order.order_id
+    ))
+    assert store.warehouses[sku].quantity_of_items == sku.value
+    assert store.warehouses[sku].state == InventoryState.GREEN
+    assert len(store.pending_cd_orders[sku]) == 0
+    assert store.warehouses[catalog.sku(7655)].quantity_of_items == 0
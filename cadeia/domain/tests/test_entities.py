@@ -0,0 +1,27 @@
+"""Tests of the pending orders and their running total"""
+from cadeia.domain.entities import OrderInfo, PendingOrders, ProductClasses
+
+
+def test_total_quantity_follows_the_orders():
+    """Tests that the total quantity matches the sum of the orders after appending,
+        replacing and popping them
+    """
+    first = OrderInfo("loja", ProductClasses.A, quantity=10)
+    second = OrderInfo("loja", ProductClasses.A, quantity=20)
+    pending = PendingOrders([first, second])
+    assert pending.total_quantity == 30
+
+    pending.append(OrderInfo("loja", ProductClasses.A, quantity=5, order_id=first.order_id))
+    assert len(pending) == 2 and pending.total_quantity == 25
+
+    third = OrderInfo("loja", ProductClasses.A, quantity=20)
+    pending.append(third)
+    assert pending.pop_matching(20) is second
+    assert pending.pop(first.order_id).quantity == 5
+    assert pending.pop(first.order_id) is None
+    assert pending.pop_matching(7) is None
+    assert list(pending) == [third]
+    assert pending.total_quantity == 20 == sum(order.quantity for order in pending)
+
+    assert pending.pop(third.order_id) is third
+    assert pending.total_quantity == 0
@@ -0,0 +1,49 @@
+"""Tests of the array backed store table"""
+from unittest.mock import MagicMock
+
+from cadeia.app.store.requests import CreditStoreRequest, DebitStoreRequest
+from cadeia.app.store.use_cases import DebitStoreUseCase, StoreReceiveCreditUseCase
+from cadeia.domain.entities import InventoryState, ProductClasses
+from cadeia.domain.tables import StoreTable
+
+
+def test_store_use_cases_run_on_table_views():
+    """Tests that a debit and the credit of the order it causes go through the table arrays"""
+    table = StoreTable()
+    table.add("loja_vizinha", quantity_of_items=60, state=InventoryState.GREEN)
+    index = table.add("loja_dos_sonhos", quantity_of_items=60, state=InventoryState.GREEN)
+    strategy = MagicMock()
+
+    store = DebitStoreUseCase(strategy).execute(DebitStoreRequest(
+        store=table["loja_dos_sonhos"],
+        product_class=ProductClasses.A,
+        quantity_of_items=50
+    )).store
+    order = strategy.request_credit.call_args.kwargs["order_info"]
+    assert order.quantity == 90
+    assert store.warehouses[ProductClasses.A].state == InventoryState.RED
+    assert table.quantities[table.slot(index, ProductClasses.A)] == 10
+    assert table.pending[table.slot(index, ProductClasses.A)].total_quantity == 90
+
+    StoreReceiveCreditUseCase().execute(CreditStoreRequest(
+        store=table.view(index),
+        product_class=ProductClasses.A,
+        quantity_of_items=90,
+        order_id=order.order_id
+    ))
+    store = table.view(index).as_store()
+    assert store.warehouses[ProductClasses.A].quantity_of_items == 100
+    assert store.warehouses[ProductClasses.A].state == InventoryState.GREEN
+    assert len(store.pending_cd_orders[ProductClasses.A]) == 0
+    assert table["loja_vizinha"].warehouses[ProductClasses.A].quantity_of_items == 60
+
+
+def test_table_copies_stores():
+    """Tests that a store copied to the table reads back equal"""
+    table = StoreTable()
+    table.add("loja", quantity_of_items=7, state=InventoryState.YELLOW)
+    store = table["loja"].as_store()
+    copy = StoreTable()
+    copy.add_store(store)
+    assert copy["loja"].as_store() == store
+    assert "loja" in copy and len(copy) == 1
@@ -1,55 +1,57 @@
 """Defines factories
 """
-from concurrent.futures import Executor
-import json
-from logging import FileHandler, Logger, StreamHandler, getLogger, INFO
+from logging import DEBUG, Logger, getLogger
 import os
-from random import choice, randint
-from time import sleep
-from typing import Callable, List
+import threading
+from typing import Callable, Dict, Optional
 from uuid import uuid4
-import concurrent.futures
 import paho.mqtt.client as paho
 from paho import mqtt
 from cadeia.adapters.cd_controller import CDController
+from cadeia.adapters.codecs import JSON_CODEC, Codec
+from cadeia.adapters.dedup import DedupSettings
+from cadeia.adapters.dispatch import Dispatcher
 from cadeia.adapters.factory_controller import FactoryController
+from cadeia.adapters.metrics import REGISTRY, MetricsRegistry
+from cadeia.adapters.profiling import ComponentProfiler
 from cadeia.adapters.solutions import Broker
 from cadeia.adapters.store_controller import StoreController
+from cadeia.adapters.tracing import TraceCollector
 from cadeia.adapters.strategies import PahoCDRequestCreditStrategy, PahoCDSendCreditStrategy, PahoFactorySendCreditStrategy, PahoRequestCreditStrategy
+from cadeia.adapters.transports import PahoTransport, Transport
 from cadeia.app.cd.use_cases import DebitDistributionCenterUseCase, DistributionCenterReceiveCreditUseCase
 from cadeia.app.factory.use_cases import DebitFactoryUseCase
 from cadeia.app.store.use_cases import DebitStoreUseCase, StoreReceiveCreditUseCase
-from cadeia.domain.entities import ProductClasses
+from cadeia.domain.catalog import Catalog
 
 logger = getLogger(__name__)
-logger.setLevel(INFO)
-logger.addHandler(FileHandler('cadeia_de_abastecimento.log'))
-logger.addHandler(StreamHandler())
 
-# setting callbacks for different events to see if it works, print the message etc.
+# paho callbacks logging the connection events, the debug ones skip the formatting unless debugging
 
 
 def on_connect(client, userdata, flags, rc, properties=None):
-    print("CONNACK received with code %s." % rc, flush=True)
+    logger.info("CONNACK received with code %s.", rc)
 
-# with this callback you can see if your publish was successful
+# logs the id of each acknowledged publish
 
 
 def on_publish(client, userdata, mid, properties=None):
-    print("mid: " + str(mid), flush=True)
+    if logger.isEnabledFor(DEBUG):
+        logger.debug("mid: %s", mid)
 
-# print which topic was subscribed to
+# logs the id and granted qos of each subscription
 
 
 def on_subscribe(client, userdata, mid, granted_qos, properties=None):
-    print("Subscribed: " + str(mid) + " " + str(granted_qos), flush=True)
+    if logger.isEnabledFor(DEBUG):
+        logger.debug("Subscribed: %s %s", mid, granted_qos)
 
-# print message, useful for checking if it was successful
+# default message callback of get_client, logs each received message
 
 
 def on_message(client, userdata, msg):
-    print("msg")
-    print(msg.topic + " " + str(msg.qos) + " " + str(msg.payload), flush=True)
+    if logger.isEnabledFor(DEBUG):
+        logger.debug("msg %s %s %s", msg.topic, msg.qos, msg.payload)
 
 # using MQTT version 5 here, for 3.1.1: MQTTv311, 3.1: MQTTv31
 # userdata is user defined data of any type, updated by user_data_set()
@@ -65,8 +67,8 @@ def get_client(
     # enable TLS for secure connection
     client.tls_set(tls_version=mqtt.client.ssl.PROTOCOL_TLS)
     # set username and password
-    print(os.getenv("HIVEMQTT_USER"), os.getenv("HIVEMQTT_PASSWD"),
-          os.getenv("HIVEMQTT_HOST"), int(os.getenv("HIVEMQTT_PORT")))
+    logger.debug("connecting to %s:%s as %s", os.getenv("HIVEMQTT_HOST"),
+                 os.getenv("HIVEMQTT_PORT"), os.getenv("HIVEMQTT_USER"))
     client.username_pw_set(os.getenv("HIVEMQTT_USER"), os.getenv("HIVEMQTT_PASSWD"))
     # connect to HiveMQ Cloud on port 8883 (default for MQTT)
     client.connect(host=os.getenv("HIVEMQTT_HOST"), port=int(os.getenv("HIVEMQTT_PORT")))
@@ -78,96 +80,134 @@ def get_client(
     return client
 
 
-def get_cd(logger: Logger):
+_transports: Dict[int, PahoTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_paho_transport() -> Transport:
+    """Returns the MQTT connection shared by every component of the current process
+
+    The connection is opened on first use and kept by process id, so the
+    supervisor workers started by fork open their own instead of sharing the
+    one of the supervisor.
+    """
+    with _transports_lock:
+        pid = os.getpid()
+        if pid not in _transports:
+            _transports[pid] = PahoTransport(get_client)
+        return _transports[pid]
+
+
+def get_cd(
+    logger: Logger,
+    share_group: Optional[str] = None,
+    transport_callback: Callable[[], Transport] = get_paho_transport,
+    codec: Codec = JSON_CODEC,
+    distribution_center_id: Optional[str] = None,
+    dispatcher: Optional[Dispatcher] = None,
+    metrics: MetricsRegistry = REGISTRY,
+    profiler: Optional[ComponentProfiler] = None,
+    dedup: Optional[DedupSettings] = DedupSettings(),
+    catalog: Optional[Catalog] = None
+):
+    distribution_center_id = distribution_center_id or str(uuid4())
     return CDController(
         cd_receive_credit_use_case=DistributionCenterReceiveCreditUseCase(
             send_credit_strategy=PahoCDSendCreditStrategy(
-                paho_client_callback=get_client,
-                logger=logger
+                transport_callback=transport_callback,
+                logger=logger,
+                codec=codec,
+                metrics=metrics
             )
         ),
         cd_debit_use_case=DebitDistributionCenterUseCase(
             request_credit_strategy=PahoCDRequestCreditStrategy(
-                paho_client_callback=get_client,
-                logger=logger
+                transport_callback=transport_callback,
+                logger=logger,
+                codec=codec,
+                metrics=metrics
             ),
             send_credit_strategy=PahoCDSendCreditStrategy(
-                paho_client_callback=get_client,
-                logger=logger
+                transport_callback=transport_callback,
+                logger=logger,
+                codec=codec,
+                metrics=metrics
             )
         ),
-        broker=Broker(get_client),
-        distribution_center=str(uuid4()),
-        logger=logger
+        broker=Broker(
+            transport_callback, dispatcher=dispatcher, entity_id=distribution_center_id, component="cd", metrics=metrics,
+            profiler=profiler, dedup=dedup, catalog=catalog),
+        distribution_center=distribution_center_id,
+        logger=logger,
+        share_group=share_group,
+        metrics=metrics,
+        catalog=catalog
     )
 
 
-def get_store(logger: Logger):
+def get_store(
+    logger: Logger,
+    transport_callback: Callable[[], Transport] = get_paho_transport,
+    codec: Codec = JSON_CODEC,
+    store_id: Optional[str] = None,
+    dispatcher: Optional[Dispatcher] = None,
+    metrics: MetricsRegistry = REGISTRY,
+    traces: Optional[TraceCollector] = None,
+    profiler: Optional[ComponentProfiler] = None,
+    dedup: Optional[DedupSettings] = DedupSettings(),
+    catalog: Optional[Catalog] = None
+):
+    store_id = store_id or str(uuid4())
     return StoreController(
         store_receive_credit_use_case=StoreReceiveCreditUseCase(),
         store_debit_use_case=DebitStoreUseCase(
             request_credit_strategy=PahoRequestCreditStrategy(
-                paho_client_callback=get_client,
-                logger=logger
+                transport_callback=transport_callback,
+                logger=logger,
+                codec=codec,
+                metrics=metrics,
+                trace_rate=traces.rate if traces else 0.0
             )
         ),
-        broker=Broker(get_client),
-        store=str(uuid4()),
-        logger=logger
+        broker=Broker(
+            transport_callback, dispatcher=dispatcher, entity_id=store_id, component="store", metrics=metrics,
+            profiler=profiler, dedup=dedup, catalog=catalog),
+        store=store_id,
+        logger=logger,
+        metrics=metrics,
+        traces=traces,
+        catalog=catalog
     )
 
 
-def get_factory(logger: Logger):
+def get_factory(
+    logger: Logger,
+    share_group: Optional[str] = None,
+    transport_callback: Callable[[], Transport] = get_paho_transport,
+    codec: Codec = JSON_CODEC,
+    factory_id: Optional[str] = None,
+    dispatcher: Optional[Dispatcher] = None,
+    metrics: MetricsRegistry = REGISTRY,
+    profiler: Optional[ComponentProfiler] = None,
+    dedup: Optional[DedupSettings] = DedupSettings(),
+    catalog: Optional[Catalog] = None
+):
+    factory_id = factory_id or str(uuid4())
     return FactoryController(
         factory_debit_use_case=DebitFactoryUseCase(
             send_credit_strategy=PahoFactorySendCreditStrategy(
-                paho_client_callback=get_client,
-                logger=logger
+                transport_callback=transport_callback,
+                logger=logger,
+                codec=codec,
+                metrics=metrics
             )
         ),
-        broker=Broker(get_client),
-        factory=str(uuid4()),
-        logger=logger
+        broker=Broker(
+            transport_callback, dispatcher=dispatcher, entity_id=factory_id, component="factory", metrics=metrics,
+            profiler=profiler, dedup=dedup, catalog=catalog),
+        factory=factory_id,
+        logger=logger,
+        share_group=share_group,
+        metrics=metrics
     )
 
-
-def client_consume(created_stores: List[StoreController]):
-    client = get_client()
-    client.loop_start()
-    client_id = str(uuid4())
-    while True:
-        product_class: ProductClasses = choice(list(ProductClasses))
-        quantity = randint(0, product_class.value)
-        selected_store = choice(created_stores)._store  # pylint: disable=protected-access
-        logger.info('client %s is buying %s:%s from %s', client_id,
-                    product_class.name, quantity, selected_store.store_id)
-        info = client.publish(
-            topic=f"store/{selected_store.store_id}",
-            payload=json.dumps({
-                "entity_id": selected_store.store_id,
-                "product_class": product_class.name,
-                "quantity": quantity,
-                "purpose": "debit"
-            })
-        )
-        info.wait_for_publish()
-        sleep(randint(10, 5000)/1000)
-
-
-def create_component(
-    pool: Executor,
-    creation_callback: Callable,
-    number: int,
-    name: str
-):
-    components = []
-    for i in range(number):
-        component = creation_callback()
-        job = pool.submit(component.start)
-        components.append(component)
-        try:
-            job.exception(1)
-        except concurrent.futures._base.TimeoutError as _:  # pylint: disable=protected-access
-            logger.info('running')
-        logger.info("created %sst %s", str(i+1), name)
-    return components
@@ -0,0 +1,282 @@
+"""Defines the asyncio host running many components in a single process
+"""
+import asyncio
+from logging import Logger
+import signal
+from time import monotonic
+from typing import Any, Callable, Coroutine, List, Optional, Union
+
+from cadeia.adapters.batching import BatchingTransport, BatchSettings
+from cadeia.adapters.cd_controller import CDController
+from cadeia.adapters.codecs import JSON_CODEC, Codec
+from cadeia.adapters.dedup import DedupSettings
+from cadeia.adapters.dispatch import Dispatcher
+from cadeia.adapters.factory_controller import FactoryController
+from cadeia.adapters.profiling import ComponentProfiler
+from cadeia.adapters.store_controller import StoreController
+from cadeia.adapters.tracing import STAGES, TraceCollector
+from cadeia.adapters.transports import InMemoryTransport, PahoTransport, Transport
+from cadeia.domain.catalog import Catalog
+from cadeia.main.factories import get_cd, get_client, get_factory, get_store
+from cadeia.main.load import LoadGenerator, LoadSettings
+
+
+class AsyncComponentHost:
+    """Runs many controllers on one asyncio event loop
+
+    The controllers are subscribed without blocking and share the host
+    transport, whose message callbacks run on the event loop, so one process
+    can host thousands of stores, cds and factories instead of one.
+    """
+
+    def __init__(self, transport: Transport, dispatcher: Optional[Dispatcher] = None):
+        """
+        Args:
+            transport (Transport): Transport shared by the controllers
+            dispatcher (Optional[Dispatcher]): Dispatcher the controllers handle their
+                messages on, stopped along with the host
+        """
+        self._transport = transport
+        self.dispatcher = dispatcher
+        self._coroutines: List[Coroutine[Any, Any, None]] = []
+        self.components: List[Any] = []
+
+    def add(self, component: Any) -> Any:
+        """Subscribes a controller to the host transport
+
+        Args:
+            component (Any): Store, cd or factory controller
+
+        Returns:
+            Any: The added controller
+        """
+        component.subscribe()
+        self.components.append(component)
+        return component
+
+    def add_task(self, coroutine: Coroutine[Any, Any, None]):
+        """Schedules a coroutine, like a simulated client, to run with the host
+
+        Args:
+            coroutine (Coroutine): Coroutine to run while the host runs
+        """
+        self._coroutines.append(coroutine)
+
+    async def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Waits, without blocking the event loop, until the host transport is
+            connected and every controller subscription is in place
+
+        Args:
+            timeout (Optional[float]): Maximum seconds to wait, if None waits forever
+
+        Returns:
+            bool: False if the timeout expired before the transport was ready
+        """
+        return await asyncio.get_running_loop().run_in_executor(None, self._transport.wait_ready, timeout)
+
+    async def run(self):
+        """Runs the transport and the scheduled tasks until the host is stopped"""
+        tasks = [asyncio.ensure_future(coroutine) for coroutine in self._coroutines]
+        self._coroutines = []
+        try:
+            await self._transport.serve()
+        finally:
+            for task in tasks:
+                task.cancel()
+            if self.dispatcher:
+                self.dispatcher.stop()
+
+    def stop(self):
+        """Stops the host transport"""
+        self._transport.stop()
+
+
+async def run_in_thread(generator: LoadGenerator):
+    """Runs the generator in a thread, for transports acking from their own thread"""
+    try:
+        await asyncio.get_running_loop().run_in_executor(None, generator.run)
+    finally:
+        generator.stop()
+
+
+def watch_profile_requests(transport: Transport, profiler: ComponentProfiler, components: List[Any]):
+    """Toggles the profile of the process on SIGUSR1, where the event loop supports signals,
+        and subscribes to the profile requests of the hosted components
+    """
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGUSR1, profiler.toggle)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        pass
+    kinds = {}
+    for component in components:
+        if isinstance(component, StoreController):
+            kinds[component.store_id] = "store"
+        elif isinstance(component, CDController):
+            kinds[component.distribution_center_id] = "cd"
+        elif isinstance(component, FactoryController):
+            kinds[component.factory_id] = "factory"
+    transport.subscribe("control/+/profile", profiler.handle_control(kinds), qos=1)
+
+
+async def log_traces(traces: TraceCollector, logger: Logger, interval: float = 10):
+    """Logs the mean breakdown of the recently traced orders periodically"""
+    while True:
+        await asyncio.sleep(interval)
+        summary = traces.summary()
+        if summary:
+            logger.info(
+                "traced orders replenished in %.2fms: transit %.2fms, queueing %.2fms, use cases %.2fms, "
+                "pending %.2fms, factory %.2fms",
+                *(summary[stage] * 1000 for stage in ("replenish", *STAGES))
+            )
+
+
+async def host_components(
+    logger: Logger,
+    number_of_factories: int,
+    number_of_cds: int,
+    number_of_stores: int,
+    load_settings: Optional[LoadSettings] = None,
+    share_group: Optional[str] = None,
+    transport: Union[str, Transport] = "paho",
+    codec: Codec = JSON_CODEC,
+    batch_settings: Optional[BatchSettings] = None,
+    id_prefix: Optional[str] = None,
+    on_ready: Optional[Callable[[AsyncComponentHost, Optional[LoadGenerator]], None]] = None,
+    ready_timeout: Optional[float] = 60,
+    dispatch_threads: int = 0,
+    trace_rate: float = 0.0,
+    profile_dir: Optional[str] = ".",
+    dedup: Optional[DedupSettings] = DedupSettings(),
+    catalog: Optional[Catalog] = None
+):
+    """Builds the components and runs them all on the running event loop until the host is stopped
+
+    Args:
+        logger (Logger): Logger of the components
+        number_of_factories (int): Factories to host
+        number_of_cds (int): Cds to host
+        number_of_stores (int): Stores to host
+        load_settings (Optional[LoadSettings]): When given, clients buy from the hosted stores
+        share_group (Optional[str]): Shared subscription group of the cds and factories
+        transport (Union[str, Transport], optional): paho, memory or the transport itself. Defaults to "paho".
+        codec (Codec, optional): Wire format of the published messages. Defaults to JSON_CODEC.
+        batch_settings (Optional[BatchSettings]): When given, messages are published in batches
+        id_prefix (Optional[str]): When given, the components get the ids <prefix>-store-<n>,
+            <prefix>-cd-<n> and <prefix>-factory-<n> instead of random ones
+        on_ready (Optional[Callable]): Called with the host and the load generator, if any,
+            once the components are subscribed and before the host runs
+        ready_timeout (Optional[float]): Maximum seconds waiting for the subscriptions to be
+            acknowledged before starting the clients anyway. Defaults to 60.
+        dispatch_threads (int, optional): When positive, the messages are handled by a dispatcher
+            of this many threads, and the connection runs in a thread of its own instead of on the
+            event loop, so handling never holds the network I/O. Defaults to 0.
+        trace_rate (float, optional): Fraction of the store orders traced through the chain, their
+            time to replenish and its breakdown go to the metrics of the process. Defaults to 0.
+        profile_dir (Optional[str], optional): Directory of the profiles taken while the host runs,
+            a SIGUSR1 toggles the profile of the process and a start or stop message on
+            control/<component id>/profile the one of a component. None disables them. Defaults to ".".
+        dedup (Optional[DedupSettings], optional): Cache of the message ids received by each
+            component, dropping the repeated deliveries. None disables it.
+        catalog (Optional[Catalog], optional): Skus held by the stores and cds, and bought by the
+            clients, instead of the ProductClasses
+    """
+    started_at = monotonic()
+    dispatcher = Dispatcher(dispatch_threads) if dispatch_threads > 0 else None
+    # the dispatcher threads publish, so the transport can not be bound to the event loop
+    loop = None if dispatcher else asyncio.get_running_loop()
+    if isinstance(transport, Transport):
+        host_transport = transport
+    elif transport == "paho":
+        host_transport = PahoTransport(get_client, loop=loop)
+    else:
+        host_transport = InMemoryTransport()
+    if batch_settings:
+        host_transport = BatchingTransport(host_transport, batch_settings, loop=loop)
+    host = AsyncComponentHost(host_transport, dispatcher=dispatcher)
+    traces = TraceCollector(trace_rate) if trace_rate > 0 else None
+    profiler = ComponentProfiler(profile_dir, logger=logger) if profile_dir else None
+    host_transport.connect()
+
+    def transport_callback():
+        return host_transport
+
+    def component_id(kind: str, number: int) -> Optional[str]:
+        return f"{id_prefix}-{kind}-{number}" if id_prefix else None
+
+    for number in range(number_of_factories):
+        host.add(get_factory(
+            logger, share_group=share_group, transport_callback=transport_callback, codec=codec,
+            factory_id=component_id("factory", number), dispatcher=dispatcher, profiler=profiler,
+            dedup=dedup, catalog=catalog))
+    for number in range(number_of_cds):
+        host.add(get_cd(
+            logger, share_group=share_group, transport_callback=transport_callback, codec=codec,
+            distribution_center_id=component_id("cd", number), dispatcher=dispatcher, profiler=profiler,
+            dedup=dedup, catalog=catalog))
+    stores = [
+        host.add(get_store(
+            logger, transport_callback=transport_callback, codec=codec, store_id=component_id("store", number),
+            dispatcher=dispatcher, traces=traces, profiler=profiler, dedup=dedup, catalog=catalog))
+        for number in range(number_of_stores)
+    ]
+    if profiler:
+        watch_profile_requests(host_transport, profiler, host.components)
+    if await host.wait_ready(ready_timeout):
+        logger.info("hosting %s factories, %s cds and %s stores, ready in %.2fs",
+                    number_of_factories, number_of_cds, number_of_stores, monotonic() - started_at)
+    else:
+        logger.warning("subscriptions not acknowledged after %ss, starting anyway", ready_timeout)
+    generator = None
+    if stores and load_settings:
+        generator = LoadGenerator(
+            transport_callback,
+            [store.store_id for store in stores],
+            logger,
+            settings=load_settings,
+            codec=codec,
+            catalog=catalog
+        )
+        host.add_task(run_in_thread(generator) if dispatcher else generator.run_async())
+    if traces:
+        host.add_task(log_traces(traces, logger))
+    if on_ready:
+        on_ready(host, generator)
+    await host.run()
+
+
+def run_host(
+    logger: Logger,
+    number_of_factories: int,
+    number_of_cds: int,
+    number_of_stores: int,
+    load_settings: Optional[LoadSettings] = None,
+    share_group: Optional[str] = None,
+    transport: str = "paho",
+    codec: Codec = JSON_CODEC,
+    batch_settings: Optional[BatchSettings] = None,
+    dispatch_threads: int = 0,
+    trace_rate: float = 0.0,
+    profile_dir: Optional[str] = ".",
+    dedup: Optional[DedupSettings] = DedupSettings(),
+    catalog: Optional[Catalog] = None
+):
+    """Builds the components and runs them all on one event loop, blocking forever,
+        see host_components
+    """
+    asyncio.run(host_components(
+        logger,
+        number_of_factories,
+        number_of_cds,
+        number_of_stores,
+        load_settings=load_settings,
+        share_group=share_group,
+        transport=transport,
+        codec=codec,
+        batch_settings=batch_settings,
+        dispatch_threads=dispatch_threads,
+        trace_rate=trace_rate,
+        profile_dir=profile_dir,
+        dedup=dedup,
+        catalog=catalog
+    ))
@@ -0,0 +1,313 @@
+"""Defines the open loop load generator simulating the store clients
+"""
+import asyncio
+from bisect import bisect_left, bisect_right
+import csv
+from dataclasses import dataclass, field
+from logging import Logger
+from random import Random
+import threading
+from time import monotonic, sleep
+from typing import Callable, List, Optional, Sequence, Tuple
+
+from cadeia.adapters.codecs import JSON_CODEC, Codec
+from cadeia.adapters.topics import topic
+from cadeia.adapters.transports import Transport
+from cadeia.domain.catalog import Catalog
+from cadeia.domain.entities import OrderInfo, ProductClasses
+
+LOAD_MODES = ("constant", "poisson", "profile")
+
+
+class LatencyHistogram:
+    """Histogram of latencies in milliseconds with fixed, roughly logarithmic, buckets"""
+    BOUNDS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+    def __init__(self):
+        self.counts = [0] * (len(self.BOUNDS) + 1)
+        self.total = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        """Records a latency in milliseconds"""
+        self.counts[bisect_left(self.BOUNDS, value)] += 1
+        self.total += 1
+        self.sum += value
+
+    def percentile(self, fraction: float) -> float:
+        """Upper bound of the bucket holding the given fraction of the observations
+
+        Args:
+            fraction (float): Between 0 and 1, 0.99 for the p99
+
+        Returns:
+            float: Latency in milliseconds, inf if it is past the last bucket
+        """
+        threshold = fraction * self.total
+        accumulated = 0
+        for idx, count in enumerate(self.counts):
+            accumulated += count
+            if count and accumulated >= threshold:
+                return self.BOUNDS[idx] if idx < len(self.BOUNDS) else float("inf")
+        return 0.0
+
+    def buckets(self) -> List[Tuple[str, int]]:
+        """Returns the count of each bucket labeled by its upper bound"""
+        labels = [str(bound) for bound in self.BOUNDS] + ["+Inf"]
+        return list(zip(labels, self.counts))
+
+
+@dataclass
+class DemandProfile:
+    """Target aggregate rate over time, each point holds until the next one"""
+    points: List[Tuple[float, float]]
+
+    @classmethod
+    def from_csv(cls, path: str) -> "DemandProfile":
+        """Loads a profile from a csv file of seconds since the start and purchases per second
+
+        Args:
+            path (str): Path of the csv file, a header line is allowed
+
+        Returns:
+            DemandProfile: Loaded profile
+        """
+        points = []
+        with open(path, newline="", encoding="utf-8") as profile_file:
+            for row in csv.reader(profile_file):
+                try:
+                    points.append((float(row[0]), float(row[1])))
+                except (ValueError, IndexError):
+                    continue
+        return cls(points=sorted(points))
+
+    def rate_at(self, elapsed: float) -> float:
+        """Rate of the point in effect at the elapsed time"""
+        idx = bisect_right([start for start, _ in self.points], elapsed) - 1
+        return self.points[idx][1] if idx >= 0 else 0.0
+
+
+@dataclass
+class LoadReport:
+    """Numbers of a load generation run"""
+    elapsed: float = 0.0
+    sent: int = 0
+    acked: int = 0
+    max_lag: float = 0.0
+    latency: LatencyHistogram = field(default_factory=LatencyHistogram)
+
+    @property
+    def achieved_rate(self) -> float:
+        return self.sent / self.elapsed if self.elapsed else 0.0
+
+    def summary(self) -> str:
+        """One line description of the report"""
+        return (
+            f"sent {self.sent} purchases in {self.elapsed:.1f}s ({self.achieved_rate:.1f}/s), "
+            f"{self.acked} acked, {self.sent - self.acked} in flight, max schedule lag {self.max_lag * 1000:.1f}ms, "
+            f"ack latency p50 {self.latency.percentile(.5)}ms p90 {self.latency.percentile(.9)}ms "
+            f"p99 {self.latency.percentile(.99)}ms"
+        )
+
+
+@dataclass
+class LoadSettings:
+    """Settings of the load generator
+
+    Args:
+        rate (float): Target purchases per second of all the clients, ignored by the profile mode
+        mode (str): constant, poisson or profile
+        profile (Optional[DemandProfile]): Rates replayed by the profile mode
+        virtual_clients (int): Number of simulated clients
+        window (int): Maximum publishes waiting for ack
+        seed (Optional[int]): Seed of the random choices
+        report_interval (float): Seconds between logged reports
+    """
+    rate: float = 1.0
+    mode: str = "poisson"
+    profile: Optional[DemandProfile] = None
+    virtual_clients: int = 1
+    window: int = 1000
+    seed: Optional[int] = None
+    report_interval: float = 10
+
+
+class LoadGenerator:
+    """Open loop generator of purchases from many virtual clients
+
+    Purchases are scheduled at the target aggregate rate, independently of how
+    fast the stores answer, and published without waiting for each ack. Only a
+    bounded window of unacknowledged publishes is allowed, past it the
+    generator waits and the schedule lag is reported.
+    """
+
+    def __init__(
+        self,
+        transport_callback: Callable[[], Transport],
+        store_ids: Sequence[str],
+        logger: Logger,
+        settings: LoadSettings = LoadSettings(),
+        codec: Codec = JSON_CODEC,
+        catalog: Optional[Catalog] = None
+    ):
+        if settings.mode not in LOAD_MODES:
+            raise ValueError(f"unknown load mode {settings.mode}")
+        if settings.mode == "profile" and not settings.profile:
+            raise ValueError("the profile mode needs a demand profile")
+        self._transport_callback = transport_callback
+        self._store_ids = list(store_ids)
+        self._logger = logger
+        self._settings = settings
+        self._codec = codec
+        self._client_ids = [f"client-{idx}" for idx in range(max(1, settings.virtual_clients))]
+        self._random = Random(settings.seed)
+        # choosing from a list takes the same time for catalogs of any size
+        self._classes: list = list(catalog if catalog is not None else ProductClasses)
+        self.report = LoadReport()
+        self._in_flight = 0
+        self._stopped = False
+
+    def _rate_at(self, elapsed: float) -> float:
+        if self._settings.mode == "profile":
+            return self._settings.profile.rate_at(elapsed)  # type: ignore
+        return self._settings.rate
+
+    def _interarrival(self, rate: float) -> float:
+        if self._settings.mode == "poisson":
+            return self._random.expovariate(rate)
+        return 1 / rate
+
+    def _next_purchase(self) -> Tuple[str, OrderInfo]:
+        product_class = self._random.choice(self._classes)
+        store_id = self._random.choice(self._store_ids)
+        return self._random.choice(self._client_ids), OrderInfo(
+            entity_id=store_id,
+            product_class=product_class,
+            quantity=self._random.randint(0, product_class.value)
+        )
+
+    def _send(self, transport: Transport, on_ack: Callable[[float], None]):
+        client_id, order = self._next_purchase()
+        self._logger.debug('client %s is buying %s:%s from %s', client_id,
+                           order.product_class.name, order.quantity, order.entity_id)
+        sent_at = monotonic()
+        self.report.sent += 1
+        transport.publish(
+            topic=topic("store", "debit", order.entity_id),
+            payload=self._codec.encode(order, "debit"),
+            qos=1,
+            on_ack=lambda: on_ack(sent_at)
+        )
+
+    def _record_ack(self, sent_at: float):
+        self._in_flight -= 1
+        self.report.acked += 1
+        self.report.latency.observe((monotonic() - sent_at) * 1000)
+
+    def _schedule(self, start: float, next_time: float) -> Optional[float]:
+        """Returns the time of the next purchase, or None if there is no demand now"""
+        rate = self._rate_at(next_time - start)
+        if rate <= 0:
+            return None
+        return next_time + self._interarrival(rate)
+
+    def _log_report(self, start: float, last_report: float) -> float:
+        now = monotonic()
+        self.report.elapsed = now - start
+        if now - last_report >= self._settings.report_interval:
+            self._logger.info("load generator %s", self.report.summary())
+            return now
+        return last_report
+
+    def stop(self):
+        """Stops the generation, run returns after the current purchase, or right away
+            when it is waiting for acks to free the window
+        """
+        self._stopped = True
+
+    def run(self, duration: Optional[float] = None) -> LoadReport:
+        """Generates load from the calling thread
+
+        Args:
+            duration (Optional[float]): Seconds to run, if None runs until stopped
+
+        Returns:
+            LoadReport: Report of the run
+        """
+        transport = self._transport_callback()
+        slots = threading.Condition()
+
+        def on_ack(sent_at: float):
+            with slots:
+                self._record_ack(sent_at)
+                slots.notify()
+
+        start = last_report = next_time = monotonic()
+        while not self._stopped and (duration is None or monotonic() - start < duration):
+            scheduled = self._schedule(start, next_time)
+            if scheduled is None:
+                sleep(.1)
+                next_time = monotonic()
+                continue
+            next_time = scheduled
+            delay = next_time - monotonic()
+            if delay > 0:
+                sleep(delay)
+            with slots:
+                while self._in_flight >= self._settings.window and not self._stopped:
+                    slots.wait(.1)
+                if self._stopped:
+                    break
+                self._in_flight += 1
+            # published outside the lock, paho acks while holding its own locks
+            self.report.max_lag = max(self.report.max_lag, monotonic() - next_time)
+            self._send(transport, on_ack)
+            last_report = self._log_report(start, last_report)
+        self.report.elapsed = monotonic() - start
+        return self.report
+
+    async def run_async(self, duration: Optional[float] = None) -> LoadReport:
+        """Generates load from the running event loop, the transport must ack on the same loop
+
+        Args:
+            duration (Optional[float]): Seconds to run, if None runs until stopped
+
+        Returns:
+            LoadReport: Report of the run
+        """
+        transport = self._transport_callback()
+        slot_freed = asyncio.Event()
+
+        def on_ack(sent_at: float):
+            self._record_ack(sent_at)
+            slot_freed.set()
+
+        start = last_report = next_time = monotonic()
+        while not self._stopped and (duration is None or monotonic() - start < duration):
+            scheduled = self._schedule(start, next_time)
+            if scheduled is None:
+                await asyncio.sleep(.1)
+                next_time = monotonic()
+                continue
+            next_time = scheduled
+            delay = next_time - monotonic()
+            await asyncio.sleep(max(delay, 0))
+            while self._in_flight >= self._settings.window and not self._stopped:
+                slot_freed.clear()
+                # polled like the threaded run, so a stop from any thread is seen without acks
+                try:
+                    await asyncio.wait_for(slot_freed.wait(), .1)
+                except asyncio.TimeoutError:
+                    pass
+            if self._stopped:
+                break
+            self._in_flight += 1
+            self.report.max_lag = max(self.report.max_lag, monotonic() - next_time)
+            self._send(transport, on_ack)
+            last_report = self._log_report(start, last_report)
+        self.report.elapsed = monotonic() - start
+        return self.report
+
+    def start(self):
+        """Generates load forever, blocking the caller"""
+        self.run()
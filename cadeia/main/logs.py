@@ -0,0 +1,218 @@
+"""Defines the logging pipeline keeping the file and console writes off the message path
+
+Usage: python -m cadeia.main.logs <binary log file>, prints its records as text
+"""
+import atexit
+from dataclasses import dataclass
+from logging import (
+    INFO,
+    FileHandler,
+    Filter,
+    Formatter,
+    Handler,
+    Logger,
+    LogRecord,
+    StreamHandler,
+    getLevelName,
+    makeLogRecord
+)
+from logging.handlers import QueueHandler, QueueListener
+from queue import SimpleQueue
+import struct
+import sys
+from time import monotonic
+from typing import BinaryIO, Callable, Dict, Hashable, Iterator, List, Optional, Tuple
+
+DEFAULT_FORMAT = "%(message)s"
+
+
+@dataclass(frozen=True)
+class LogSettings:
+    """Settings of the logging of a process
+
+    Args:
+        level (int): Minimum level logged, the records below it are not even created
+        file (Optional[str]): Path of the log file, {process} is replaced by the name of the process
+            so each process writes its own file. None disables the file.
+        console (bool): Whether the records are also written to stderr
+        binary (bool): Whether the file gets structured binary records instead of text
+        rate (Optional[float]): Records per second allowed for each entity and message, None allows all
+        burst (int): Records of an entity and message allowed at once before the rate applies
+    """
+    level: int = INFO
+    file: Optional[str] = "cadeia_de_abastecimento-{process}.log"
+    console: bool = True
+    binary: bool = False
+    rate: Optional[float] = None
+    burst: int = 10
+
+
+def entity_key(record: LogRecord) -> Hashable:
+    """Groups the records by message and first argument, which is the entity id in the component messages"""
+    first = record.args[0] if isinstance(record.args, tuple) and record.args else None
+    return record.msg, first if isinstance(first, str) else None
+
+
+class RateLimitFilter(Filter):
+    """Token bucket per key, dropping the records past the rate of their key"""
+
+    def __init__(self, rate: float, burst: int = 10, key: Callable[[LogRecord], Hashable] = entity_key):
+        """
+        Args:
+            rate (float): Records per second allowed for each key
+            burst (int, optional): Records allowed at once before the rate applies. Defaults to 10.
+            key (Callable[[LogRecord], Hashable], optional): Key of a record. Defaults to entity_key.
+        """
+        super().__init__()
+        self._rate = rate
+        self._burst = burst
+        self._key = key
+        self._buckets: Dict[Hashable, Tuple[float, float]] = {}
+        self.dropped = 0
+
+    def filter(self, record: LogRecord) -> bool:
+        now = monotonic()
+        key = self._key(record)
+        tokens, last = self._buckets.get(key, (self._burst, now))
+        tokens = min(self._burst, tokens + (now - last) * self._rate)
+        if tokens < 1:
+            self._buckets[key] = (tokens, now)
+            self.dropped += 1
+            return False
+        self._buckets[key] = (tokens - 1, now)
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """Queue handler enqueueing the records as they are, so their messages are
+        formatted by the listener thread instead of by the thread logging
+    """
+
+    def prepare(self, record: LogRecord) -> LogRecord:
+        return record
+
+
+_record_header = struct.Struct("!dBHHB")
+
+
+_arg_header = struct.Struct("!cH")
+_ARG_TYPES = {b"i": int, b"f": float, b"s": str}
+
+
+def _pack_arg(arg: object) -> bytes:
+    """Packs an argument as text tagged with its type, so the numeric conversions of the template still apply"""
+    kind = b"i" if type(arg) is int else b"f" if type(arg) is float else b"s"
+    encoded = str(arg).encode("utf-8", "replace")[:0xFFFF]
+    return _arg_header.pack(kind, len(encoded)) + encoded
+
+
+class BinaryRecordHandler(Handler):
+    """Writes each record as a binary structure with its time, level, logger,
+        message template and arguments, leaving the formatting to the reader
+    """
+
+    def __init__(self, path: str):
+        super().__init__()
+        self._stream: BinaryIO = open(path, "ab")  # pylint: disable=consider-using-with
+
+    def emit(self, record: LogRecord):
+        try:
+            args = record.args if isinstance(record.args, tuple) else ()
+            name = record.name.encode("utf-8", "replace")[:0xFFFF]
+            msg = str(record.msg).encode("utf-8", "replace")[:0xFFFF]
+            self._stream.write(
+                _record_header.pack(record.created, record.levelno, len(name), len(msg), min(len(args), 255))
+                + name + msg + b"".join(_pack_arg(arg) for arg in args[:255])
+            )
+        except Exception:  # pylint: disable=broad-except
+            self.handleError(record)
+
+    def flush(self):
+        self._stream.flush()
+
+    def close(self):
+        self._stream.close()
+        super().close()
+
+
+def read_binary_records(stream: BinaryIO) -> Iterator[LogRecord]:
+    """Reads the records written by a BinaryRecordHandler
+
+    Args:
+        stream (BinaryIO): Binary log file
+
+    Yields:
+        LogRecord: Records, whose getMessage formats the message
+    """
+    data = stream.read()
+    offset = 0
+    while offset + _record_header.size <= len(data):
+        created, level, name_length, msg_length, arg_count = _record_header.unpack_from(data, offset)
+        offset += _record_header.size
+        name = data[offset:offset + name_length].decode()
+        offset += name_length
+        msg = data[offset:offset + msg_length].decode()
+        offset += msg_length
+        args: List[object] = []
+        for _ in range(arg_count):
+            kind, length = _arg_header.unpack_from(data, offset)
+            offset += _arg_header.size
+            args.append(_ARG_TYPES.get(kind, str)(data[offset:offset + length].decode()))
+            offset += length
+        yield makeLogRecord({
+            "name": name, "msg": msg, "args": tuple(args), "levelno": level, "levelname": getLevelName(level),
+            "created": created, "msecs": (created - int(created)) * 1000
+        })
+
+
+def start_logging(logger: Logger, settings: LogSettings = LogSettings(), process: str = "main") -> QueueListener:
+    """Replaces the handlers of the logger by a queue, whose records are rate
+        limited and written by a single listener thread of this process
+
+    Args:
+        logger (Logger): Logger of the components
+        settings (LogSettings, optional): Level, destinations and rate limit
+        process (str, optional): Name of the process, part of the file name. Defaults to "main".
+
+    Returns:
+        QueueListener: Started listener, stopped at exit or by stop_logging
+    """
+    logger.setLevel(settings.level)
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+    handlers: List[Handler] = []
+    if settings.file:
+        path = settings.file.format(process=process)
+        handlers.append(BinaryRecordHandler(path) if settings.binary else FileHandler(path))
+    if settings.console:
+        handlers.append(StreamHandler())
+    for handler in handlers:
+        if not isinstance(handler, BinaryRecordHandler):
+            handler.setFormatter(Formatter(DEFAULT_FORMAT))
+    records: "SimpleQueue[LogRecord]" = SimpleQueue()
+    queue_handler = DeferredQueueHandler(records)
+    if settings.rate is not None:
+        queue_handler.addFilter(RateLimitFilter(settings.rate, settings.burst))
+    logger.addHandler(queue_handler)
+    logger.propagate = False
+    listener = QueueListener(records, *handlers, respect_handler_level=True)
+    listener.start()
+    atexit.register(stop_logging, listener)
+    return listener
+
+
+def stop_logging(listener: QueueListener):
+    """Writes the records still queued and stops the listener, if it is running"""
+    if listener._thread is not None:  # pylint: disable=protected-access
+        listener.stop()
+
+
+def main(path: str):
+    formatter = Formatter("%(asctime)s %(levelname)s %(name)s %(message)s")
+    with open(path, "rb") as log_file:
+        for record in read_binary_records(log_file):
+            print(formatter.format(record))
+
+
+if __name__ == "__main__":
+    main(sys.argv[1])
@@ -0,0 +1,191 @@
+"""Defines the split host, running the network I/O and the use cases of the
+components in two processes connected by shared memory ring buffers
+"""
+import asyncio
+from logging import Logger
+import multiprocessing
+from multiprocessing.synchronize import Event
+import signal
+import threading
+from time import sleep
+from typing import Awaitable, Optional
+
+from cadeia.adapters.batching import BatchingTransport, BatchSettings
+from cadeia.adapters.codecs import BINARY_CODEC, Codec
+from cadeia.adapters.dedup import DedupSettings
+from cadeia.adapters.ring import (
+    FRAME_MESSAGE,
+    FRAME_STOP,
+    FRAME_SUBSCRIBE,
+    FRAME_SYNC,
+    RingBuffer,
+    RingTransport,
+    decode_frame,
+    encode_frame
+)
+from cadeia.adapters.transports import InMemoryTransport, PahoTransport, Transport
+from cadeia.domain.catalog import Catalog
+from cadeia.main.factories import get_client
+from cadeia.main.host import host_components
+from cadeia.main.load import LoadSettings
+
+
+def run_io(
+    inbound_name: str,
+    outbound_name: str,
+    ready: Event,
+    transport: str = "paho",
+    batch_settings: Optional[BatchSettings] = None
+):
+    """Entry point of the I/O process, moves the frames between the rings and the network
+
+    The transport callbacks are the only producer of the inbound ring and the
+    main thread the only consumer of the outbound one, which it polls backing
+    off up to a millisecond while it is empty.
+
+    Args:
+        inbound_name (str): Ring the received messages are put in
+        outbound_name (str): Ring the messages to publish and the subscriptions are read from
+        ready (Event): Set once the transport has every subscription acknowledged
+        transport (str, optional): paho or memory. Defaults to "paho".
+        batch_settings (Optional[BatchSettings]): When given, messages are published in batches
+    """
+    inbound = RingBuffer.attach(inbound_name)
+    outbound = RingBuffer.attach(outbound_name)
+    io_transport: Transport = PahoTransport(get_client) if transport == "paho" else InMemoryTransport()
+    if batch_settings:
+        io_transport = BatchingTransport(io_transport, batch_settings)
+    io_transport.connect()
+    threading.Thread(target=io_transport.loop_forever, name="io-transport", daemon=True).start()
+    stopped = False
+
+    def forward(client, userdata, msg):  # pylint: disable=unused-argument
+        inbound.put_wait(encode_frame(FRAME_MESSAGE, msg.topic, msg.payload, msg.qos))
+
+    def handle(frame: memoryview):
+        nonlocal stopped
+        kind, qos, topic, payload = decode_frame(frame)
+        if kind == FRAME_MESSAGE:
+            io_transport.publish(topic, bytes(payload), qos=qos)
+        elif kind == FRAME_SUBSCRIBE:
+            io_transport.subscribe(topic, forward, qos=qos)
+        elif kind == FRAME_SYNC:
+            ready.clear()
+            threading.Thread(target=lambda: io_transport.wait_ready() and ready.set(), daemon=True).start()
+        elif kind == FRAME_STOP:
+            stopped = True
+
+    delay = 0.0
+    try:
+        while not stopped:
+            if outbound.drain(handle, max_records=256):
+                delay = 0.0
+                continue
+            sleep(delay)
+            delay = min(max(delay * 2, 1e-5), 1e-3)
+    finally:
+        io_transport.stop()
+        inbound.close()
+        outbound.close()
+
+
+async def until_terminated(host: Awaitable):
+    """Awaits the host until it ends or the process gets a SIGTERM, where the event loop supports signals"""
+    task = asyncio.ensure_future(host)
+    terminated = threading.Event()
+
+    def terminate():
+        terminated.set()
+        task.cancel()
+
+    try:
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, terminate)
+    except (AttributeError, NotImplementedError, RuntimeError):
+        pass
+    try:
+        await task
+    except asyncio.CancelledError:
+        # a cancel of the caller, as on SIGINT, still propagates
+        if not terminated.is_set():
+            raise
+
+
+def run_split_host(
+    logger: Logger,
+    number_of_factories: int,
+    number_of_cds: int,
+    number_of_stores: int,
+    load_settings: Optional[LoadSettings] = None,
+    share_group: Optional[str] = None,
+    transport: str = "paho",
+    codec: Codec = BINARY_CODEC,
+    batch_settings: Optional[BatchSettings] = None,
+    ring_capacity: int = 1 << 22,
+    id_prefix: Optional[str] = None,
+    trace_rate: float = 0.0,
+    profile_dir: Optional[str] = ".",
+    dedup: Optional[DedupSettings] = DedupSettings(),
+    catalog: Optional[Catalog] = None
+):
+    """Hosts the components in this process and runs their network I/O in another,
+        blocking forever
+
+    A SIGTERM cancels the components as a SIGINT does, so the rings are
+    unlinked before the process exits.
+
+    The processes exchange the encoded messages through two single producer,
+    single consumer rings in shared memory, one each way, so neither the
+    socket handling nor the use cases wait for the other to release the GIL.
+
+    Args:
+        logger (Logger): Logger of the components
+        number_of_factories (int): Factories to host
+        number_of_cds (int): Cds to host
+        number_of_stores (int): Stores to host
+        load_settings (Optional[LoadSettings]): When given, clients buy from the hosted stores
+        share_group (Optional[str]): Shared subscription group of the cds and factories
+        transport (str, optional): Transport of the I/O process, paho or memory. Defaults to "paho".
+        codec (Codec, optional): Wire format of the published messages. Defaults to BINARY_CODEC.
+        batch_settings (Optional[BatchSettings]): When given, the I/O process publishes in batches
+        ring_capacity (int, optional): Bytes of each ring. Defaults to 4 MiB.
+        id_prefix (Optional[str]): Prefix of the component ids, see host_components
+        trace_rate (float, optional): Fraction of the store orders traced, see host_components
+        profile_dir (Optional[str], optional): Directory of the profiles of the domain process,
+            see host_components
+        dedup (Optional[DedupSettings], optional): Cache of the received message ids, see host_components
+        catalog (Optional[Catalog], optional): Skus of the components, see host_components
+    """
+    inbound = RingBuffer.create(ring_capacity)
+    outbound = RingBuffer.create(ring_capacity)
+    ready = multiprocessing.Event()
+    io_process = multiprocessing.Process(
+        target=run_io,
+        args=(inbound.name, outbound.name, ready, transport, batch_settings),
+        name="io",
+        daemon=True
+    )
+    io_process.start()
+    ring_transport = RingTransport(inbound, outbound, ready.wait)
+    try:
+        asyncio.run(until_terminated(host_components(
+            logger,
+            number_of_factories,
+            number_of_cds,
+            number_of_stores,
+            load_settings=load_settings,
+            share_group=share_group,
+            transport=ring_transport,
+            codec=codec,
+            id_prefix=id_prefix,
+            trace_rate=trace_rate,
+            profile_dir=profile_dir,
+            dedup=dedup,
+            catalog=catalog
+        )))
+    finally:
+        ring_transport.stop()
+        io_process.join(timeout=5)
+        if io_process.is_alive():
+            io_process.terminate()
+        inbound.close()
+        outbound.close()
@@ -0,0 +1,364 @@
+"""Defines the supervisor running the components in sharded worker processes
+"""
+import asyncio
+from dataclasses import dataclass, replace
+from logging import Logger
+import multiprocessing
+from multiprocessing.process import BaseProcess
+from queue import Empty
+import os
+import signal
+from time import monotonic, sleep
+from typing import Dict, List, Optional
+
+from cadeia.adapters.batching import BatchSettings
+from cadeia.adapters.codecs import get_codec
+from cadeia.adapters.dedup import DedupSettings
+from cadeia.adapters.metrics import MetricsExporter, MetricsSettings
+from cadeia.domain.catalog import Catalog
+from cadeia.main.host import AsyncComponentHost, host_components
+from cadeia.main.load import DemandProfile, LoadGenerator, LoadSettings
+from cadeia.main.logs import LogSettings, start_logging
+
+
+@dataclass(frozen=True)
+class ShardSpec:
+    """Compact description of the components a worker process builds and hosts
+
+    Args:
+        shard (int): Number of the shard, part of the ids of its components
+        number_of_factories (int): Factories of the shard
+        number_of_cds (int): Cds of the shard
+        number_of_stores (int): Stores of the shard
+        load_settings (Optional[LoadSettings]): Clients buying from the stores of the shard
+        share_group (Optional[str]): Shared subscription group of the cds and factories
+        transport (str): paho or memory
+        codec (str): Name of the wire format
+        batch_settings (Optional[BatchSettings]): Batching of the published messages
+        deployment (str): Prefix of the ids, so restarted shards keep the ids of their components
+        report_interval (float): Seconds between the load reports of the shard
+        dispatch_threads (int): Threads handling the received messages, 0 handles them on the event loop
+        log_settings (Optional[LogSettings]): When given, the worker logs through its own
+            pipeline and file instead of the handlers inherited from the supervisor
+        metrics_settings (Optional[MetricsSettings]): When given, the worker exposes its metrics,
+            on the port of the settings plus the number of the shard
+        trace_rate (float): Fraction of the store orders traced through the chain
+        profile_dir (Optional[str]): Directory of the profiles of the worker, see host_components
+        dedup (Optional[DedupSettings]): Cache of the received message ids, see host_components
+        catalog_path (Optional[str]): Csv file of the skus of the components, loaded by the worker,
+            see host_components
+    """
+    shard: int
+    number_of_factories: int = 0
+    number_of_cds: int = 0
+    number_of_stores: int = 0
+    load_settings: Optional[LoadSettings] = None
+    share_group: Optional[str] = None
+    transport: str = "paho"
+    codec: str = "json"
+    batch_settings: Optional[BatchSettings] = None
+    deployment: str = "cadeia"
+    report_interval: float = 10
+    dispatch_threads: int = 0
+    log_settings: Optional[LogSettings] = None
+    metrics_settings: Optional[MetricsSettings] = None
+    trace_rate: float = 0.0
+    profile_dir: Optional[str] = "."
+    dedup: Optional[DedupSettings] = DedupSettings()
+    catalog_path: Optional[str] = None
+
+    @property
+    def number_of_components(self) -> int:
+        return self.number_of_factories + self.number_of_cds + self.number_of_stores
+
+
+@dataclass
+class ShardReport:
+    """Load of a worker process, sent by the worker once its components are
+        ready and then every report interval
+    """
+    shard: int
+    pid: int
+    components: int
+    startup: float = 0.0
+    sent: int = 0
+    acked: int = 0
+    achieved_rate: float = 0.0
+    max_lag: float = 0.0
+    queue_depth: int = 0
+    mean_queue_wait: float = 0.0
+    max_queue_wait: float = 0.0
+
+
+def _share(total: int, parts: int, part: int) -> int:
+    return total // parts + (1 if part < total % parts else 0)
+
+
+def plan_shards(
+    workers: int,
+    number_of_factories: int,
+    number_of_cds: int,
+    number_of_stores: int,
+    load_settings: Optional[LoadSettings] = None,
+    **spec_fields
+) -> List[ShardSpec]:
+    """Splits the components evenly among the workers, the load of each shard
+        is proportional to its stores
+
+    Args:
+        workers (int): Number of worker processes, at least one is planned
+        number_of_factories (int): Factories of the deployment
+        number_of_cds (int): Cds of the deployment
+        number_of_stores (int): Stores of the deployment
+        load_settings (Optional[LoadSettings]): Load of the whole deployment
+        spec_fields: Other fields of every ShardSpec
+
+    Returns:
+        List[ShardSpec]: Specs of the shards with at least one component
+    """
+    workers = max(1, workers)
+    specs = []
+    for shard in range(workers):
+        stores = _share(number_of_stores, workers, shard)
+        shard_load = None
+        if load_settings and stores:
+            fraction = stores / number_of_stores
+            shard_load = replace(
+                load_settings,
+                rate=load_settings.rate * fraction,
+                profile=load_settings.profile and DemandProfile(
+                    [(elapsed, rate * fraction) for elapsed, rate in load_settings.profile.points]),
+                virtual_clients=max(1, round(load_settings.virtual_clients * fraction)),
+                window=max(1, round(load_settings.window * fraction)),
+                seed=None if load_settings.seed is None else load_settings.seed + shard
+            )
+        spec = ShardSpec(
+            shard=shard,
+            number_of_factories=_share(number_of_factories, workers, shard),
+            number_of_cds=_share(number_of_cds, workers, shard),
+            number_of_stores=stores,
+            load_settings=shard_load,
+            **spec_fields
+        )
+        if spec.number_of_components:
+            specs.append(spec)
+    return specs
+
+
+def run_shard(spec: ShardSpec, reports: "multiprocessing.Queue[ShardReport]", logger: Logger):
+    """Entry point of a worker process, builds the shard and hosts it on an event loop forever
+
+    Args:
+        spec (ShardSpec): Components of the shard
+        reports (multiprocessing.Queue): Queue the load reports are put on
+        logger (Logger): Logger of the components
+    """
+    started_at = monotonic()
+    if spec.log_settings:
+        start_logging(logger, spec.log_settings, process=f"shard-{spec.shard}")
+    if spec.metrics_settings:
+        settings = spec.metrics_settings
+        if settings.port:
+            settings = replace(settings, port=settings.port + spec.shard)
+        MetricsExporter(settings, process=f"shard-{spec.shard}").start()
+
+    async def report_load(host: AsyncComponentHost, generator: Optional[LoadGenerator], startup: float):
+        while True:
+            report = ShardReport(
+                shard=spec.shard, pid=os.getpid(), components=spec.number_of_components, startup=startup)
+            if generator:
+                report.sent = generator.report.sent
+                report.acked = generator.report.acked
+                report.achieved_rate = generator.report.achieved_rate
+                report.max_lag = generator.report.max_lag
+            if host.dispatcher:
+                queues = host.dispatcher.stats()
+                processed = sum(queue.processed for queue in queues)
+                report.queue_depth = sum(queue.depth for queue in queues)
+                report.mean_queue_wait = sum(queue.total_wait for queue in queues) / processed if processed else 0.0
+                report.max_queue_wait = max(queue.max_wait for queue in queues)
+            reports.put(report)
+            await asyncio.sleep(spec.report_interval)
+
+    def on_ready(host: AsyncComponentHost, generator: Optional[LoadGenerator]):
+        host.add_task(report_load(host, generator, monotonic() - started_at))
+
+    asyncio.run(host_components(
+        logger,
+        spec.number_of_factories,
+        spec.number_of_cds,
+        spec.number_of_stores,
+        load_settings=spec.load_settings,
+        share_group=spec.share_group,
+        transport=spec.transport,
+        codec=get_codec(spec.codec),
+        batch_settings=spec.batch_settings,
+        id_prefix=f"{spec.deployment}-{spec.shard}",
+        on_ready=on_ready,
+        dispatch_threads=spec.dispatch_threads,
+        trace_rate=spec.trace_rate,
+        profile_dir=spec.profile_dir,
+        dedup=spec.dedup,
+        catalog=Catalog.from_csv(spec.catalog_path) if spec.catalog_path else None
+    ))
+
+
+class Supervisor:
+    """Runs each shard in a worker process, restarting the ones that die
+
+    Workers only receive their ShardSpec and build their components
+    locally, hosting them all on one event loop, so the number of components
+    is not limited by the number of processes and nothing is pickled but the
+    specs and the load reports.
+    """
+
+    def __init__(
+        self,
+        specs: List[ShardSpec],
+        logger: Logger,
+        max_restarts: int = 5,
+        restart_delay: float = 1.0
+    ):
+        """
+        Args:
+            specs (List[ShardSpec]): Shards to run, one worker process each
+            logger (Logger): Logger of the supervisor
+            max_restarts (int, optional): Restarts of a shard before giving up on it. Defaults to 5.
+            restart_delay (float, optional): Seconds before restarting a dead worker,
+                doubled on each restart of the same shard. Defaults to 1.0.
+        """
+        if len(specs) > 1 and any(spec.transport == "memory" for spec in specs):
+            raise ValueError("the memory transport can not connect components of different worker processes")
+        self._specs = {spec.shard: spec for spec in specs}
+        self._logger = logger
+        self._max_restarts = max_restarts
+        self._restart_delay = restart_delay
+        self._reports: "multiprocessing.Queue[ShardReport]" = multiprocessing.Queue()
+        self._workers: Dict[int, BaseProcess] = {}
+        self._restart_at: Dict[int, float] = {}
+        self.restarts: Dict[int, int] = {spec.shard: 0 for spec in specs}
+        self.load: Dict[int, ShardReport] = {}
+        self._started_at = 0.0
+        self._stopped = False
+
+    def _spawn(self, shard: int):
+        worker = multiprocessing.Process(
+            target=run_shard, args=(self._specs[shard], self._reports, self._logger), name=f"shard-{shard}", daemon=True)
+        worker.start()
+        self._workers[shard] = worker
+        self._logger.info("worker %s started shard %s with %s components",
+                          worker.pid, shard, self._specs[shard].number_of_components)
+
+    def start(self):
+        """Starts a worker process for each shard, all at once"""
+        self._started_at = monotonic()
+        for shard in self._specs:
+            self._spawn(shard)
+
+    @property
+    def ready(self) -> bool:
+        """Whether every shard has reported its components ready"""
+        return all(shard in self.load for shard in self._specs)
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        """Supervises the workers until every shard is ready
+
+        Args:
+            timeout (Optional[float]): Maximum seconds to wait, if None waits forever
+
+        Returns:
+            bool: False if the timeout expired before every shard was ready
+        """
+        deadline = None if timeout is None else monotonic() + timeout
+        while True:
+            self.poll()
+            if self.ready:
+                return True
+            if not self._workers or (deadline is not None and monotonic() >= deadline):
+                return False
+            sleep(.05)
+
+    def poll(self):
+        """Collects the load reports and restarts the dead workers"""
+        while True:
+            try:
+                report = self._reports.get_nowait()
+            except Empty:
+                break
+            self.load[report.shard] = report
+        now = monotonic()
+        for shard, worker in list(self._workers.items()):
+            if worker.is_alive() or self._stopped:
+                continue
+            if self.restarts[shard] >= self._max_restarts:
+                self._logger.error("shard %s died %s times, giving up on it", shard, self.restarts[shard] + 1)
+                del self._workers[shard]
+                continue
+            if shard not in self._restart_at:
+                delay = self._restart_delay * 2 ** self.restarts[shard]
+                self._logger.warning("worker %s of shard %s exited with %s, restarting in %ss",
+                                     worker.pid, shard, worker.exitcode, delay)
+                self._restart_at[shard] = now + delay
+            if now >= self._restart_at[shard]:
+                del self._restart_at[shard]
+                self.restarts[shard] += 1
+                self._spawn(shard)
+
+    def forward_signal(self, signum: int, frame=None):  # pylint: disable=unused-argument
+        """Sends the signal to every worker, so a SIGUSR1 to the supervisor toggles the profiles of all of them"""
+        for worker in list(self._workers.values()):
+            if worker.is_alive() and worker.pid:
+                os.kill(worker.pid, signum)
+
+    def summary(self) -> str:
+        """One line per shard describing its worker and load"""
+        lines = []
+        for shard, spec in self._specs.items():
+            worker = self._workers.get(shard)
+            report = self.load.get(shard)
+            load = f"sent {report.sent} acked {report.acked} at {report.achieved_rate:.1f}/s" if report else "no report"
+            if report and spec.dispatch_threads:
+                load += (f", queue depth {report.queue_depth} wait mean {report.mean_queue_wait * 1000:.2f}ms "
+                         f"max {report.max_queue_wait * 1000:.2f}ms")
+            lines.append(
+                f"shard {shard} pid {worker.pid if worker else '-'} "
+                f"{'alive' if worker and worker.is_alive() else 'dead'} "
+                f"{spec.number_of_components} components, {self.restarts[shard]} restarts, {load}"
+            )
+        return "\n".join(lines)
+
+    def run(self, report_interval: float = 10, ready_timeout: Optional[float] = 120):
+        """Starts the workers and supervises them until stopped
+
+        Args:
+            report_interval (float, optional): Seconds between logged summaries. Defaults to 10.
+            ready_timeout (Optional[float], optional): Seconds waiting for every shard
+                to be ready before logging the startup time. Defaults to 120.
+        """
+        self.start()
+        if hasattr(signal, "SIGUSR1"):
+            signal.signal(signal.SIGUSR1, self.forward_signal)
+        try:
+            if self.wait_ready(ready_timeout):
+                self._logger.info("%s components of %s workers ready in %.2fs",
+                                  sum(spec.number_of_components for spec in self._specs.values()),
+                                  len(self._specs), monotonic() - self._started_at)
+            else:
+                self._logger.warning("not every worker was ready after %ss", ready_timeout)
+            last_report = monotonic()
+            while not self._stopped and self._workers:
+                self.poll()
+                if monotonic() - last_report >= report_interval:
+                    self._logger.info("supervisor\n%s", self.summary())
+                    last_report = monotonic()
+                sleep(.2)
+        finally:
+            self.stop()
+
+    def stop(self):
+        """Terminates the workers"""
+        self._stopped = True
+        for worker in self._workers.values():
+            worker.terminate()
+        for worker in self._workers.values():
+            worker.join()
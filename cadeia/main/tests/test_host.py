@@ -0,0 +1,111 @@
+import asyncio
+import json
+import threading
+from unittest.mock import MagicMock
+
+from cadeia.adapters.codecs import BINARY_CODEC
+from cadeia.adapters.transports import InMemoryTransport
+from cadeia.domain.catalog import Catalog
+from cadeia.domain.entities import OrderInfo, ProductClasses
+from cadeia.main.factories import get_cd, get_factory, get_store
+from cadeia.main.host import AsyncComponentHost, host_components
+
+
+def test_host_runs_the_whole_chain_on_one_event_loop():
+    """Tests that a purchase on an empty store is replenished through the cd and the factory,
+        with every controller hosted on the same event loop
+    """
+    transport = InMemoryTransport()
+    host = AsyncComponentHost(transport)
+    logger = MagicMock()
+
+    host.add(get_factory(logger, transport_callback=lambda: transport))
+    host.add(get_cd(logger, transport_callback=lambda: transport))
+    stores = [host.add(get_store(logger, transport_callback=lambda: transport)) for _ in range(100)]
+
+    async def buy_and_stop():
+        transport.publish(
+            f"store/{stores[0]._store.store_id}/debit",  # pylint: disable=protected-access
+            json.dumps({
+                "entity_id": stores[0]._store.store_id,  # pylint: disable=protected-access
+                "product_class": "C",
+                "quantity": 5,
+                "purpose": "debit"
+            })
+        )
+        for _ in range(100):
+            await asyncio.sleep(0)
+        host.stop()
+
+    host.add_task(buy_and_stop())
+    asyncio.run(asyncio.wait_for(host.run(), timeout=5))
+
+    store = stores[0]._store  # pylint: disable=protected-access
+    assert store.warehouses[ProductClasses.C].quantity_of_items == ProductClasses.C.value
+    assert len(store.pending_cd_orders[ProductClasses.C]) == 0
+
+
+def test_host_hands_the_messages_to_the_dispatcher():
+    """Tests that the chain replenishes a store with every message handled by the dispatcher threads"""
+    logger = MagicMock()
+    handling_threads = set()
+    logger.info.side_effect = lambda *args: handling_threads.add(threading.current_thread().name)
+    stores = []
+
+    def on_ready(host, generator):  # pylint: disable=unused-argument
+        store = host.components[-1]
+        stores.append(store)
+
+        async def buy_and_stop():
+            store._broker._transport_callback().publish(  # pylint: disable=protected-access
+                f"store/{store.store_id}/debit",
+                json.dumps({"entity_id": store.store_id, "product_class": "C", "quantity": 5, "purpose": "debit"})
+            )
+            for _ in range(500):
+                if store._store.warehouses[ProductClasses.C].quantity_of_items:  # pylint: disable=protected-access
+                    break
+                await asyncio.sleep(0.01)
+            host.stop()
+
+        handling_threads.clear()
+        host.add_task(buy_and_stop())
+
+    asyncio.run(asyncio.wait_for(host_components(
+        logger, 1, 1, 10, transport="memory", id_prefix="test", on_ready=on_ready, dispatch_threads=2
+    ), timeout=10))
+
+    store = stores[0]._store  # pylint: disable=protected-access
+    assert store.warehouses[ProductClasses.C].quantity_of_items == ProductClasses.C.value
+    assert handling_threads and all(name.startswith("dispatcher-") for name in handling_threads)
+
+
+def test_host_runs_the_chain_over_a_catalog():
+    """Tests that a purchase of a sku is replenished through the cd and the factory, with
+        binary messages carrying the sku ids
+    """
+    catalog = Catalog.synthetic(10000)
+    sku = catalog.sku(4321)
+    transport = InMemoryTransport()
+    host = AsyncComponentHost(transport)
+    logger = MagicMock()
+
+    host.add(get_factory(logger, transport_callback=lambda: transport, codec=BINARY_CODEC, catalog=catalog))
+    host.add(get_cd(logger, transport_callback=lambda: transport, codec=BINARY_CODEC, catalog=catalog))
+    store = host.add(get_store(logger, transport_callback=lambda: transport, codec=BINARY_CODEC, catalog=catalog))
+
+    async def buy_and_stop():
+        transport.publish(
+            f"store/{store.store_id}/debit",
+            BINARY_CODEC.encode(OrderInfo(entity_id=store.store_id, product_class=sku, quantity=5), "debit")
+        )
+        for _ in range(100):
+            await asyncio.sleep(0)
+        host.stop()
+
+    host.add_task(buy_and_stop())
+    asyncio.run(asyncio.wait_for(host.run(), timeout=5))
+
+    warehouses = store._store.warehouses  # pylint: disable=protected-access
+    assert warehouses[sku].quantity_of_items == sku.value
+    assert warehouses[catalog.sku(4322)].quantity_of_items == 0
+    assert len(store._store.pending_cd_orders[sku]) == 0  # pylint: disable=protected-access
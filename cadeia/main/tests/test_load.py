@@ -0,0 +1,60 @@
+import asyncio
+from unittest.mock import MagicMock
+
+from cadeia.adapters.transports import InMemoryTransport
+from cadeia.main.load import DemandProfile, LoadGenerator, LoadSettings
+
+
+def test_constant_load_reaches_the_target_rate_and_collects_acks():
+    """Tests that the generator keeps the schedule without waiting for each ack"""
+    transport = InMemoryTransport()
+    received = []
+    transport.subscribe("store/+/debit", lambda client, userdata, msg: received.append(msg.topic))
+    generator = LoadGenerator(
+        lambda: transport,
+        ["loja_a", "loja_b"],
+        MagicMock(),
+        settings=LoadSettings(rate=500, mode="constant", virtual_clients=50, seed=1)
+    )
+
+    async def run():
+        serving = asyncio.ensure_future(transport.serve())
+        report = await generator.run_async(duration=0.5)
+        await asyncio.sleep(0.01)
+        transport.stop()
+        await serving
+        return report
+
+    report = asyncio.run(run())
+    assert 200 <= report.sent <= 260
+    assert report.acked == report.sent == len(received)
+    assert report.latency.total == report.acked
+
+
+def test_demand_profile_holds_each_rate_until_the_next_point():
+    """Tests the rate lookup of a replayed profile"""
+    profile = DemandProfile(points=[(0, 10), (60, 100), (120, 0)])
+    assert profile.rate_at(0) == 10
+    assert profile.rate_at(59.9) == 10
+    assert profile.rate_at(60) == 100
+    assert profile.rate_at(1000) == 0
+
+
+def test_stop_returns_the_async_run_with_a_full_window():
+    """Tests that stopping the generator ends the async run while no ack frees the window"""
+    transport = MagicMock()
+    generator = LoadGenerator(
+        lambda: transport,
+        ["loja_a"],
+        MagicMock(),
+        settings=LoadSettings(rate=1000, mode="constant", window=1, seed=1)
+    )
+
+    async def run():
+        running = asyncio.ensure_future(generator.run_async())
+        await asyncio.sleep(0.05)
+        generator.stop()
+        return await asyncio.wait_for(running, 1)
+
+    report = asyncio.run(run())
+    assert report.sent == 1 and report.acked == 0
@@ -0,0 +1,57 @@
+from logging import INFO, WARNING, getLogger, makeLogRecord
+
+from cadeia.main.logs import (
+    BinaryRecordHandler,
+    LogSettings,
+    RateLimitFilter,
+    read_binary_records,
+    start_logging,
+    stop_logging
+)
+
+
+def test_rate_limit_applies_to_each_entity():
+    """Tests that a chatty entity is limited after its burst while another entity still logs"""
+    rate_limit = RateLimitFilter(rate=0.001, burst=3)
+
+    def record(store_id):
+        return makeLogRecord({"msg": "store %s received buy order of %s:%s", "args": (store_id, "A", 1)})
+
+    assert [rate_limit.filter(record("store-1")) for _ in range(5)] == [True, True, True, False, False]
+    assert rate_limit.filter(record("store-2"))
+    assert rate_limit.dropped == 2
+
+
+def test_binary_records_are_read_back(tmp_path):
+    """Tests that the binary records keep the template and arguments, formatted only when read
+
+    Args:
+        tmp_path (Path): Temporary directory
+    """
+    path = str(tmp_path / "records.bin")
+    handler = BinaryRecordHandler(path)
+    handler.handle(makeLogRecord({
+        "name": "cadeia", "msg": "store %s buy order of %s:%s", "args": ("store-1", "C", 5), "levelno": WARNING
+    }))
+    handler.close()
+    with open(path, "rb") as log_file:
+        records = list(read_binary_records(log_file))
+    assert len(records) == 1
+    assert records[0].getMessage() == "store store-1 buy order of C:5"
+    assert records[0].levelname == "WARNING" and records[0].name == "cadeia"
+
+
+def test_pipeline_writes_from_the_listener_thread(tmp_path):
+    """Tests that the logged records reach the file of the process once the listener is stopped
+
+    Args:
+        tmp_path (Path): Temporary directory
+    """
+    logger = getLogger("test_logs_pipeline")
+    listener = start_logging(
+        logger, LogSettings(level=INFO, file=str(tmp_path / "{process}.log"), console=False), process="shard-0")
+    logger.info("store %s received credit of %s:%s", "store-1", "A", 100)
+    logger.debug("not logged")
+    stop_logging(listener)
+    stop_logging(listener)
+    assert (tmp_path / "shard-0.log").read_text() == "store store-1 received credit of A:100\n"
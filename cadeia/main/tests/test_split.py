@@ -0,0 +1,87 @@
+import logging
+import multiprocessing
+import os
+from time import monotonic, sleep
+from typing import Dict, List
+
+from cadeia.adapters.ring import RingBuffer, RingTransport
+from cadeia.main.split import run_io, run_split_host
+
+
+def test_messages_go_through_the_io_process_and_back():
+    """Tests that subscriptions and publishes of the domain side reach the I/O process,
+        whose received messages come back through the inbound ring
+    """
+    inbound, outbound = RingBuffer.create(1 << 16), RingBuffer.create(1 << 16)
+    ready = multiprocessing.Event()
+    io_process = multiprocessing.Process(target=run_io, args=(inbound.name, outbound.name, ready, "memory"))
+    io_process.start()
+    transport = RingTransport(inbound, outbound, ready.wait)
+    received = []
+    try:
+        transport.subscribe("store/#", lambda client, userdata, msg: received.append((msg.topic, bytes(msg.payload))))
+        assert transport.wait_ready(timeout=5)
+        transport.publish("store/a", b"\xca\x02pedido", qos=1)
+        transport.publish("cd/any_cd", b"ignored")
+        deadline = monotonic() + 5
+        while not received and monotonic() < deadline:
+            transport.drain()
+    finally:
+        transport.stop()
+        io_process.join(timeout=5)
+        inbound.close()
+        outbound.close()
+    assert received == [("store/a", b"\xca\x02pedido")]
+    assert io_process.exitcode == 0
+
+
+def test_each_message_reaches_each_subscriber_once():
+    """Tests that subscribers of the same filter get every message once, and that the members
+        of a share group take turns, though the I/O process subscribes each filter once
+    """
+    inbound, outbound = RingBuffer.create(1 << 16), RingBuffer.create(1 << 16)
+    ready = multiprocessing.Event()
+    io_process = multiprocessing.Process(target=run_io, args=(inbound.name, outbound.name, ready, "memory"))
+    io_process.start()
+    transport = RingTransport(inbound, outbound, ready.wait)
+    received: Dict[str, List[str]] = {name: [] for name in ("a", "b", "c", "cd-1", "cd-2")}
+
+    def receiver(name: str):
+        return lambda client, userdata, msg: received[name].append(msg.topic)
+
+    try:
+        for name in ("a", "b", "c"):
+            transport.subscribe("store/#", receiver(name))
+        for name in ("cd-1", "cd-2"):
+            transport.subscribe("$share/cds/cd/requests/debit", receiver(name))
+        assert transport.wait_ready(timeout=5)
+        for number in range(2):
+            transport.publish(f"store/{number}", b"compra")
+            transport.publish("cd/requests/debit", b"pedido")
+        transport.publish("store/fim", b"")
+        deadline = monotonic() + 5
+        while len(received["c"]) < 3 and monotonic() < deadline:
+            transport.drain()
+    finally:
+        transport.stop()
+        io_process.join(timeout=5)
+        inbound.close()
+        outbound.close()
+    assert received["a"] == received["b"] == received["c"] == ["store/0", "store/1", "store/fim"]
+    assert received["cd-1"] == received["cd-2"] == ["cd/requests/debit"]
+
+
+def test_sigterm_unlinks_the_rings_of_the_split_host():
+    """Tests that a terminated split host exits cleanly, without leaving its shared memory behind"""
+    segments = set(os.listdir("/dev/shm"))
+    host = multiprocessing.Process(
+        target=run_split_host,
+        args=(logging.getLogger("split"), 1, 1, 1),
+        kwargs={"transport": "memory", "profile_dir": None}
+    )
+    host.start()
+    sleep(1)
+    host.terminate()
+    host.join(timeout=10)
+    assert host.exitcode == 0
+    assert set(os.listdir("/dev/shm")) <= segments
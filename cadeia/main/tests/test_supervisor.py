@@ -0,0 +1,66 @@
+from logging import getLogger
+from time import monotonic, sleep
+
+import pytest
+
+from cadeia.main.load import LoadSettings
+from cadeia.main.supervisor import ShardSpec, Supervisor, plan_shards
+
+
+def test_shards_split_the_components_and_the_load():
+    """Tests that every component is in one shard and that the load follows the stores"""
+    specs = plan_shards(3, 2, 4, 500, load_settings=LoadSettings(rate=50, virtual_clients=10, seed=1))
+    assert [spec.number_of_stores for spec in specs] == [167, 167, 166]
+    assert sum(spec.number_of_cds for spec in specs) == 4
+    assert sum(spec.number_of_factories for spec in specs) == 2
+    assert sum(spec.load_settings.rate for spec in specs) == pytest.approx(50)
+    assert [spec.load_settings.seed for spec in specs] == [1, 2, 3]
+
+
+def test_shards_without_components_are_left_out():
+    """Tests that there are no more workers than components"""
+    assert len(plan_shards(8, 1, 1, 2)) == 2
+
+
+@pytest.mark.parametrize("workers", [0, -2])
+def test_no_workers_plans_a_single_shard(workers: int):
+    """Tests that less than one worker plans every component in one shard
+
+    Args:
+        workers (int): Number of workers asked for
+    """
+    specs = plan_shards(workers, 1, 2, 5)
+    assert [(spec.number_of_factories, spec.number_of_cds, spec.number_of_stores) for spec in specs] == [(1, 2, 5)]
+
+
+def test_memory_transport_is_limited_to_one_worker():
+    """Tests that the supervisor refuses to split an in memory chain among processes"""
+    with pytest.raises(ValueError):
+        Supervisor([ShardSpec(shard=0, transport="memory"), ShardSpec(shard=1, transport="memory")], getLogger())
+
+
+def test_supervisor_restarts_dead_workers():
+    """Tests that the worker reports its load and is restarted after being killed"""
+    spec = ShardSpec(
+        shard=0, number_of_factories=1, number_of_cds=1, number_of_stores=10,
+        load_settings=LoadSettings(rate=100, seed=0), transport="memory", report_interval=0.1
+    )
+    supervisor = Supervisor([spec], getLogger("test_supervisor"), restart_delay=0)
+
+    def wait_for(condition):
+        deadline = monotonic() + 10
+        while not condition() and monotonic() < deadline:
+            supervisor.poll()
+            sleep(0.05)
+        return condition()
+
+    supervisor.start()
+    try:
+        assert wait_for(lambda: supervisor.load.get(0) and supervisor.load[0].sent > 0)
+        first_pid = supervisor.load[0].pid
+        supervisor._workers[0].kill()  # pylint: disable=protected-access
+        assert wait_for(lambda: supervisor.load[0].pid != first_pid)
+        assert supervisor.restarts[0] == 1
+        assert supervisor.load[0].components == 12
+    finally:
+        supervisor.stop()
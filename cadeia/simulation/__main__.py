@@ -0,0 +1,70 @@
+"""Runs a supply chain scenario in virtual time
+
+Usage: python -m cadeia.simulation --hours 24 --stores 5000
+"""
+from argparse import ArgumentParser
+from logging import DEBUG, WARNING, StreamHandler, getLogger
+
+from cadeia.adapters.codecs import CODECS, get_codec
+from cadeia.simulation.engine import Latency
+from cadeia.simulation.parallel import ParallelSettings, run_parallel
+from cadeia.simulation.scenario import Simulation, SimulationSettings
+
+
+def main():
+    arg_parser = ArgumentParser(description="Simulação de eventos discretos da cadeia de produção")
+    arg_parser.add_argument("--hours", dest="hours", type=float, default=24)
+    arg_parser.add_argument("--stores", dest="number_of_stores", type=int, default=1000)
+    arg_parser.add_argument("--cds", dest="number_of_cds", type=int, default=3)
+    arg_parser.add_argument("--factories", dest="number_of_factories", type=int, default=2)
+    arg_parser.add_argument("--purchases-per-hour", dest="purchases_per_store_hour", type=float, default=10,
+                            help="Mean purchases of each store per hour")
+    arg_parser.add_argument("--seed", dest="seed", type=int, default=0)
+    arg_parser.add_argument("--codec", dest="codec", choices=sorted(CODECS), default="binary")
+    for link, default in (("store", 20), ("cd", 50), ("factory", 50)):
+        arg_parser.add_argument(f"--{link}-latency", dest=f"{link}_latency", type=float, default=default,
+                                help=f"Mean milliseconds to deliver messages to the {link} topics")
+    arg_parser.add_argument("--no-share-group", dest="share_group", action="store_const", const=None,
+                            default="simulation",
+                            help="Delivers the cd and factory requests to every instance, as without --share-group")
+    arg_parser.add_argument("--regions", dest="regions", type=int, default=1,
+                            help="Splits the stores and cds in regions simulated by parallel processes")
+    arg_parser.add_argument("--cross-region-latency", dest="cross_region_latency", type=float, default=1000,
+                            help="Minimum milliseconds of the messages between regions and factories, "
+                                 "the longer it is the less the regions synchronize")
+    arg_parser.add_argument("--verbose", dest="verbose", action="store_true",
+                            help="Logs every message of the components, much slower")
+    args = arg_parser.parse_args()
+
+    logger = getLogger("cadeia.simulation")
+    logger.setLevel(DEBUG if args.verbose else WARNING)
+    logger.addHandler(StreamHandler())
+    settings = SimulationSettings(
+        duration=args.hours * 3600,
+        number_of_stores=args.number_of_stores,
+        number_of_cds=args.number_of_cds,
+        number_of_factories=args.number_of_factories,
+        purchases_per_store_hour=args.purchases_per_store_hour,
+        latencies={
+            # half of the mean is fixed and half is jitter
+            link: Latency(base=latency / 2000, jitter=latency / 2000)
+            for link, latency in (
+                ("store", args.store_latency), ("cd", args.cd_latency), ("factory", args.factory_latency))
+        },
+        share_group=args.share_group,
+        seed=args.seed,
+        codec=get_codec(args.codec)
+    )
+    if args.regions > 1:
+        cross_region_latency = args.cross_region_latency / 1000
+        report = run_parallel(settings, ParallelSettings(
+            regions=args.regions,
+            cross_region_latency=Latency(base=cross_region_latency, jitter=cross_region_latency / 2)
+        ))
+    else:
+        report = Simulation(settings, logger).run()
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""Defines the virtual time event queue and the transport delivering messages in it
+"""
+from collections import Counter
+from dataclasses import dataclass
+from heapq import heappop, heappush
+from itertools import count
+from random import Random
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from cadeia.adapters.transports import InMemoryMessage, InMemoryTransport
+
+
+class EventQueue:
+    """Events ordered by virtual time, events of the same time run in the order they were scheduled"""
+
+    def __init__(self):
+        self.now = 0.0
+        self.processed = 0
+        self._events: List[Tuple[float, int, Callable[..., Any], Tuple[Any, ...]]] = []
+        self._sequence = count()
+
+    def schedule(self, delay: float, callback: Callable[..., Any], *args: Any):
+        """Runs the callback with the arguments after delay virtual seconds"""
+        heappush(self._events, (self.now + max(delay, 0.0), next(self._sequence), callback, args))
+
+    def run(self, until: Optional[float] = None, inclusive: bool = True) -> int:
+        """Runs the events in time order, including the ones scheduled while running
+
+        Args:
+            until (Optional[float]): Virtual time to stop at, if None runs until there are no events
+            inclusive (bool, optional): Whether the events at exactly until are run. Defaults to True.
+
+        Returns:
+            int: Number of events run
+        """
+        processed = 0
+        events = self._events
+        while events and (until is None or events[0][0] < until or (inclusive and events[0][0] == until)):
+            time, _, callback, args = heappop(events)
+            self.now = time
+            callback(*args)
+            processed += 1
+        if until is not None:
+            self.now = max(self.now, until)
+        self.processed += processed
+        return processed
+
+    def __len__(self) -> int:
+        return len(self._events)
+
+
+@dataclass(frozen=True)
+class Latency:
+    """Delay of a message, a fixed base plus an exponentially distributed jitter of the given mean"""
+    base: float = 0.0
+    jitter: float = 0.0
+
+    def sample(self, random: Random) -> float:
+        return self.base + (random.expovariate(1 / self.jitter) if self.jitter else 0.0)
+
+
+class SimulatedTransport(InMemoryTransport):
+    """In memory transport delivering each message after a simulated network latency
+
+    The latency of a message is chosen by the first level of its topic, so
+    the store, cd and factory links can be configured apart. Deliveries are
+    events of the queue, so nothing is delivered until the queue runs.
+    """
+
+    def __init__(
+        self,
+        events: EventQueue,
+        random: Random,
+        latencies: Optional[Dict[str, Latency]] = None,
+        default_latency: Latency = Latency()
+    ):
+        super().__init__()
+        self.events = events
+        self._random = random
+        self._latencies = latencies or {}
+        self._default_latency = default_latency
+        self.messages: Counter = Counter()
+
+    def publish(
+        self,
+        topic: str,
+        payload: Union[bytes, str],
+        qos: int = 0,
+        on_ack: Optional[Callable[[], None]] = None
+    ):
+        root = topic.split("/", 1)[0]
+        self.messages[root] += 1
+        latency = self._latencies.get(root, self._default_latency)
+        self.events.schedule(
+            latency.sample(self._random),
+            self.deliver,
+            InMemoryMessage(topic=topic, payload=payload, qos=qos, on_ack=on_ack)
+        )
+
+    def loop_forever(self):
+        raise RuntimeError("the simulated transport is driven by its event queue")
@@ -0,0 +1,228 @@
+"""Defines the simulation partitioned in regions run by parallel worker processes
+
+Each region holds a share of the stores and of the cds serving them, and
+the factories have a partition of their own, so the only messages between
+partitions are the factory requests of the cds and the credits the
+factories send back. Those cross a simulated inter region link whose
+minimum latency is the lookahead of a conservative synchronization: the
+partitions run in lockstep windows of that length, and a message sent in a
+window can only arrive in a later one, so it is handed over at the barrier
+between windows without any partition running ahead of its inputs.
+"""
+from collections import Counter
+from dataclasses import dataclass, replace
+from logging import WARNING, getLogger
+import multiprocessing
+from multiprocessing.connection import Connection
+from random import Random
+from time import perf_counter
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Union
+
+from cadeia.adapters.topics import REQUESTS
+from cadeia.adapters.transports import InMemoryMessage
+from cadeia.simulation.engine import EventQueue, Latency, SimulatedTransport
+from cadeia.simulation.scenario import Simulation, SimulationReport, SimulationSettings
+
+RemoteMessage = Tuple[float, str, Union[bytes, str]]
+
+
+@dataclass(frozen=True)
+class ParallelSettings:
+    """Settings of the partitioning of a simulation
+
+    Args:
+        regions (int): Number of regions, each run by its own worker process
+        cross_region_latency (Latency): Latency of the messages between partitions,
+            its base is the lookahead of the synchronization and must be positive
+    """
+    regions: int = 2
+    cross_region_latency: Latency = Latency(base=1.0, jitter=0.5)
+
+
+class PartitionTransport(SimulatedTransport):
+    """Simulated transport of a partition, messages to topics owned by other
+        partitions are kept in an outbox to be handed over at the next barrier
+    """
+
+    def __init__(
+        self,
+        events: EventQueue,
+        random: Random,
+        is_local: Callable[[str], bool],
+        cross_latency: Latency,
+        latencies: Optional[Dict[str, Latency]] = None
+    ):
+        super().__init__(events, random, latencies=latencies)
+        self._is_local = is_local
+        self._cross_latency = cross_latency
+        self.outbox: List[RemoteMessage] = []
+
+    def publish(
+        self,
+        topic: str,
+        payload: Union[bytes, str],
+        qos: int = 0,
+        on_ack: Optional[Callable[[], None]] = None
+    ):
+        if self._is_local(topic):
+            super().publish(topic, payload, qos=qos, on_ack=on_ack)
+            return
+        self.messages[topic.split("/", 1)[0]] += 1
+        self.outbox.append((self.events.now + self._cross_latency.sample(self._random), topic, payload))
+        if on_ack:
+            on_ack()
+
+    def receive(self, messages: Sequence[RemoteMessage]):
+        """Schedules the delivery of messages from other partitions at their arrival time"""
+        for arrival, topic, payload in messages:
+            self.events.schedule(arrival - self.events.now, self.deliver,
+                                 InMemoryMessage(topic=topic, payload=payload, qos=1))
+
+    def take_outbox(self) -> List[RemoteMessage]:
+        outbox, self.outbox = self.outbox, []
+        return outbox
+
+
+def _share(total: int, parts: int, part: int) -> int:
+    return total // parts + (1 if part < total % parts else 0)
+
+
+def partition_settings(settings: SimulationSettings, regions: int, partition: int) -> SimulationSettings:
+    """Settings of a partition, the partitions below regions are regions and the last one has the factories"""
+    if partition == regions:
+        return replace(settings, number_of_stores=0, number_of_cds=0, seed=settings.seed * 1_000_003 + partition)
+    return replace(
+        settings,
+        number_of_stores=_share(settings.number_of_stores, regions, partition),
+        number_of_cds=_share(settings.number_of_cds, regions, partition),
+        number_of_factories=0,
+        seed=settings.seed * 1_000_003 + partition
+    )
+
+
+def _run_partition(
+    connection: Connection,
+    settings: SimulationSettings,
+    parallel_settings: ParallelSettings,
+    partition: int
+):
+    """Worker process of a partition, runs the windows commanded through the connection"""
+    logger = getLogger(__name__)
+    logger.setLevel(WARNING)
+    is_factory_partition = partition == parallel_settings.regions
+    local_cds = set()
+
+    def is_local(topic: str) -> bool:
+        root, _, rest = topic.partition("/")
+        if root == "factory":
+            return is_factory_partition
+        if root == "cd":
+            cd_id = rest.split("/", 1)[0]
+            return cd_id in local_cds or (cd_id == REQUESTS and not is_factory_partition)
+        return True
+
+    own_settings = partition_settings(settings, parallel_settings.regions, partition)
+    transport = PartitionTransport(
+        EventQueue(), Random(own_settings.seed), is_local,
+        parallel_settings.cross_region_latency, latencies=settings.latencies
+    )
+    simulation = Simulation(own_settings, logger, transport)
+    local_cds.update(cd.distribution_center_id for cd in simulation.cds)
+    connection.send(sorted(local_cds))
+    simulation.start()
+    while True:
+        command, until, inbound = connection.recv()
+        if command == "finish":
+            connection.send(simulation.finish())
+            return
+        transport.receive(inbound)
+        simulation.advance(until, inclusive=False)
+        connection.send(transport.take_outbox())
+
+
+def merge_reports(reports: Sequence[SimulationReport]) -> SimulationReport:
+    """Adds up the reports of the partitions of a simulation"""
+    messages: Counter = Counter()
+    failed_by_class: Counter = Counter()
+    for report in reports:
+        messages.update(report.messages)
+        failed_by_class.update(report.failed_by_class)
+    return SimulationReport(
+        virtual_time=max((report.virtual_time for report in reports), default=0.0),
+        events=sum(report.events for report in reports),
+        purchases=sum(report.purchases for report in reports),
+        failed_purchases=sum(report.failed_purchases for report in reports),
+        messages=dict(messages),
+        failed_by_class=dict(failed_by_class)
+    )
+
+
+def run_parallel(
+    settings: SimulationSettings = SimulationSettings(),
+    parallel_settings: ParallelSettings = ParallelSettings()
+) -> SimulationReport:
+    """Runs a simulation partitioned in regions, each one in a worker process
+
+    Args:
+        settings (SimulationSettings, optional): Scenario to simulate, its stores
+            and cds are split evenly among the regions
+        parallel_settings (ParallelSettings, optional): Regions and the latency between them
+
+    Returns:
+        SimulationReport: Report of all the partitions
+    """
+    lookahead = parallel_settings.cross_region_latency.base
+    if lookahead <= 0:
+        raise ValueError("the cross region latency needs a positive base, it is the lookahead of the simulation")
+    if settings.number_of_cds < parallel_settings.regions:
+        raise ValueError("every region needs at least one cd")
+
+    start = perf_counter()
+    partitions = parallel_settings.regions + 1
+    connections: List[Connection] = []
+    workers = []
+    for partition in range(partitions):
+        parent_connection, child_connection = multiprocessing.Pipe()
+        worker = multiprocessing.Process(
+            target=_run_partition,
+            args=(child_connection, settings, parallel_settings, partition),
+            daemon=True
+        )
+        worker.start()
+        connections.append(parent_connection)
+        workers.append(worker)
+
+    factory_partition = parallel_settings.regions
+    owners: Dict[str, int] = {}
+    for partition, connection in enumerate(connections):
+        for cd_id in connection.recv():
+            owners[cd_id] = partition
+
+    def destination(topic: str) -> int:
+        root, _, rest = topic.partition("/")
+        if root == "factory":
+            return factory_partition
+        return owners[rest.split("/", 1)[0]]
+
+    inbound: List[List[RemoteMessage]] = [[] for _ in range(partitions)]
+    now = 0.0
+    while now < settings.duration:
+        until = min(now + lookahead, settings.duration)
+        for partition, connection in enumerate(connections):
+            connection.send(("advance", until, sorted(inbound[partition], key=lambda message: message[0])))
+            inbound[partition] = []
+        for connection in connections:
+            for message in connection.recv():
+                inbound[destination(message[1])].append(message)
+        now = until
+
+    reports = []
+    for connection in connections:
+        connection.send(("finish", now, []))
+        reports.append(connection.recv())
+    for worker in workers:
+        worker.join()
+    report = merge_reports(reports)
+    report.virtual_time = now
+    report.wall_time = perf_counter() - start
+    return report
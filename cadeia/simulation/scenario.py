@@ -0,0 +1,163 @@
+"""Defines the supply chain scenarios run in virtual time
+"""
+from dataclasses import dataclass, field
+from logging import Logger, getLogger
+from random import Random
+from time import perf_counter
+from typing import Dict, List, Optional
+
+from cadeia.adapters.cd_controller import CDController
+from cadeia.adapters.codecs import BINARY_CODEC, Codec
+from cadeia.adapters.store_controller import StoreController
+from cadeia.domain.entities import ProductClasses
+from cadeia.main.factories import get_cd, get_factory, get_store
+from cadeia.simulation.engine import EventQueue, Latency, SimulatedTransport
+
+
+def default_latencies() -> Dict[str, Latency]:
+    return {
+        "store": Latency(base=0.02, jitter=0.01),
+        "cd": Latency(base=0.05, jitter=0.02),
+        "factory": Latency(base=0.05, jitter=0.02),
+    }
+
+
+@dataclass
+class SimulationSettings:
+    """Settings of a simulated scenario
+
+    Args:
+        duration (float): Virtual seconds to simulate
+        number_of_stores (int): Stores of the scenario
+        number_of_cds (int): Cds of the scenario
+        number_of_factories (int): Factories of the scenario
+        purchases_per_store_hour (float): Mean purchases of each store per hour, as a poisson process
+        latencies (Dict[str, Latency]): Latency of the messages by the first level of their topic
+        share_group (Optional[str]): Cds and factories share their requests, each one is served by one instance
+        seed (int): Seed of the purchases and latencies
+        codec (Codec): Wire format of the messages
+    """
+    duration: float = 24 * 3600
+    number_of_stores: int = 1000
+    number_of_cds: int = 3
+    number_of_factories: int = 2
+    purchases_per_store_hour: float = 10
+    latencies: Dict[str, Latency] = field(default_factory=default_latencies)
+    share_group: Optional[str] = "simulation"
+    seed: int = 0
+    codec: Codec = BINARY_CODEC
+
+
+@dataclass
+class SimulationReport:
+    """Numbers of a simulated scenario"""
+    virtual_time: float = 0.0
+    wall_time: float = 0.0
+    events: int = 0
+    purchases: int = 0
+    failed_purchases: int = 0
+    messages: Dict[str, int] = field(default_factory=dict)
+    failed_by_class: Dict[str, int] = field(default_factory=dict)
+
+    @property
+    def fill_rate(self) -> float:
+        """Fraction of the purchases the stores had stock for"""
+        return 1 - self.failed_purchases / self.purchases if self.purchases else 1.0
+
+    def summary(self) -> str:
+        """Description of the report"""
+        messages = ", ".join(f"{root} {number}" for root, number in sorted(self.messages.items()))
+        return (
+            f"simulated {self.virtual_time / 3600:.1f}h in {self.wall_time:.1f}s, {self.events} events\n"
+            f"{self.purchases} purchases, {self.failed_purchases} without stock, fill rate {self.fill_rate:.3f}\n"
+            f"messages published by topic: {messages}"
+        )
+
+
+class Simulation:
+    """Supply chain of real controllers and use cases exchanging messages in virtual time"""
+
+    def __init__(
+        self,
+        settings: SimulationSettings = SimulationSettings(),
+        logger: Optional[Logger] = None,
+        transport: Optional[SimulatedTransport] = None
+    ):
+        """
+        Args:
+            settings (SimulationSettings, optional): Scenario to simulate
+            logger (Optional[Logger]): Logger of the components
+            transport (Optional[SimulatedTransport]): Transport of the components, by default
+                a new one delivering every message in this simulation
+        """
+        self.settings = settings
+        self._random = Random(settings.seed)
+        transport_random = Random(self._random.getrandbits(64))
+        self.transport = transport or SimulatedTransport(
+            EventQueue(), transport_random, latencies=settings.latencies)
+        self.events = self.transport.events
+        self._logger = logger or getLogger(__name__)
+        self.report = SimulationReport()
+        self._classes = list(ProductClasses)
+
+        def transport_callback():
+            return self.transport
+
+        for _ in range(settings.number_of_factories):
+            get_factory(self._logger, settings.share_group, transport_callback, settings.codec).subscribe()
+        self.cds: List[CDController] = []
+        for _ in range(settings.number_of_cds):
+            cd = get_cd(self._logger, settings.share_group, transport_callback, settings.codec)
+            cd.subscribe()
+            self.cds.append(cd)
+        self.stores: List[StoreController] = []
+        for _ in range(settings.number_of_stores):
+            store = get_store(self._logger, transport_callback, settings.codec)
+            store.subscribe()
+            self.stores.append(store)
+
+    def _purchase(self):
+        product_class = self._random.choice(self._classes)
+        store = self._random.choice(self.stores)
+        self.report.purchases += 1
+        if not store.buy(product_class, self._random.randint(0, product_class.value)):
+            self.report.failed_purchases += 1
+            self.report.failed_by_class[product_class.name] = self.report.failed_by_class.get(product_class.name, 0) + 1
+        self._schedule_purchase()
+
+    def _schedule_purchase(self):
+        rate = self.settings.purchases_per_store_hour * len(self.stores) / 3600
+        if rate > 0:
+            self.events.schedule(self._random.expovariate(rate), self._purchase)
+
+    def start(self):
+        """Schedules the first purchase, call before advancing the simulation"""
+        self._schedule_purchase()
+
+    def advance(self, until: float, inclusive: bool = True) -> int:
+        """Runs the events up to a virtual time, see EventQueue.run
+
+        Returns:
+            int: Number of events run
+        """
+        processed = self.events.run(until=until, inclusive=inclusive)
+        self.report.events += processed
+        return processed
+
+    def finish(self) -> SimulationReport:
+        """Completes the report with the state at the current virtual time"""
+        self.report.virtual_time = self.events.now
+        self.report.messages = dict(self.transport.messages)
+        return self.report
+
+    def run(self) -> SimulationReport:
+        """Runs the scenario for its duration
+
+        Returns:
+            SimulationReport: Report of the scenario
+        """
+        start = perf_counter()
+        self.start()
+        self.advance(self.settings.duration)
+        self.report.wall_time = perf_counter() - start
+        return self.finish()
@@ -0,0 +1,74 @@
+from logging import WARNING, getLogger
+from random import Random
+
+from cadeia.simulation.engine import EventQueue, Latency, SimulatedTransport
+from cadeia.simulation.parallel import ParallelSettings, PartitionTransport, run_parallel
+from cadeia.simulation.scenario import Simulation, SimulationSettings
+
+
+def test_events_run_in_virtual_time_order():
+    """Tests that events run by time, ties in scheduling order, and that the clock advances"""
+    events = EventQueue()
+    ran = []
+    events.schedule(2, ran.append, "late")
+    events.schedule(1, ran.append, "first")
+    events.schedule(1, lambda: events.schedule(0.5, ran.append, "scheduled while running"))
+    events.schedule(1, ran.append, "second")
+    assert events.run(until=1.5) == 4
+    assert ran == ["first", "second", "scheduled while running"]
+    assert events.now == 1.5
+    events.run()
+    assert ran[-1] == "late" and events.now == 2
+
+
+def test_simulated_transport_delivers_after_the_latency():
+    """Tests that messages are delivered once the queue reaches their latency"""
+    events = EventQueue()
+    transport = SimulatedTransport(events, Random(0), latencies={"cd": Latency(base=0.3)})
+    received = []
+    transport.subscribe("cd/#", lambda client, userdata, msg: received.append((events.now, msg.payload)))
+    transport.publish("cd/any_cd", b"pedido")
+    events.run(until=0.2)
+    assert not received
+    events.run()
+    assert received == [(0.3, b"pedido")]
+    assert transport.messages["cd"] == 1
+
+
+def test_scenarios_are_repeatable():
+    """Tests that the same seed gives the same results, and that orders flow through the whole chain"""
+    logger = getLogger("test_simulation")
+    logger.setLevel(WARNING)
+    settings = SimulationSettings(duration=3600, number_of_stores=50, purchases_per_store_hour=20, seed=7)
+    first = Simulation(settings, logger).run()
+    second = Simulation(settings, logger).run()
+    assert first.purchases > 0 and first.messages["factory"] > 0 and first.messages["store"] > 0
+    assert (first.events, first.purchases, first.failed_purchases, first.messages) == \
+        (second.events, second.purchases, second.failed_purchases, second.messages)
+
+
+def test_regions_exchange_only_factory_traffic_and_are_repeatable():
+    """Tests that a partitioned run reaches the factories from every region and repeats with the same seed"""
+    settings = SimulationSettings(
+        duration=600, number_of_stores=40, number_of_cds=2, purchases_per_store_hour=60, seed=3)
+    parallel_settings = ParallelSettings(regions=2, cross_region_latency=Latency(base=0.5))
+    first = run_parallel(settings, parallel_settings)
+    second = run_parallel(settings, parallel_settings)
+    assert first.virtual_time == 600
+    assert first.messages["factory"] > 0
+    assert (first.events, first.purchases, first.failed_purchases, first.messages) == \
+        (second.events, second.purchases, second.failed_purchases, second.messages)
+
+
+def test_partition_transport_hands_remote_messages_over():
+    """Tests that messages to other partitions are kept in the outbox and delivered at their arrival"""
+    events = EventQueue()
+    transport = PartitionTransport(events, Random(0), lambda topic: topic.startswith("store"), Latency(base=1))
+    received = []
+    transport.subscribe("factory/#", lambda client, userdata, msg: received.append(events.now))
+    transport.publish("factory/any_factory", b"pedido")
+    outbox = transport.take_outbox()
+    assert outbox == [(1, "factory/any_factory", b"pedido")] and not transport.outbox
+    transport.receive(outbox)
+    events.run()
+    assert received == [1]
@@ -1,20 +1,19 @@
-from concurrent.futures import ProcessPoolExecutor
-from functools import partial
-from logging import INFO, FileHandler, StreamHandler, getLogger
+from logging import getLevelName, getLogger
 from argparse import ArgumentParser
-from time import sleep
+import os
+from uuid import uuid4
 
-from cadeia.main.factories import (
-    client_consume,
-    create_component,
-    get_cd,
-    get_factory,
-    get_store
-)
-logger = getLogger(__name__)
-logger.setLevel(INFO)
-logger.addHandler(FileHandler('cadeia_de_abastecimento.log'))
-logger.addHandler(StreamHandler())
+from cadeia.adapters.batching import BatchSettings
+from cadeia.adapters.codecs import CODECS, get_codec
+from cadeia.adapters.dedup import DedupSettings
+from cadeia.adapters.metrics import MetricsExporter, MetricsSettings
+from cadeia.domain.catalog import Catalog
+from cadeia.main.host import run_host
+from cadeia.main.load import LOAD_MODES, DemandProfile, LoadSettings
+from cadeia.main.logs import LogSettings, start_logging
+from cadeia.main.split import run_split_host
+from cadeia.main.supervisor import Supervisor, plan_shards
+logger = getLogger("cadeia")
 
 
 def main():
@@ -22,16 +21,179 @@ def main():
     arg_parser.add_argument("--factories", dest="number_of_factories", type=int, default=0)
     arg_parser.add_argument("--stores", dest="number_of_stores", type=int, default=0)
     arg_parser.add_argument("--cds", dest="number_of_cds", type=int, default=0)
-    arg_parser.add_argument("--clients", dest="number_of_clients", type=int, default=0)
+    arg_parser.add_argument("--clients", dest="number_of_clients", type=int, default=0,
+                            help="Virtual clients buying from the stores of this process")
+    arg_parser.add_argument(
+        "--rate", dest="rate", type=float, default=None,
+        help="Target purchases per second of all the clients, defaults to one every 2.5s per client"
+    )
+    arg_parser.add_argument("--load-mode", dest="load_mode", choices=LOAD_MODES, default="poisson")
+    arg_parser.add_argument("--load-profile", dest="load_profile", type=str, default=None,
+                            help="csv of seconds since the start and purchases per second, for --load-mode=profile")
+    arg_parser.add_argument("--window", dest="window", type=int, default=1000,
+                            help="Maximum purchases waiting for the broker ack")
+    arg_parser.add_argument(
+        "--share-group", dest="share_group", type=str, default=None,
+        help="Distributes cd and factory requests among the instances of this group "
+             "through MQTT v5 shared subscriptions, instead of delivering them to every instance"
+    )
+    arg_parser.add_argument(
+        "--transport", dest="transport", choices=["paho", "memory"], default="paho",
+        help="memory runs the whole chain inside this process through an in memory message bus"
+    )
+    arg_parser.add_argument(
+        "--codec", dest="codec", choices=sorted(CODECS), default="json",
+        help="Wire format of the published messages, every codec is accepted when receiving"
+    )
+    arg_parser.add_argument(
+        "--batch-window", dest="batch_window", type=float, default=0,
+        help="Milliseconds the messages to the same topic are held to be published as one batch, 0 disables batching"
+    )
+    arg_parser.add_argument("--batch-size", dest="batch_size", type=int, default=64,
+                            help="Maximum number of messages of a batch")
+    arg_parser.add_argument("--batch-compress", dest="batch_compress", action="store_true",
+                            help="Compresses the batches with zlib")
+    arg_parser.add_argument(
+        "--runtime", dest="runtime", choices=["supervisor", "async", "split"], default="supervisor",
+        help="supervisor splits the components among worker processes, "
+             "async hosts every component of this process on one asyncio event loop, "
+             "split hosts them on one event loop with the network I/O in a second process"
+    )
+    arg_parser.add_argument("--ring-size", dest="ring_size", type=int, default=4,
+                            help="MiB of each shared memory ring of the split runtime")
+    arg_parser.add_argument("--workers", dest="workers", type=int, default=None,
+                            help="Worker processes of the supervisor, defaults to the number of cpus")
+    arg_parser.add_argument("--dispatch-threads", dest="dispatch_threads", type=int, default=0,
+                            help="Threads handling the received messages, in order per component, "
+                                 "so the network loop is never held by a use case")
+    arg_parser.add_argument("--deployment", dest="deployment", type=str, default=None,
+                            help="Prefix of the component ids, defaults to a random one")
+
+    arg_parser.add_argument("--log-level", dest="log_level", choices=["DEBUG", "INFO", "WARNING", "ERROR"],
+                            default="INFO")
+    arg_parser.add_argument("--log-file", dest="log_file", type=str, default="cadeia_de_abastecimento-{process}.log",
+                            help="Log file of each process, {process} is replaced by the process name, "
+                                 "an empty value disables it")
+    arg_parser.add_argument("--log-binary", dest="log_binary", action="store_true",
+                            help="Writes binary records to the log file, read them with python -m cadeia.main.logs")
+    arg_parser.add_argument("--log-rate", dest="log_rate", type=float, default=None,
+                            help="Maximum records per second of each component and message")
+    arg_parser.add_argument("--quiet", dest="console_log", action="store_false",
+                            help="Does not log to the console")
+    arg_parser.add_argument("--metrics-port", dest="metrics_port", type=int, default=None,
+                            help="Serves the metrics in the Prometheus text format on this local port, "
+                                 "each supervisor worker on the port plus its shard number")
+    arg_parser.add_argument("--metrics-file", dest="metrics_file", type=str, default=None,
+                            help="File the metrics of each process are written to, {process} is replaced "
+                                 "by the process name")
+    arg_parser.add_argument("--metrics-interval", dest="metrics_interval", type=float, default=10,
+                            help="Seconds between writes of the metrics file")
+    arg_parser.add_argument("--trace-rate", dest="trace_rate", type=float, default=0.0,
+                            help="Fraction of the store orders traced through the cd and factory hops, "
+                                 "their time to replenish is logged and exposed in the metrics")
+    arg_parser.add_argument("--profile-dir", dest="profile_dir", type=str, default=".",
+                            help="Directory of the profiles toggled by SIGUSR1 or by start and stop messages on "
+                                 "control/<component id>/profile, an empty value disables profiling")
+    arg_parser.add_argument("--dedup-size", dest="dedup_size", type=int, default=10000,
+                            help="Message ids each component remembers to drop repeated deliveries, 0 disables it")
+    arg_parser.add_argument("--dedup-ttl", dest="dedup_ttl", type=float, default=60,
+                            help="Seconds each component remembers a received message id")
+    arg_parser.add_argument("--catalog", dest="catalog", type=str, default=None,
+                            help="Csv file of the skus held by the stores and cds, with the columns name, capacity "
+                                 "and optionally green and yellow, instead of the product classes A, B and C")
 
     args = arg_parser.parse_args()
+    log_settings = LogSettings(
+        level=getLevelName(args.log_level),
+        file=args.log_file or None,
+        console=args.console_log,
+        binary=args.log_binary,
+        rate=args.log_rate
+    )
+    start_logging(logger, log_settings, process="supervisor" if args.runtime == "supervisor" else "main")
+    metrics_settings = MetricsSettings(
+        port=args.metrics_port,
+        file=args.metrics_file,
+        interval=args.metrics_interval
+    ) if args.metrics_port is not None or args.metrics_file else None
+    if metrics_settings and args.runtime != "supervisor":
+        MetricsExporter(metrics_settings, process="main").start()
+    codec = get_codec(args.codec)
+    batch_settings = BatchSettings(
+        max_delay=args.batch_window / 1000,
+        max_messages=args.batch_size,
+        compress=args.batch_compress
+    ) if args.batch_window > 0 else None
+    dedup = DedupSettings(size=args.dedup_size, ttl=args.dedup_ttl) if args.dedup_size > 0 else None
+    catalog = Catalog.from_csv(args.catalog) if args.catalog and args.runtime != "supervisor" else None
+    load_settings = LoadSettings(
+        rate=args.rate if args.rate is not None else args.number_of_clients / 2.5,
+        mode=args.load_mode,
+        profile=DemandProfile.from_csv(args.load_profile) if args.load_profile else None,
+        virtual_clients=args.number_of_clients,
+        window=args.window
+    ) if args.number_of_clients > 0 else None
 
-    sleep(5)
-    pool = ProcessPoolExecutor()
-    create_component(pool, partial(get_factory, logger), args.number_of_factories, 'factory')
-    create_component(pool, partial(get_cd, logger), args.number_of_cds, 'cd')
-    stores = create_component(pool, partial(get_store, logger), args.number_of_stores, 'store')
-    create_component(pool, partial(client_consume, stores), args.number_of_clients, 'client')
+    if args.runtime == "split":
+        run_split_host(
+            logger,
+            args.number_of_factories,
+            args.number_of_cds,
+            args.number_of_stores,
+            load_settings=load_settings,
+            share_group=args.share_group,
+            transport=args.transport,
+            codec=codec,
+            batch_settings=batch_settings,
+            ring_capacity=args.ring_size << 20,
+            trace_rate=args.trace_rate,
+            profile_dir=args.profile_dir or None,
+            dedup=dedup,
+            catalog=catalog
+        )
+        return
+    if args.runtime == "async":
+        run_host(
+            logger,
+            args.number_of_factories,
+            args.number_of_cds,
+            args.number_of_stores,
+            load_settings=load_settings,
+            share_group=args.share_group,
+            transport=args.transport,
+            codec=codec,
+            batch_settings=batch_settings,
+            dispatch_threads=args.dispatch_threads,
+            trace_rate=args.trace_rate,
+            profile_dir=args.profile_dir or None,
+            dedup=dedup,
+            catalog=catalog
+        )
+        return
+    workers = args.workers or os.cpu_count() or 1
+    if args.transport == "memory" and workers > 1:
+        logger.info("the memory transport only connects components of the same process, running one worker")
+        workers = 1
+    specs = plan_shards(
+        workers,
+        args.number_of_factories,
+        args.number_of_cds,
+        args.number_of_stores,
+        load_settings=load_settings,
+        share_group=args.share_group,
+        transport=args.transport,
+        codec=args.codec,
+        batch_settings=batch_settings,
+        deployment=args.deployment or uuid4().hex[:8],
+        dispatch_threads=args.dispatch_threads,
+        log_settings=log_settings,
+        metrics_settings=metrics_settings,
+        trace_rate=args.trace_rate,
+        profile_dir=args.profile_dir or None,
+        dedup=dedup,
+        catalog_path=args.catalog
+    )
+    Supervisor(specs, logger).run()
 
 
 if __name__ == '__main__':